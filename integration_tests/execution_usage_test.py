@@ -0,0 +1,44 @@
+"""Test script for the resource usage query, that needs a real PostgreSQL database."""
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.state import SQLManager
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+
+
+@pytest.fixture
+def state(zoe_configuration):  # pylint: disable=redefined-outer-name
+    """A SQL manager connected to the integration test database."""
+    load_configuration(zoe_configuration)
+    sql = SQLManager(zoe_configuration)
+    sql.init_db()
+    yield sql
+    sql.close()
+
+
+@pytest.fixture
+def user_id(state):  # pylint: disable=redefined-outer-name
+    """A user that owns the test executions, deleted with them at the end of the test."""
+    role_id = state.role.insert('usage_test')
+    quota_id = state.quota.insert('usage_test', 0, 0, 0, 0)
+    new_user_id = state.user.insert('usage_test', 'usage_test@example.com', 'internal', role_id, quota_id, -1)
+    yield new_user_id
+    state.user.delete(new_user_id)
+    state.quota.delete(quota_id)
+    state.role.delete(role_id)
+
+
+class TestExecutionUsage:
+    """Test case class."""
+
+    def test_resource_forms(self, state, user_id):  # pylint: disable=redefined-outer-name
+        """Resources described as min/max objects, as numbers, as null or missing are all summed by their minimum."""
+        execution_id = state.executions.insert('usage_test', user_id, {'size': 1})
+        state.services.insert(execution_id, 'object0', 'object', {'resources': {'cores': {'min': 2, 'max': 4}, 'memory': {'min': 1024, 'max': 2048}}}, True)
+        state.services.insert(execution_id, 'number0', 'number', {'resources': {'cores': 1.5, 'memory': 512}}, True)
+        state.services.insert(execution_id, 'null0', 'null', {'resources': {'cores': None, 'memory': None}}, False)
+        state.services.insert(execution_id, 'missing0', 'missing', {}, False)
+
+        assert state.executions.usage(user_id, ['submitted']) == (1, 3.5, 1536)
+        assert state.executions.usage(user_id, ['running']) == (0, 0.0, 0)
@@ -0,0 +1,63 @@
+"""Test script for the status change notifications sent by the database triggers, that needs a real PostgreSQL database."""
+
+import select
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.state import SQLManager, notifications
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+
+
+@pytest.fixture
+def state(zoe_configuration):  # pylint: disable=redefined-outer-name
+    """A SQL manager connected to the integration test database."""
+    load_configuration(zoe_configuration)
+    sql = SQLManager(zoe_configuration)
+    sql.init_db()
+    yield sql
+    sql.close()
+
+
+@pytest.fixture
+def user_id(state):  # pylint: disable=redefined-outer-name
+    """A user that owns the test executions, deleted with them at the end of the test."""
+    role_id = state.role.insert('notify_test')
+    quota_id = state.quota.insert('notify_test', 0, 0, 0, 0)
+    new_user_id = state.user.insert('notify_test', 'notify_test@example.com', 'internal', role_id, quota_id, -1)
+    yield new_user_id
+    state.user.delete(new_user_id)
+    state.quota.delete(quota_id)
+    state.role.delete(role_id)
+
+
+def _notifications(conn):
+    """Wait for the notifications of the committed changes."""
+    received = []
+    while select.select([conn], [], [], 2)[0]:
+        conn.poll()
+        while len(conn.notifies) > 0:
+            received.append(notifications.parse_payload(conn.notifies.pop(0).payload))
+    return received
+
+
+class TestStatusNotify:
+    """Test case class."""
+
+    def test_status_changes(self, state, user_id, zoe_configuration):  # pylint: disable=redefined-outer-name
+        """Status changes of executions and services are announced, with only the columns that changed."""
+        conn = state.listen_connection()
+        conn.cursor().execute('LISTEN "{}"'.format(notifications.channel_name(zoe_configuration.deployment_name)))
+        execution_id = state.executions.insert('notify_test', user_id, {'size': 1})
+        service_id = state.services.insert(execution_id, 'service0', 'service', {}, True)
+
+        state.executions.update(execution_id, status='queued')
+        state.services.update(service_id, backend_status='started')
+        state.services.update(service_id, status='active', backend_status='started')
+        state.services.update(service_id, backend_id='container0')
+        assert _notifications(conn) == [
+            ('execution', execution_id, {'status': 'queued'}),
+            ('service', service_id, {'backend_status': 'started'}),
+            ('service', service_id, {'status': 'active'})
+        ]
+        conn.close()
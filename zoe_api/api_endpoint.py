@@ -15,11 +15,14 @@
 
 """The real API, exposed as web pages or REST API."""
 
+from collections import OrderedDict
 from datetime import timedelta, datetime
 import logging
 import os
-from typing import List, Union
+import threading
+from typing import Dict, List, Union
 
+from zoe_api.async_api_endpoint import AsyncAPIEndpoint
 import zoe_api.exceptions
 import zoe_api.master_api
 import zoe_lib.applications
@@ -29,6 +32,11 @@ from zoe_lib.config import get_conf
 
 log = logging.getLogger(__name__)
 
+EXECUTION_OWNERS_CACHE_SIZE = 10000  # owners kept to check permissions on cached statuses, the least recently used are dropped first
+
+# Executions in these statuses count towards the user quotas
+ACTIVE_STATUSES = ['running', 'starting', 'queued', 'image download', 'submitted']
+
 
 class APIEndpoint:
     """
@@ -36,14 +44,20 @@ class APIEndpoint:
 
     :type master: zoe_api.master_api.APIManager
     :type sql: zoe_lib.sql_manager.SQLManager
+    :type status_listener: zoe_api.status_listener.StatusListener
+    :type async_api: zoe_api.async_api_endpoint.AsyncAPIEndpoint
     """
-    def __init__(self, master_api, sql_manager: zoe_lib.state.sql_manager.SQLManager):
+    def __init__(self, master_api, sql_manager: zoe_lib.state.sql_manager.SQLManager, status_listener=None):
         self.master = master_api
         self.sql = sql_manager
+        self.status_listener = status_listener
+        self._execution_owners = OrderedDict()
+        self._execution_owners_lock = threading.Lock()
+        self.async_api = AsyncAPIEndpoint(self)
 
-    def execution_by_id(self, user: Union[None, zoe_lib.state.User], execution_id: int) -> zoe_lib.state.Execution:
+    def execution_by_id(self, user: Union[None, zoe_lib.state.User], execution_id: int, prefetch=None) -> zoe_lib.state.Execution:
         """Lookup an execution by its ID."""
-        e = self.sql.executions.select(id=execution_id, only_one=True)
+        e = self.sql.executions.select(id=execution_id, only_one=True, prefetch=prefetch)
         if e is None:
             raise zoe_api.exceptions.ZoeNotFoundException('No such execution')
         assert isinstance(e, zoe_lib.state.Execution)
@@ -51,13 +65,39 @@ class APIEndpoint:
             raise zoe_api.exceptions.ZoeAuthException()
         return e
 
-    def execution_list(self, user: zoe_lib.state.User, **filters):
+    def execution_status(self, user: zoe_lib.state.User, execution_id: int) -> str:
+        """Return the status of an execution, from the status cache when possible."""
+        status = None
+        if self.status_listener is not None:
+            status = self.status_listener.cached_status(execution_id)
+        with self._execution_owners_lock:
+            owner_id = self._execution_owners.get(execution_id)
+            if owner_id is not None:
+                self._execution_owners.move_to_end(execution_id)
+        if status is None or owner_id is None:
+            e = self.execution_by_id(user, execution_id)
+            with self._execution_owners_lock:
+                self._execution_owners[execution_id] = e.user_id
+                if len(self._execution_owners) > EXECUTION_OWNERS_CACHE_SIZE:
+                    self._execution_owners.popitem(last=False)
+            return e.status
+        if owner_id != user.id and not user.role.can_operate_others:
+            raise zoe_api.exceptions.ZoeAuthException()
+        return status
+
+    def execution_list(self, user: zoe_lib.state.User, prefetch=None, **filters):
         """Generate a optionally filtered list of executions."""
         if not user.role.can_operate_others:
             filters['user_id'] = user.id
-        execs = self.sql.executions.select(**filters)
+        execs = self.sql.executions.select(prefetch=prefetch, **filters)
         return execs
 
+    def executions_by_ids(self, execution_ids, prefetch=None) -> Dict[int, zoe_lib.state.Execution]:
+        """Lookup many executions by their IDs with a single query, for internal use by pages that do their own permission checks."""
+        if len(execution_ids) == 0:
+            return {}
+        return {e.id: e for e in self.sql.executions.select(id=list(execution_ids), prefetch=prefetch)}
+
     def execution_count(self, user: zoe_lib.state.User, **filters):
         """Count the number of executions optionally filtered."""
         if not user.role.can_operate_others:
@@ -75,24 +115,13 @@ class APIEndpoint:
         """Check quota for given user and execution."""
         quota = self.sql.quota.select(only_one=True, **{'id': user.quota_id})
 
-        running_execs = self.sql.executions.select(**{'status': 'running', 'user_id': user.id})
-        running_execs += self.sql.executions.select(**{'status': 'starting', 'user_id': user.id})
-        running_execs += self.sql.executions.select(**{'status': 'queued', 'user_id': user.id})
-        running_execs += self.sql.executions.select(**{'status': 'image download', 'user_id': user.id})
-        running_execs += self.sql.executions.select(**{'status': 'submitted', 'user_id': user.id})
-        if quota.concurrent_executions != 0 and len(running_execs) >= quota.concurrent_executions:
+        running_count, reserved_cores, reserved_mem = self.sql.executions.usage(user.id, ACTIVE_STATUSES)
+        if quota.concurrent_executions != 0 and running_count >= quota.concurrent_executions:
             raise zoe_api.exceptions.ZoeQuotaException('You cannot run more than {} executions at a time, quota exceeded.'.format(quota.concurrent_executions))
 
         if quota.cores == 0 and quota.memory == 0:
             return
 
-        reserved_cores = 0
-        reserved_mem = 0
-        for e in running_execs:
-            for service in e.services:
-                reserved_cores += service.resource_reservation.cores.min
-                reserved_mem += service.resource_reservation.memory.min
-
         new_exec_cores = 0
         new_exec_memory = 0
         for service in application_description['services']:
@@ -157,6 +186,10 @@ class APIEndpoint:
         status, message = self.master.execution_delete(exec_id)
         if status:
             self.sql.executions.delete(exec_id)
+            with self._execution_owners_lock:
+                self._execution_owners.pop(exec_id, None)
+            if self.status_listener is not None:
+                self.status_listener.forget(exec_id)
         else:
             raise zoe_api.exceptions.ZoeRestAPIException(message)
 
@@ -202,12 +235,36 @@ class APIEndpoint:
         else:
             raise zoe_api.exceptions.ZoeException(message=message)
 
+    def image_preload(self, user: zoe_lib.state.User, image_name: str, seed_nodes=0):
+        """Start pulling an image on all the nodes, return the initial progress report."""
+        if not user.role.can_change_config:
+            raise zoe_api.exceptions.ZoeAuthException()
+        if seed_nodes < 0:
+            raise zoe_api.exceptions.ZoeRestAPIException('The number of seed nodes cannot be negative')
+        success, message = self.master.image_preload(image_name, seed_nodes)
+        if success:
+            return message
+        else:
+            raise zoe_api.exceptions.ZoeException(message=message)
+
+    def image_preload_status(self, user: zoe_lib.state.User):
+        """Return the progress of the most recent preload of each image."""
+        if not user.role.can_change_config:
+            raise zoe_api.exceptions.ZoeAuthException()
+        success, message = self.master.image_preload_status()
+        if success:
+            return message
+        else:
+            raise zoe_api.exceptions.ZoeException(message=message)
+
     def execution_endpoints(self, user: zoe_lib.state.User, execution: zoe_lib.state.Execution):
         """Return a list of the services and public endpoints available for a certain execution."""
-        services_info = []
+        if execution.user_id != user.id and not user.role.can_operate_others:
+            raise zoe_api.exceptions.ZoeAuthException()
+        self.sql.executions.prefetch([execution], ('services', 'services.ports'))
+        services_info = execution.services
         endpoints = []
-        for service in execution.services:
-            services_info.append(self.service_by_id(user, service.id))
+        for service in services_info:
             for port in service.ports:
                 if port.external_ip is not None:
                     if zoe_lib.config.get_conf().traefik_zk_ips is None or not port.enable_proxy:
@@ -409,11 +466,7 @@ class APIEndpoint:
 
     def verify_runtime_limit(self):
         """Scan the active executions and kill all those that exceed the runtime_limit quota."""
-        running_execs = self.sql.executions.select(**{'status': 'running'})
-        running_execs += self.sql.executions.select(**{'status': 'starting'})
-        running_execs += self.sql.executions.select(**{'status': 'queued'})
-        running_execs += self.sql.executions.select(**{'status': 'image download'})
-        running_execs += self.sql.executions.select(**{'status': 'submitted'})
+        running_execs = self.sql.executions.select(status=ACTIVE_STATUSES, prefetch=['owner'])
 
         for e in running_execs:
             runtime_limit = e.owner.quota.runtime_limit
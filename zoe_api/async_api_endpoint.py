@@ -0,0 +1,62 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Non-blocking access to the API endpoint, for the Tornado request handlers."""
+
+from concurrent.futures import ThreadPoolExecutor, Future
+import threading
+
+from zoe_lib.config import get_conf
+
+
+class AsyncAPIEndpoint:
+    """
+    Coroutine-friendly versions of the APIEndpoint methods.
+
+    Each method has the same arguments as the APIEndpoint one and returns a future that handlers can yield. The blocking database code runs in a pool of threads, each with its own DB connection, so a slow query does not stall the IOLoop.
+
+    :type api_endpoint: zoe_api.api_endpoint.APIEndpoint
+    """
+    def __init__(self, api_endpoint):
+        self.api_endpoint = api_endpoint
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(get_conf().api_db_workers, thread_name_prefix='api_db')
+            return self._pool
+
+    def run(self, func, *args, **kwargs) -> Future:
+        """Run any blocking function in the database thread pool, e.g. the serialization of records with lazy relations."""
+        return self._get_pool().submit(func, *args, **kwargs)
+
+    def __getattr__(self, name):
+        method = getattr(self.api_endpoint, name)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(name)
+
+        def _async_method(*args, **kwargs):
+            return self.run(method, *args, **kwargs)
+        _async_method.__doc__ = method.__doc__
+        return _async_method
+
+    def shutdown(self):
+        """Wait for the running queries and stop the threads."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -18,11 +18,13 @@
 import base64
 import logging
 
+import tornado.gen
 import tornado.web
 import tornado.websocket
 import tornado.escape
 
 from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.async_api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.auth.base import BaseAuthenticator
 from zoe_api.exceptions import ZoeAuthException
 
@@ -36,8 +38,22 @@ class ZoeRequestHandler(tornado.web.RequestHandler):
         """Initializes the request handler."""
         super().initialize()
         self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.async_api = self.api_endpoint.async_api  # type: AsyncAPIEndpoint
+        self._auth_result = None
 
-    def get_current_user(self):
+    @tornado.gen.coroutine
+    def prepare(self):
+        """Authenticate the request in the database thread pool, before the handler method runs."""
+        self._auth_result = yield self.async_api.run(self._authenticate)
+
+    def _authenticate(self):
+        """Return a (user, exception) tuple for the user making the request."""
+        try:
+            return self._find_user(), None
+        except ZoeAuthException as e:
+            return None, e
+
+    def _find_user(self):
         """Get the user making the request from one of several possible locations."""
         auth_header = self.request.headers.get('Authorization')
         if self.get_secure_cookie('zoe'):  # cookie auth
@@ -57,6 +73,15 @@ class ZoeRequestHandler(tornado.web.RequestHandler):
 
         return user
 
+    def get_current_user(self):
+        """Get the user making the request, already looked up by prepare()."""
+        if self._auth_result is None:
+            self._auth_result = self._authenticate()
+        user, error = self._auth_result
+        if error is not None:
+            raise error
+        return user
+
     def on_finish(self):
         """Log request."""
         try:
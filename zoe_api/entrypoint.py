@@ -27,6 +27,7 @@ import zoe_lib.state
 import zoe_api.api_endpoint
 import zoe_api.rest_api
 import zoe_api.master_api
+import zoe_api.status_listener
 import zoe_api.web
 import zoe_api.auth.ldap
 from zoe_api.web.request_handler import JinjaApp
@@ -57,8 +58,10 @@ def zoe_web_main(test_conf=None) -> int:
     sql_manager = zoe_lib.state.SQLManager(zoe_lib.config.get_conf())
     sql_manager.init_db()
 
+    status_listener = zoe_api.status_listener.StatusListener(sql_manager)
+
     master_api = zoe_api.master_api.APIManager()
-    api_endpoint = zoe_api.api_endpoint.APIEndpoint(master_api, sql_manager)
+    api_endpoint = zoe_api.api_endpoint.APIEndpoint(master_api, sql_manager, status_listener)
 
     app_settings = {
         'static_path': os.path.join(os.path.dirname(__file__), "web", "static"),
@@ -84,4 +87,7 @@ def zoe_web_main(test_conf=None) -> int:
     except KeyboardInterrupt:
         print("CTRL-C detected, terminating")
 
+    api_endpoint.async_api.shutdown()
+    status_listener.quit()
+
     return 0
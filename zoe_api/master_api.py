@@ -16,6 +16,7 @@
 """The client side of the ZeroMQ API."""
 
 import logging
+import threading
 from typing import Dict, Any, Tuple
 
 import zmq
@@ -28,7 +29,7 @@ APIReturnType = Tuple[bool, str]
 
 
 class APIManager:
-    """Main class for the API."""
+    """Main class for the API, requests from many threads are sent one at a time on the same REQ socket."""
     REQUEST_TIMEOUT = 2500  # type: int
     REQUEST_RETRIES = 1  # type: int
 
@@ -37,6 +38,7 @@ class APIManager:
         self.zmq_s = None
         self.poll = zmq.Poller()
         self.master_uri = zoe_lib.config.get_conf().master_url  # type: str
+        self._lock = threading.Lock()
         self._connect()
 
     def _connect(self):
@@ -56,27 +58,28 @@ class APIManager:
         """
         Implements the Lazy Pirate Pattern for a reliable client communication.
         """
-        self._connect()  # Make sure we are connected
-        retries_left = self.REQUEST_RETRIES
-        while retries_left:
-            self.zmq_s.send_json(message)  # send the message
-            socks = dict(self.poll.poll(self.REQUEST_TIMEOUT))
-            if socks.get(self.zmq_s) == zmq.POLLIN:  # We have a reply
-                reply = self.zmq_s.recv_json()
-                if reply['result'] == 'ok':
-                    return True, '' if 'data' not in reply else reply['data']
-                else:
-                    return False, reply['message']
-            else:  # Timeout
-                retries_left -= 1
-                log.warning('Timeout waiting for master reply')
-                self._disconnect()
-                if retries_left == 0:
-                    log.error('Master is unreachable, abandoning API request')
-                    return False, 'Master is unreachable, abandoning API request'
-                log.warning('Reconnecting and retrying request...')
-                self._connect()
-        return False, 'Master is unreachable, abandoning API request'
+        with self._lock:  # a REQ socket must alternate send and recv
+            self._connect()  # Make sure we are connected
+            retries_left = self.REQUEST_RETRIES
+            while retries_left:
+                self.zmq_s.send_json(message)  # send the message
+                socks = dict(self.poll.poll(self.REQUEST_TIMEOUT))
+                if socks.get(self.zmq_s) == zmq.POLLIN:  # We have a reply
+                    reply = self.zmq_s.recv_json()
+                    if reply['result'] == 'ok':
+                        return True, '' if 'data' not in reply else reply['data']
+                    else:
+                        return False, reply['message']
+                else:  # Timeout
+                    retries_left -= 1
+                    log.warning('Timeout waiting for master reply')
+                    self._disconnect()
+                    if retries_left == 0:
+                        log.error('Master is unreachable, abandoning API request')
+                        return False, 'Master is unreachable, abandoning API request'
+                    log.warning('Reconnecting and retrying request...')
+                    self._connect()
+            return False, 'Master is unreachable, abandoning API request'
 
     def execution_start(self, exec_id: int) -> APIReturnType:
         """Start an execution."""
@@ -109,3 +112,19 @@ class APIManager:
             'command': 'scheduler_stats'
         }
         return self._request_reply(msg)
+
+    def image_preload(self, image_name: str, seed_nodes: int) -> APIReturnType:
+        """Start pulling an image on all the nodes."""
+        msg = {
+            'command': 'image_preload',
+            'image_name': image_name,
+            'seed_nodes': seed_nodes
+        }
+        return self._request_reply(msg)
+
+    def image_preload_status(self) -> APIReturnType:
+        """Query the progress of the image preloads."""
+        msg = {
+            'command': 'image_preload_status'
+        }
+        return self._request_reply(msg)
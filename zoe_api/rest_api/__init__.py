@@ -19,7 +19,7 @@ from typing import List
 
 import tornado.web
 
-from zoe_api.rest_api.execution import ExecutionAPI, ExecutionCollectionAPI, ExecutionDeleteAPI, ExecutionEndpointsAPI
+from zoe_api.rest_api.execution import ExecutionAPI, ExecutionCollectionAPI, ExecutionDeleteAPI, ExecutionEndpointsAPI, ExecutionStatusAPI
 from zoe_api.rest_api.info import InfoAPI
 from zoe_api.rest_api.user import UserAPI, UserCollectionAPI, UserOAuthCallbackAPI
 from zoe_api.rest_api.role import RoleAPI, RoleCollectionAPI
@@ -27,6 +27,7 @@ from zoe_api.rest_api.quota import QuotaAPI, QuotaCollectionAPI
 from zoe_api.rest_api.service import ServiceAPI, ServiceLogsAPI
 from zoe_api.rest_api.discovery import DiscoveryAPI
 from zoe_api.rest_api.statistics import SchedulerStatsAPI
+from zoe_api.rest_api.image import ImagePreloadAPI
 from zoe_api.rest_api.login import LoginAPI
 from zoe_api.rest_api.validation import ZAppValidateAPI
 
@@ -59,6 +60,7 @@ def api_init(api_endpoint) -> List[tornado.web.URLSpec]:
         tornado.web.url(api_path + r'/execution/([0-9]+)', ExecutionAPI, route_args),
         tornado.web.url(api_path + r'/execution/delete/([0-9]+)', ExecutionDeleteAPI, route_args),
         tornado.web.url(api_path + r'/execution/endpoints/([0-9]+)', ExecutionEndpointsAPI, route_args),
+        tornado.web.url(api_path + r'/execution/status/([0-9]+)', ExecutionStatusAPI, route_args),
         tornado.web.url(api_path + r'/execution', ExecutionCollectionAPI, route_args),
 
         tornado.web.url(api_path + r'/service/([0-9]+)', ServiceAPI, route_args),
@@ -66,7 +68,9 @@ def api_init(api_endpoint) -> List[tornado.web.URLSpec]:
 
         tornado.web.url(api_path + r'/discovery/by_group/([0-9]+)/([a-z0-9A-Z\-]+)', DiscoveryAPI, route_args),
 
-        tornado.web.url(api_path + r'/statistics/scheduler', SchedulerStatsAPI, route_args)
+        tornado.web.url(api_path + r'/statistics/scheduler', SchedulerStatsAPI, route_args),
+
+        tornado.web.url(api_path + r'/image/preload', ImagePreloadAPI, route_args)
     ]
 
     return api_routes
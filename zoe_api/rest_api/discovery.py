@@ -15,6 +15,8 @@
 
 """The Discovery API endpoint."""
 
+import tornado.gen
+
 from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
 from zoe_api.exceptions import ZoeException
 
@@ -22,6 +24,7 @@ from zoe_api.exceptions import ZoeException
 class DiscoveryAPI(ZoeAPIRequestHandler):
     """The Discovery API endpoint."""
 
+    @tornado.gen.coroutine
     def get(self, execution_id: int, service_group: str):
         """HTTP GET method."""
         if self.current_user is None:
@@ -33,11 +36,11 @@ class DiscoveryAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            self.api_endpoint.execution_by_id(self.current_user, execution_id)
+            yield self.async_api.execution_by_id(self.current_user, execution_id)
             if service_group != 'all':
-                services = self.api_endpoint.service_list(self.current_user, service_group=service_group, execution_id=execution_id)
+                services = yield self.async_api.service_list(self.current_user, service_group=service_group, execution_id=execution_id)
             else:
-                services = self.api_endpoint.service_list(self.current_user, execution_id=execution_id)
+                services = yield self.async_api.service_list(self.current_user, execution_id=execution_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
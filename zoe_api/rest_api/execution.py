@@ -15,15 +15,33 @@
 
 """The Execution API endpoints."""
 
+import datetime
+
 import tornado.escape
+import tornado.gen
+import tornado.ioloop
+import tornado.iostream
+import tornado.locks
 
 from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
 from zoe_api.exceptions import ZoeException
 
+STATUS_WAIT_TIMEOUT = 30
+STREAM_FLUSH_COUNT = 500
+
+
+def _serialize_page(api_endpoint, user, filters):
+    """Read a page of STREAM_FLUSH_COUNT executions, return how many were read, the lowest ID and the executions as JSON object members."""
+    executions = api_endpoint.execution_list(user, prefetch=['services'], limit=STREAM_FLUSH_COUNT, **filters)
+    if len(executions) == 0:
+        return 0, None, ''
+    return len(executions), executions[-1].id, ', '.join('{}: {}'.format(tornado.escape.json_encode(str(e.id)), tornado.escape.json_encode(e.serialize())) for e in executions)
+
 
 class ExecutionAPI(ZoeAPIRequestHandler):
     """The Execution API endpoint."""
 
+    @tornado.gen.coroutine
     def get(self, execution_id):
         """GET a single execution by its ID."""
         if self.current_user is None:
@@ -35,13 +53,14 @@ class ExecutionAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            e = self.api_endpoint.execution_by_id(self.current_user, execution_id)
+            e = yield self.async_api.execution_by_id(self.current_user, execution_id, prefetch=['services'])
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
 
         self.write(e.serialize())
 
+    @tornado.gen.coroutine
     def delete(self, execution_id: int):
         """
         Terminate an execution.
@@ -57,16 +76,65 @@ class ExecutionAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            self.api_endpoint.execution_terminate(self.current_user, execution_id, 'user {} request from API'.format(self.current_user))
+            yield self.async_api.execution_terminate(self.current_user, execution_id, 'user {} request from API'.format(self.current_user))
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
         else:
             self.set_status(204)
 
 
+class ExecutionStatusAPI(ZoeAPIRequestHandler):
+    """The ExecutionStatus API endpoint."""
+
+    @tornado.gen.coroutine
+    def get(self, execution_id):
+        """
+        GET the status of an execution.
+
+        With the wait_change argument set to the status known by the client, the reply is delayed until the status changes or a timeout expires.
+        """
+        if self.current_user is None:
+            return
+
+        execution_id = int(execution_id)
+        known_status = self.get_argument('wait_change', None)
+        listener = self.api_endpoint.status_listener
+        if listener is not None and not listener.connected.is_set():
+            listener = None  # changes would not be pushed, reply immediately
+
+        changed = tornado.locks.Event()
+        io_loop = tornado.ioloop.IOLoop.current()
+
+        def _status_changed(table_name, record_id, changes):
+            """Called by the listener thread."""
+            if table_name == 'execution' and record_id == execution_id and 'status' in changes:
+                io_loop.add_callback(changed.set)
+
+        if known_status is not None and listener is not None:
+            listener.subscribe(_status_changed)
+        try:
+            status = yield self.async_api.execution_status(self.current_user, execution_id)
+            if known_status is not None and listener is not None and status == known_status:
+                try:
+                    yield changed.wait(timeout=datetime.timedelta(seconds=STATUS_WAIT_TIMEOUT))
+                except tornado.gen.TimeoutError:
+                    pass
+                else:
+                    status = yield self.async_api.execution_status(self.current_user, execution_id)
+        except ZoeException as e:
+            self.set_status(e.status_code, e.message)
+            return
+        finally:
+            if listener is not None:
+                listener.unsubscribe(_status_changed)
+
+        self.write({'status': status})
+
+
 class ExecutionDeleteAPI(ZoeAPIRequestHandler):
     """The ExecutionDelete API endpoints."""
 
+    @tornado.gen.coroutine
     def delete(self, execution_id: int):
         """
         Delete an execution.
@@ -82,7 +150,7 @@ class ExecutionDeleteAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            self.api_endpoint.execution_delete(self.current_user, execution_id)
+            yield self.async_api.execution_delete(self.current_user, execution_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
         else:
@@ -92,6 +160,7 @@ class ExecutionDeleteAPI(ZoeAPIRequestHandler):
 class ExecutionCollectionAPI(ZoeAPIRequestHandler):
     """The Execution Collection API endpoints."""
 
+    @tornado.gen.coroutine
     def get(self):
         """
         Returns a list of all active executions.
@@ -102,6 +171,7 @@ class ExecutionCollectionAPI(ZoeAPIRequestHandler):
         * name: execution mane
         * user_id: user_id owning the execution (admin only)
         * limit: limit the number of returned entries
+        * last_seen: only executions with an ID lower than this one, use the lowest ID of a page together with limit to get the next page
         * earlier_than_submit: all execution that where submitted earlier than this timestamp
         * earlier_than_start: all execution that started earlier than this timestamp
         * earlier_than_end: all execution that ended earlier than this timestamp
@@ -111,6 +181,8 @@ class ExecutionCollectionAPI(ZoeAPIRequestHandler):
 
         All timestamps should be passed as number of seconds since the epoch (UTC timezone).
 
+        Without a limit the list is streamed to the client while it is read from the database.
+
         example:  curl -u 'username:password' -X GET 'http://bf5:8080/api/0.6/execution?limit=1&status=terminated'
 
         :return:
@@ -125,6 +197,7 @@ class ExecutionCollectionAPI(ZoeAPIRequestHandler):
             ('name', str),
             ('user_id', str),
             ('limit', int),
+            ('last_seen', int),
             ('earlier_than_submit', int),
             ('earlier_than_start', int),
             ('earlier_than_end', int),
@@ -137,16 +210,54 @@ class ExecutionCollectionAPI(ZoeAPIRequestHandler):
                 if filt[1] == str:
                     filt_dict[filt[0]] = self.request.arguments[filt[0]][0].decode('utf-8')
                 else:
-                    filt_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
+                    try:
+                        filt_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
+                    except ValueError:
+                        self.set_status(400, "Parameter {} must be an integer".format(filt[0]))
+                        return
+
+        if 'limit' not in filt_dict:
+            yield self._stream_executions(filt_dict)
+            return
 
         try:
-            execs = self.api_endpoint.execution_list(self.current_user, **filt_dict)
+            execs = yield self.async_api.execution_list(self.current_user, prefetch=['services'], **filt_dict)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
 
         self.write({e.id: e.serialize() for e in execs})
 
+    @tornado.gen.coroutine
+    def _stream_executions(self, filt_dict):
+        """
+        Write the JSON object with all the executions a few at a time, so that the whole list is never in memory.
+
+        Each page is an independent keyset query run in the database thread pool, that starts after the lowest ID of the previous page. The first page is read before anything is written, so that errors in the request are still returned with their status code.
+        """
+        try:
+            count, last_id, chunk = yield self.async_api.run(_serialize_page, self.async_api.api_endpoint, self.current_user, dict(filt_dict))
+        except ZoeException as e:
+            self.set_status(e.status_code, e.message)
+            return
+
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write('{')
+        separator = ''
+        while count > 0:
+            self.write(separator + chunk)
+            separator = ', '
+            try:
+                yield self.flush()
+            except tornado.iostream.StreamClosedError:
+                return  # the client went away, nothing is left open
+            if count < STREAM_FLUSH_COUNT:
+                break
+            filt_dict['last_seen'] = last_id
+            count, last_id, chunk = yield self.async_api.run(_serialize_page, self.async_api.api_endpoint, self.current_user, dict(filt_dict))
+        self.write('}')
+
+    @tornado.gen.coroutine
     def post(self):
         """
         Starts an execution, given an application description. Takes a JSON object.
@@ -166,7 +277,7 @@ class ExecutionCollectionAPI(ZoeAPIRequestHandler):
         exec_name = data['name']
 
         try:
-            new_id = self.api_endpoint.execution_start(self.current_user, exec_name, application_description)
+            new_id = yield self.async_api.execution_start(self.current_user, exec_name, application_description)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -178,6 +289,7 @@ class ExecutionCollectionAPI(ZoeAPIRequestHandler):
 class ExecutionEndpointsAPI(ZoeAPIRequestHandler):
     """The ExecutionEndpoints API endpoint."""
 
+    @tornado.gen.coroutine
     def get(self, execution_id: int):
         """
         Get a list of execution endpoints.
@@ -193,8 +305,8 @@ class ExecutionEndpointsAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            execution = self.api_endpoint.execution_by_id(self.current_user, execution_id)
-            services_, endpoints = self.api_endpoint.execution_endpoints(self.current_user, execution)
+            execution = yield self.async_api.execution_by_id(self.current_user, execution_id)
+            services_, endpoints = yield self.async_api.execution_endpoints(self.current_user, execution)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -0,0 +1,63 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The Image API endpoints."""
+
+import tornado.escape
+import tornado.gen
+
+from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
+from zoe_api.exceptions import ZoeException
+
+
+class ImagePreloadAPI(ZoeAPIRequestHandler):
+    """The ImagePreload API endpoint."""
+
+    @tornado.gen.coroutine
+    def get(self):
+        """HTTP GET method, returns the progress of image preloads on each node."""
+        if self.current_user is None:
+            return
+
+        try:
+            preloads = yield self.async_api.image_preload_status(self.current_user)
+        except ZoeException as e:
+            self.set_status(e.status_code, e.message)
+            return
+
+        self.write({'preloads': preloads})
+
+    @tornado.gen.coroutine
+    def post(self):
+        """HTTP POST method, starts pulling an image on all nodes. Takes a JSON object."""
+        if self.current_user is None:
+            return
+
+        try:
+            data = tornado.escape.json_decode(self.request.body)
+            image_name = data['image']
+            seed_nodes = int(data.get('seed_nodes', 0))
+        except (ValueError, KeyError, TypeError):
+            self.set_status(400, 'Error decoding JSON data')
+            return
+
+        try:
+            preload = yield self.async_api.image_preload(self.current_user, image_name, seed_nodes)
+        except ZoeException as e:
+            self.set_status(e.status_code, e.message)
+            return
+
+        self.set_status(201)
+        self.write({'preload': preload})
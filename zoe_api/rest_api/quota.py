@@ -16,6 +16,7 @@
 """The Quota API endpoints."""
 
 import tornado.escape
+import tornado.gen
 
 from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
 from zoe_api.exceptions import ZoeException
@@ -24,6 +25,7 @@ from zoe_api.exceptions import ZoeException
 class QuotaAPI(ZoeAPIRequestHandler):
     """The Quota API endpoint. Ops on a single quota."""
 
+    @tornado.gen.coroutine
     def get(self, quota_id):
         """HTTP GET method."""
         if self.current_user is None:
@@ -35,7 +37,7 @@ class QuotaAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            quota = self.api_endpoint.quota_by_id(quota_id)
+            quota = yield self.async_api.quota_by_id(quota_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -46,6 +48,7 @@ class QuotaAPI(ZoeAPIRequestHandler):
 
         self.write(ret)
 
+    @tornado.gen.coroutine
     def post(self, quota_id):
         """HTTP POST method, to edit a quota."""
         if self.current_user is None:
@@ -63,7 +66,7 @@ class QuotaAPI(ZoeAPIRequestHandler):
             return
 
         try:
-            self.api_endpoint.quota_update(self.current_user, quota_id, data)
+            yield self.async_api.quota_update(self.current_user, quota_id, data)
         except KeyError:
             self.set_status(400, 'Error decoding JSON data')
             return
@@ -73,6 +76,7 @@ class QuotaAPI(ZoeAPIRequestHandler):
 
         self.set_status(201)
 
+    @tornado.gen.coroutine
     def delete(self, quota_id: int):
         """HTTP DELETE method."""
         if self.current_user is None:
@@ -84,7 +88,7 @@ class QuotaAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            self.api_endpoint.quota_delete(self.current_user, quota_id)
+            yield self.async_api.quota_delete(self.current_user, quota_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -94,6 +98,7 @@ class QuotaAPI(ZoeAPIRequestHandler):
 class QuotaCollectionAPI(ZoeAPIRequestHandler):
     """The QuotaCollection API. Ops that interact with the Quota collection."""
 
+    @tornado.gen.coroutine
     def get(self):
         """HTTP GET method"""
         if self.current_user is None:
@@ -112,13 +117,14 @@ class QuotaCollectionAPI(ZoeAPIRequestHandler):
                     filter_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
 
         try:
-            quota = self.api_endpoint.quota_list(self.current_user, **filter_dict)
+            quota = yield self.async_api.quota_list(self.current_user, **filter_dict)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
 
         self.write({r.id: r.serialize() for r in quota})
 
+    @tornado.gen.coroutine
     def post(self):
         """HTTP POST method."""
         if self.current_user is None:
@@ -131,7 +137,7 @@ class QuotaCollectionAPI(ZoeAPIRequestHandler):
             return
 
         try:
-            new_id = self.api_endpoint.quota_new(self.current_user, data)
+            new_id = yield self.async_api.quota_new(self.current_user, data)
         except KeyError:
             self.set_status(400, 'Error decoding JSON data')
             return
@@ -16,6 +16,7 @@
 """The Role API endpoints."""
 
 import tornado.escape
+import tornado.gen
 
 from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
 from zoe_api.exceptions import ZoeException
@@ -24,6 +25,7 @@ from zoe_api.exceptions import ZoeException
 class RoleAPI(ZoeAPIRequestHandler):
     """The Role API endpoint. Ops on a single role."""
 
+    @tornado.gen.coroutine
     def get(self, role_id):
         """HTTP GET method."""
         if self.current_user is None:
@@ -35,7 +37,7 @@ class RoleAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            role = self.api_endpoint.role_by_id(role_id)
+            role = yield self.async_api.role_by_id(role_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -46,6 +48,7 @@ class RoleAPI(ZoeAPIRequestHandler):
 
         self.write(ret)
 
+    @tornado.gen.coroutine
     def post(self, role_id):
         """HTTP POST method, to edit a role."""
         if self.current_user is None:
@@ -63,7 +66,7 @@ class RoleAPI(ZoeAPIRequestHandler):
             return
 
         try:
-            self.api_endpoint.role_update(self.current_user, role_id, data)
+            yield self.async_api.role_update(self.current_user, role_id, data)
         except KeyError:
             self.set_status(400, 'Error decoding JSON data')
             return
@@ -73,6 +76,7 @@ class RoleAPI(ZoeAPIRequestHandler):
 
         self.set_status(201)
 
+    @tornado.gen.coroutine
     def delete(self, role_id: int):
         """HTTP DELETE method."""
         if self.current_user is None:
@@ -84,7 +88,7 @@ class RoleAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            self.api_endpoint.role_delete(self.current_user, role_id)
+            yield self.async_api.role_delete(self.current_user, role_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -94,6 +98,7 @@ class RoleAPI(ZoeAPIRequestHandler):
 class RoleCollectionAPI(ZoeAPIRequestHandler):
     """The RoleCollection API. Ops that interact with the Role collection."""
 
+    @tornado.gen.coroutine
     def get(self):
         """HTTP GET method"""
         if self.current_user is None:
@@ -112,13 +117,14 @@ class RoleCollectionAPI(ZoeAPIRequestHandler):
                     filter_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
 
         try:
-            role = self.api_endpoint.role_list(self.current_user, **filter_dict)
+            role = yield self.async_api.role_list(self.current_user, **filter_dict)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
 
         self.write({r.id: r.serialize() for r in role})
 
+    @tornado.gen.coroutine
     def post(self):
         """HTTP POST method."""
         if self.current_user is None:
@@ -131,7 +137,7 @@ class RoleCollectionAPI(ZoeAPIRequestHandler):
             return
 
         try:
-            new_id = self.api_endpoint.role_new(self.current_user, data)
+            new_id = yield self.async_api.role_new(self.current_user, data)
         except KeyError:
             self.set_status(400, 'Error decoding JSON data')
             return
@@ -32,6 +32,7 @@ THREAD_POOL = ThreadPoolExecutor(20)
 class ServiceAPI(ZoeAPIRequestHandler):
     """The Service API endpoint."""
 
+    @tornado.gen.coroutine
     def get(self, service_id):
         """HTTP GET method."""
         if self.current_user is None:
@@ -43,12 +44,13 @@ class ServiceAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            service = self.api_endpoint.service_by_id(self.current_user, service_id)
+            service = yield self.async_api.service_by_id(self.current_user, service_id)
+            ret = yield self.async_api.run(service.serialize)  # reads the ports
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
 
-        self.write(service.serialize())
+        self.write(ret)
 
 
 class ServiceLogsAPI(ZoeAPIRequestHandler):
@@ -80,7 +82,7 @@ class ServiceLogsAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            log_obj = self.api_endpoint.service_logs(self.current_user, service_id)
+            log_obj = yield self.async_api.service_logs(self.current_user, service_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
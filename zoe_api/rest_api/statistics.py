@@ -15,6 +15,8 @@
 
 """The Scheduler Statistics API endpoint."""
 
+import tornado.gen
+
 from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
 from zoe_api.exceptions import ZoeException
 
@@ -22,10 +24,11 @@ from zoe_api.exceptions import ZoeException
 class SchedulerStatsAPI(ZoeAPIRequestHandler):
     """The Scheduler Statistics API endpoint."""
 
+    @tornado.gen.coroutine
     def get(self):
         """HTTP GET method."""
         try:
-            statistics = self.api_endpoint.statistics_scheduler()
+            statistics = yield self.async_api.statistics_scheduler()
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -20,6 +20,7 @@ import os
 
 import requests
 import tornado.escape
+import tornado.gen
 
 from zoe_api.rest_api.request_handler import ZoeAPIRequestHandler
 from zoe_api.web.request_handler import ZoeWebRequestHandler
@@ -34,6 +35,7 @@ log = logging.getLogger(__name__)
 class UserAPI(ZoeAPIRequestHandler):
     """The User API endpoint. Ops on a single user."""
 
+    @tornado.gen.coroutine
     def get(self, user_id):
         """HTTP GET method."""
         if self.current_user is None:
@@ -50,7 +52,7 @@ class UserAPI(ZoeAPIRequestHandler):
             }
         else:
             try:
-                user = self.api_endpoint.user_by_id(self.current_user, user_id)
+                user = yield self.async_api.user_by_id(self.current_user, user_id)
             except ZoeException as e:
                 self.set_status(e.status_code, e.message)
                 return
@@ -60,6 +62,7 @@ class UserAPI(ZoeAPIRequestHandler):
 
         self.write(ret)
 
+    @tornado.gen.coroutine
     def post(self, user_id):
         """HTTP POST method, to edit a user."""
         if self.current_user is None:
@@ -77,7 +80,7 @@ class UserAPI(ZoeAPIRequestHandler):
             return
 
         try:
-            self.api_endpoint.user_update(self.current_user, user_id, data)
+            yield self.async_api.user_update(self.current_user, user_id, data)
         except KeyError:
             self.set_status(400, 'Error decoding JSON data')
             return
@@ -87,6 +90,7 @@ class UserAPI(ZoeAPIRequestHandler):
 
         self.set_status(201)
 
+    @tornado.gen.coroutine
     def delete(self, user_id: int):
         """HTTP DELETE method."""
         if self.current_user is None:
@@ -98,7 +102,7 @@ class UserAPI(ZoeAPIRequestHandler):
             self.set_status(400, "Parameter must be an integer")
 
         try:
-            self.api_endpoint.user_delete(self.current_user, user_id)
+            yield self.async_api.user_delete(self.current_user, user_id)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -108,6 +112,7 @@ class UserAPI(ZoeAPIRequestHandler):
 class UserCollectionAPI(ZoeAPIRequestHandler):
     """The UserCollection API. Ops that interact with the User collection."""
 
+    @tornado.gen.coroutine
     def get(self):
         """HTTP GET method"""
         if self.current_user is None:
@@ -138,13 +143,14 @@ class UserCollectionAPI(ZoeAPIRequestHandler):
                     filter_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
 
         try:
-            users = self.api_endpoint.user_list(self.current_user, **filter_dict)
+            users = yield self.async_api.user_list(self.current_user, **filter_dict)
         except ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
 
         self.write({u.id: u.serialize() for u in users})
 
+    @tornado.gen.coroutine
     def post(self):
         """HTTP POST method."""
         if self.current_user is None:
@@ -157,7 +163,7 @@ class UserCollectionAPI(ZoeAPIRequestHandler):
             return
 
         try:
-            new_id = self.api_endpoint.user_new(self.current_user, data['username'], data['email'], data['role_id'], data['quota_id'], data['auth_source'], data['fs_uid'])
+            new_id = yield self.async_api.user_new(self.current_user, data['username'], data['email'], data['role_id'], data['quota_id'], data['auth_source'], data['fs_uid'])
         except KeyError:
             self.set_status(400, 'Error decoding JSON data')
             return
@@ -171,6 +177,7 @@ class UserCollectionAPI(ZoeAPIRequestHandler):
 
 class UserOAuthCallbackAPI(ZoeWebRequestHandler):
     """The User OAUTH callback endpoint."""
+    @tornado.gen.coroutine
     def get(self):
         """Callback."""
         code = self.get_argument('code', None)
@@ -192,17 +199,17 @@ class UserOAuthCallbackAPI(ZoeWebRequestHandler):
             self.render('login.jinja2', error='No public email address set in GitLab settings', with_gitlab_oauth=with_gitlab_oauth)
             return
         username = data['nickname']
-        user = self.api_endpoint.user_by_name(username)
+        user = yield self.async_api.user_by_name(username)
         if user is not None:
             if user.email != email:
-                self.api_endpoint.user_update(user, user.id, {'email': email})
+                yield self.async_api.user_update(user, user.id, {'email': email})
         else:
             log.info('Creating new user {} from OAuth login'.format(username))
-            admin = self.api_endpoint.user_by_name('admin')
-            role = self.api_endpoint.role_by_name(zoe_lib.config.get_conf().oauth_role)
-            quota = self.api_endpoint.quota_by_name(zoe_lib.config.get_conf().oauth_quota)
-            self.api_endpoint.user_new(admin, username, email, role.id, quota.id, 'gitlab-eurecom', -1)
-            user = self.api_endpoint.user_by_name(username)
+            admin = yield self.async_api.user_by_name('admin')
+            role = yield self.async_api.role_by_name(zoe_lib.config.get_conf().oauth_role)
+            quota = yield self.async_api.quota_by_name(zoe_lib.config.get_conf().oauth_quota)
+            yield self.async_api.user_new(admin, username, email, role.id, quota.id, 'gitlab-eurecom', -1)
+            user = yield self.async_api.user_by_name(username)
             os.system('sudo {} {} {}'.format(zoe_lib.config.get_conf().oauth_create_workspace_script, user.username, user.fs_uid))
         if not self.get_secure_cookie('zoe'):
             cookie_val = user.username
@@ -0,0 +1,140 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Listener for the execution and service status change notifications sent by PostgreSQL."""
+
+from collections import OrderedDict
+import logging
+import select
+import threading
+from typing import Callable, Union
+
+import psycopg2
+
+from zoe_lib.config import get_conf
+from zoe_lib.state import SQLManager, notifications
+
+log = logging.getLogger(__name__)
+
+RECONNECT_INTERVAL = 5
+POLL_INTERVAL = 1
+CACHE_SIZE = 10000  # executions whose last known status is kept, the least recently used are dropped first
+
+
+class StatusListener(threading.Thread):
+    """
+    Keeps an in-memory cache of the status of executions, fed by the notifications sent by the database.
+
+    Only executions that changed since the listener connected are in the cache, for the others the database has to be queried as before. The cache holds at most CACHE_SIZE executions. Service status changes are only passed to the subscribed functions.
+    """
+
+    def __init__(self, state: SQLManager) -> None:
+        super().__init__(name='status_listener', daemon=True)
+        self.state = state
+        self.stop = threading.Event()
+        self.connected = threading.Event()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._listeners = []
+        self._listeners_lock = threading.Lock()
+        self.start()
+
+    def run(self):
+        """The thread loop, reconnects when the connection to the database is lost."""
+        while not self.stop.is_set():
+            try:
+                conn = self.state.listen_connection()
+                conn.cursor().execute('LISTEN "{}"'.format(notifications.channel_name(get_conf().deployment_name)))
+            except psycopg2.Error as e:
+                log.error('Cannot listen for status changes: {}'.format(e))
+                self.stop.wait(RECONNECT_INTERVAL)
+                continue
+
+            self.connected.set()
+            log.info('Listening for status changes')
+            try:
+                self._listen(conn)
+            except (psycopg2.Error, OSError) as e:
+                log.error('Lost the connection used for status changes: {}'.format(e))
+            finally:
+                # notifications may be lost until the connection is back
+                self.connected.clear()
+                with self._cache_lock:
+                    self._cache.clear()
+                conn.close()
+
+    def _listen(self, conn):
+        while not self.stop.is_set():
+            readable, writable_, exceptional_ = select.select([conn], [], [], POLL_INTERVAL)
+            if len(readable) == 0:
+                continue
+            conn.poll()
+            while len(conn.notifies) > 0:
+                self._process(conn.notifies.pop(0).payload)
+
+    def _process(self, payload):
+        try:
+            table_name, record_id, changes = notifications.parse_payload(payload)
+        except (ValueError, KeyError):
+            log.error('Invalid status change notification: {}'.format(payload))
+            return
+
+        if table_name == 'execution' and 'status' in changes:
+            with self._cache_lock:
+                self._cache[record_id] = changes['status']
+                self._cache.move_to_end(record_id)
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(table_name, record_id, changes)
+            except Exception:  # pylint: disable=broad-except
+                log.exception('Error in status change listener')
+
+    def subscribe(self, callback: Callable[[str, int, dict], None]) -> None:
+        """Register a function that will be called with the table name, the record ID and the changed columns. It is called in the listener thread and must not block."""
+        with self._listeners_lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, int, dict], None]) -> None:
+        """Remove a previously registered function."""
+        with self._listeners_lock:
+            try:
+                self._listeners.remove(callback)
+            except ValueError:
+                pass
+
+    def cached_status(self, execution_id: int) -> Union[str, None]:
+        """Return the last known status of an execution, or None if it has to be read from the database."""
+        if not self.connected.is_set():
+            return None
+        with self._cache_lock:
+            status = self._cache.get(execution_id)
+            if status is not None:
+                self._cache.move_to_end(execution_id)
+            return status
+
+    def forget(self, execution_id: int) -> None:
+        """Remove an execution from the cache, e.g. because it has been deleted."""
+        with self._cache_lock:
+            self._cache.pop(execution_id, None)
+
+    def quit(self):
+        """Stops the thread."""
+        self.stop.set()
+        self.join()
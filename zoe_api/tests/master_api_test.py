@@ -0,0 +1,60 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the client side of the ZeroMQ API."""
+
+import threading
+import time
+
+import zmq
+
+from zoe_api.master_api import APIManager
+from zoe_lib.config import load_configuration
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+
+
+def _serve(socket, count):
+    """Answer count requests slowly, so that the clients overlap."""
+    for request_ in range(count):
+        message = socket.recv_json()
+        time.sleep(0.05)
+        socket.send_json({'result': 'ok', 'data': message['command']})
+
+
+class TestAPIManager:
+    """The test class."""
+
+    def test_concurrent_requests(self, zoe_configuration):  # pylint: disable=redefined-outer-name
+        """Requests made by many threads at the same time all get their reply."""
+        context = zmq.Context()
+        master = context.socket(zmq.REP)
+        port = master.bind_to_random_port('tcp://127.0.0.1')
+        zoe_configuration.master_url = 'tcp://127.0.0.1:{}'.format(port)
+        load_configuration(zoe_configuration)
+        server = threading.Thread(target=_serve, args=(master, 3))
+        server.start()
+
+        api = APIManager()
+        replies = []
+        clients = [threading.Thread(target=lambda: replies.append(api.scheduler_statistics())) for client_ in range(3)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(timeout=5)
+        server.join(timeout=5)
+        master.close(linger=0)
+        api.zmq_s.close(linger=0)
+
+        assert replies == [(True, 'scheduler_stats')] * 3
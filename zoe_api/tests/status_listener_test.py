@@ -0,0 +1,65 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the status change listener."""
+
+import json
+
+from zoe_api import status_listener
+
+
+class MockStatusListener(status_listener.StatusListener):
+    """A listener that does not connect to the database."""
+    def start(self):
+        self.connected.set()
+
+
+def _payload(table_name, record_id, changes):
+    return json.dumps({'table': table_name, 'id': record_id, 'changes': changes})
+
+
+class TestStatusListener:
+    """The test class."""
+
+    def test_cache(self):
+        """Only execution statuses are cached, deleted executions are forgotten."""
+        listener = MockStatusListener(None)
+        listener._process(_payload('execution', 1, {'status': 'running'}))  # pylint: disable=protected-access
+        listener._process(_payload('service', 2, {'status': 'active'}))  # pylint: disable=protected-access
+        assert listener.cached_status(1) == 'running'
+        assert listener.cached_status(2) is None
+        listener.forget(1)
+        assert listener.cached_status(1) is None
+
+    def test_cache_size(self, monkeypatch):
+        """The least recently used executions are dropped when the cache is full."""
+        monkeypatch.setattr(status_listener, 'CACHE_SIZE', 2)
+        listener = MockStatusListener(None)
+        listener._process(_payload('execution', 1, {'status': 'running'}))  # pylint: disable=protected-access
+        listener._process(_payload('execution', 2, {'status': 'running'}))  # pylint: disable=protected-access
+        assert listener.cached_status(1) == 'running'
+        listener._process(_payload('execution', 3, {'status': 'queued'}))  # pylint: disable=protected-access
+        assert listener.cached_status(2) is None
+        assert listener.cached_status(1) == 'running'
+        assert listener.cached_status(3) == 'queued'
+
+    def test_subscribers(self):
+        """Subscribed functions receive the execution and the service changes."""
+        listener = MockStatusListener(None)
+        received = []
+        listener.subscribe(lambda table_name, record_id, changes: received.append((table_name, record_id, changes)))
+        listener._process(_payload('execution', 1, {'status': 'running'}))  # pylint: disable=protected-access
+        listener._process(_payload('service', 2, {'backend_status': 'started'}))  # pylint: disable=protected-access
+        assert received == [('execution', 1, {'status': 'running'}), ('service', 2, {'backend_status': 'started'})]
@@ -15,17 +15,24 @@
 
 """Main points of entry for the Zoe web interface."""
 
+import tornado.gen
+
 from zoe_api.web.request_handler import ZoeWebRequestHandler
 
 
 class UsersEndpointWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self):
         """User admin page."""
         if self.current_user is None or not self.current_user.role.can_change_config:
             return
 
+        roles = yield self.async_api.role_list(self.current_user)
+        quotas = yield self.async_api.quota_list(self.current_user)
+        users = yield self.async_api.user_list(self.current_user)
+
         template_vars = {
             'kind': 'users',
             'column_keys': ['username', 'email', 'enabled', 'priority', 'fs_uid', 'auth_source', 'role', 'quota'],
@@ -42,18 +49,24 @@ class UsersEndpointWeb(ZoeWebRequestHandler):
             },
             'lists': {
                 'auth_source': ['internal', 'pam', 'ldap', 'ldap+sasl', 'gitlab-eurecom'],
-                'role': self.api_endpoint.role_list(self.current_user),
-                'quota': self.api_endpoint.quota_list(self.current_user)
+                'role': roles,
+                'quota': quotas
             },
-            'rows': self.api_endpoint.user_list(self.current_user)
+            'rows': users
         }
         self.render('admin.jinja2', **template_vars)
 
+    @tornado.gen.coroutine
     def post(self):
         """Form submitted."""
         if self.current_user is None or not self.current_user.role.can_change_config:
             return
 
+        yield self.async_api.run(self._submit, self.current_user)
+        self.redirect(self.reverse_url('admin_users'))
+
+    def _submit(self, user):
+        """Apply the submitted form, runs in the database thread pool."""
         if self.get_argument('action') == 'update':
             user_id = int(self.get_argument('id'))
             user_data = {
@@ -65,29 +78,31 @@ class UsersEndpointWeb(ZoeWebRequestHandler):
                 'quota_id': self.api_endpoint.quota_by_name(self.get_argument('quota')).id
             }
 
-            self.api_endpoint.user_update(self.current_user, user_id, user_data)
+            self.api_endpoint.user_update(user, user_id, user_data)
         elif self.get_argument('action') == 'delete':
             user_id = int(self.get_argument('id'))
-            self.api_endpoint.user_delete(self.current_user, user_id)
+            self.api_endpoint.user_delete(user, user_id)
         elif self.get_argument('action') == 'create':
-            self.api_endpoint.user_new(self.current_user,
+            self.api_endpoint.user_new(user,
                                        self.get_argument('username'),
                                        None if self.get_argument('email') == '' or self.get_argument('email') == 'None' else self.get_argument('email'),
                                        self.api_endpoint.role_by_name(self.get_argument('role')).id,
                                        self.api_endpoint.quota_by_name(self.get_argument('quota')).id,
                                        self.get_argument('auth_source'),
                                        int(self.get_argument('fs_uid')))
-        self.redirect(self.reverse_url('admin_users'))
 
 
 class RolesEndpointWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self):
         """Roles admin page"""
         if self.current_user is None or not self.current_user.role.can_change_config:
             return
 
+        rows = yield self.async_api.role_list(self.current_user)
+
         template_vars = {
             'kind': 'roles',
             'column_keys': ['name', 'can_see_status', 'can_change_config', 'can_operate_others', 'can_delete_executions', 'can_access_api', 'can_customize_resources', 'can_access_full_zapp_shop'],
@@ -102,15 +117,21 @@ class RolesEndpointWeb(ZoeWebRequestHandler):
                 'can_customize_resources': 'bool',
                 'can_access_full_zapp_shop': 'bool'
             },
-            'rows': self.api_endpoint.role_list(self.current_user)
+            'rows': rows
         }
         self.render('admin.jinja2', **template_vars)
 
+    @tornado.gen.coroutine
     def post(self):
         """Form submitted."""
         if self.current_user is None or not self.current_user.role.can_change_config:
             return
 
+        yield self.async_api.run(self._submit, self.current_user)
+        self.redirect(self.reverse_url('admin_roles'))
+
+    def _submit(self, user):
+        """Apply the submitted form, runs in the database thread pool."""
         if self.get_argument('action') == 'update':
             role_id = int(self.get_argument('id'))
             role_data = {
@@ -123,10 +144,10 @@ class RolesEndpointWeb(ZoeWebRequestHandler):
                 'can_access_full_zapp_shop': self.get_argument('can_access_full_zapp_shop', 'off') == 'on'
             }
 
-            self.api_endpoint.role_update(self.current_user, role_id, role_data)
+            self.api_endpoint.role_update(user, role_id, role_data)
         elif self.get_argument('action') == 'delete':
             role_id = int(self.get_argument('id'))
-            self.api_endpoint.role_delete(self.current_user, role_id)
+            self.api_endpoint.role_delete(user, role_id)
         elif self.get_argument('action') == 'create':
             role_data = {
                 'name': self.get_argument('name'),
@@ -138,18 +159,20 @@ class RolesEndpointWeb(ZoeWebRequestHandler):
                 'can_customize_resources': self.get_argument('can_customize_resources', 'off') == 'on',
                 'can_access_full_zapp_shop': self.get_argument('can_access_full_zapp_shop', 'off') == 'on'
             }
-            self.api_endpoint.role_new(self.current_user, role_data)
-        self.redirect(self.reverse_url('admin_roles'))
+            self.api_endpoint.role_new(user, role_data)
 
 
 class QuotasEndpointWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self):
         """Quota admin page"""
         if self.current_user is None or not self.current_user.role.can_change_config:
             return
 
+        rows = yield self.async_api.quota_list(self.current_user)
+
         template_vars = {
             'kind': 'quotas',
             'column_keys': ['name', 'concurrent_executions', 'cores', 'memory', 'runtime_limit'],
@@ -161,15 +184,21 @@ class QuotasEndpointWeb(ZoeWebRequestHandler):
                 'memory': 'bytes',
                 'runtime_limit': 'number'
             },
-            'rows': self.api_endpoint.quota_list(self.current_user)
+            'rows': rows
         }
         self.render('admin.jinja2', **template_vars)
 
+    @tornado.gen.coroutine
     def post(self):
         """Form submitted."""
         if self.current_user is None or not self.current_user.role.can_change_config:
             return
 
+        yield self.async_api.run(self._submit, self.current_user)
+        self.redirect(self.reverse_url('admin_quotas'))
+
+    def _submit(self, user):
+        """Apply the submitted form, runs in the database thread pool."""
         if self.get_argument('action') == 'update':
             quota_id = int(self.get_argument('id'))
             quota_data = {
@@ -179,10 +208,10 @@ class QuotasEndpointWeb(ZoeWebRequestHandler):
                 'runtime_limit':  int(self.get_argument('runtime_limit'))
             }
 
-            self.api_endpoint.quota_update(self.current_user, quota_id, quota_data)
+            self.api_endpoint.quota_update(user, quota_id, quota_data)
         elif self.get_argument('action') == 'delete':
             quota_id = int(self.get_argument('id'))
-            self.api_endpoint.quota_delete(self.current_user, quota_id)
+            self.api_endpoint.quota_delete(user, quota_id)
         elif self.get_argument('action') == 'create':
             quota_data = {
                 'name': self.get_argument('name'),
@@ -191,5 +220,4 @@ class QuotasEndpointWeb(ZoeWebRequestHandler):
                 'memory': int(float(self.get_argument('memory')) * (1024 ** 3)),
                 'runtime_limit': int(self.get_argument('runtime_limit'))
             }
-            self.api_endpoint.quota_new(self.current_user, quota_data)
-        self.redirect(self.reverse_url('admin_quotas'))
+            self.api_endpoint.quota_new(user, quota_data)
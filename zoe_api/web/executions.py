@@ -20,6 +20,8 @@ import json
 import math
 import time
 
+import tornado.gen
+
 from zoe_lib.config import get_conf
 
 import zoe_api.exceptions
@@ -29,6 +31,7 @@ from zoe_api.web.request_handler import ZoeWebRequestHandler
 class ExecutionStartWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def post(self):
         """Start an execution."""
         if self.current_user is None:
@@ -39,7 +42,7 @@ class ExecutionStartWeb(ZoeWebRequestHandler):
         exec_name = self.get_argument('exec_name')
 
         try:
-            new_id = self.api_endpoint.execution_start(self.current_user, exec_name, app_descr)
+            new_id = yield self.async_api.execution_start(self.current_user, exec_name, app_descr)
         except zoe_api.exceptions.ZoeException as e:
             self.error_page(error_message=e.message)
             return
@@ -51,14 +54,15 @@ class ExecutionListWeb(ZoeWebRequestHandler):
     """Handler class"""
     PAGINATION_ITEM_COUNT = 50
 
+    @tornado.gen.coroutine
     def get(self, page=0):
         """Home page with authentication."""
         if self.current_user is None:
             return
 
         page = int(page)
-        executions_count = self.api_endpoint.execution_count(self.current_user)
-        executions = self.api_endpoint.execution_list(self.current_user, base=page*self.PAGINATION_ITEM_COUNT, limit=self.PAGINATION_ITEM_COUNT)
+        executions_count = yield self.async_api.execution_count(self.current_user)
+        executions = yield self.async_api.execution_list(self.current_user, base=page*self.PAGINATION_ITEM_COUNT, limit=self.PAGINATION_ITEM_COUNT, prefetch=['owner'])
 
         template_vars = {
             "user": self.current_user,
@@ -73,14 +77,15 @@ class ExecutionListWeb(ZoeWebRequestHandler):
 class ExecutionRestartWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self, execution_id: int):
         """Restart an already defined (and not running) execution."""
         if self.current_user is None:
             return
 
         try:
-            e = self.api_endpoint.execution_by_id(self.current_user, execution_id)
-            new_id = self.api_endpoint.execution_start(self.current_user, e.name, e.description)
+            e = yield self.async_api.execution_by_id(self.current_user, execution_id)
+            new_id = yield self.async_api.execution_start(self.current_user, e.name, e.description)
         except zoe_api.exceptions.ZoeException as e:
             self.error_page(error_message=e.message)
             return
@@ -91,13 +96,14 @@ class ExecutionRestartWeb(ZoeWebRequestHandler):
 class ExecutionTerminateWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self, execution_id: int):
         """Terminate an execution."""
         if self.current_user is None:
             return
 
         try:
-            self.api_endpoint.execution_terminate(self.current_user, execution_id, 'user {} request from web interface'.format(self.current_user.username))
+            yield self.async_api.execution_terminate(self.current_user, execution_id, 'user {} request from web interface'.format(self.current_user.username))
         except zoe_api.exceptions.ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
@@ -108,24 +114,26 @@ class ExecutionTerminateWeb(ZoeWebRequestHandler):
 class ExecutionInspectWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self, execution_id):
         """Gather details about an execution."""
         if self.current_user is None:
             return
 
         try:
-            e = self.api_endpoint.execution_by_id(self.current_user, execution_id)
+            e = yield self.async_api.execution_by_id(self.current_user, execution_id, prefetch=['owner'])
         except zoe_api.exceptions.ZoeException as ex:
             self.set_status(ex.status_code, ex.message)
             return
 
-        services_info, endpoints = self.api_endpoint.execution_endpoints(self.current_user, e)
+        services_info, endpoints = yield self.async_api.execution_endpoints(self.current_user, e)
+        runtime_limit = yield self.async_api.run(lambda: e.owner.quota.runtime_limit)
 
         template_vars = {
             "e": e,
             "services_info": services_info,
             "endpoints": endpoints,
-            'killed_at': e.time_submit + datetime.timedelta(hours=e.owner.quota.runtime_limit)
+            'killed_at': e.time_submit + datetime.timedelta(hours=runtime_limit)
         }
 
         if get_conf().enable_plots and e.time_start is not None:
@@ -143,13 +151,14 @@ class ExecutionInspectWeb(ZoeWebRequestHandler):
 class ServiceLogsWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self, service_id):
         """Gather details about an execution."""
         if self.current_user is None:
             return
 
         try:
-            service = self.api_endpoint.service_by_id(self.current_user, service_id)
+            service = yield self.async_api.service_by_id(self.current_user, service_id)
         except zoe_api.exceptions.ZoeException as e:
             self.set_status(e.status_code, e.message)
             return
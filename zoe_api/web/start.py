@@ -18,6 +18,8 @@
 import os
 import subprocess
 
+import tornado.gen
+
 from zoe_api.web.request_handler import ZoeWebRequestHandler
 from zoe_api.auth.base import BaseAuthenticator
 from zoe_api.auth.requests_oauth2 import EurecomGitLabClient
@@ -43,6 +45,7 @@ class LoginWeb(ZoeWebRequestHandler):
             template_vars['with_gitlab_oauth'] = True
         self.render('login.jinja2', **template_vars)
 
+    @tornado.gen.coroutine
     def post(self):
         """Try to authenticate."""
         login_type = self.get_argument('login', 'userpass')
@@ -54,7 +57,7 @@ class LoginWeb(ZoeWebRequestHandler):
         else:
             username = self.get_argument("username", "")
             password = self.get_argument("password", "")
-            user = BaseAuthenticator().full_auth(username, password)
+            user = yield self.async_api.run(BaseAuthenticator().full_auth, username, password)
             if user is None:
                 self.redirect(self.reverse_url("login"))
                 return
@@ -77,40 +80,46 @@ class LogoutWeb(ZoeWebRequestHandler):
 class HomeWeb(ZoeWebRequestHandler):
     """Handler class"""
 
+    @tornado.gen.coroutine
     def get(self):
         """Home page with authentication."""
         if self.current_user is None:
             return
 
+        template_vars = yield self.async_api.run(self._template_vars, self.current_user)
+        self.render('home_user.jinja2', **template_vars)
+
+    def _template_vars(self, user):
+        """Read the executions and the disk quota of the user, runs in the database thread pool."""
         filters = {
-            "user_id": self.current_user.id,
+            "user_id": user.id,
             "limit": 5
         }
-        last_executions = self.api_endpoint.execution_list(self.current_user, **filters)
+        last_executions = self.api_endpoint.execution_list(user, **filters)
 
         filters = {
-            "user_id": self.current_user.id,
+            "user_id": user.id,
             "status": "running"
         }
-        last_running_executions = self.api_endpoint.execution_list(self.current_user, **filters)
+        last_running_executions = self.api_endpoint.execution_list(user, prefetch=['services'], **filters)
 
         filters = {
-            "user_id": self.current_user.id,
+            "user_id": user.id,
             "status": "submitted"
         }
-        last_running_executions += self.api_endpoint.execution_list(self.current_user, **filters)
+        last_running_executions += self.api_endpoint.execution_list(user, prefetch=['services'], **filters)
 
         filters = {
-            "user_id": self.current_user.id,
+            "user_id": user.id,
             "status": "queued"
         }
-        last_running_executions += self.api_endpoint.execution_list(self.current_user, **filters)
+        last_running_executions += self.api_endpoint.execution_list(user, prefetch=['services'], **filters)
 
         filters = {
-            "user_id": self.current_user.id,
+            "user_id": user.id,
             "status": "starting"
         }
-        last_running_executions += self.api_endpoint.execution_list(self.current_user, **filters)
+        last_running_executions += self.api_endpoint.execution_list(user, prefetch=['services'], **filters)
 
         running_reservations = [e.total_reservations for e in last_running_executions if e.total_reservations is not None]
         total_memory = sum([r.memory.min for r in running_reservations])
@@ -118,13 +127,13 @@ class HomeWeb(ZoeWebRequestHandler):
 
         if zoe_lib.config.get_conf().enable_cephfs_quotas:
             try:
-                disk_quota = subprocess.check_output(['sudo', '/usr/bin/getfattr', '-n', 'ceph.quota.max_bytes', os.path.join(zoe_lib.config.get_conf().workspace_base_path, zoe_lib.config.get_conf().workspace_deployment_path, self.current_user.username)])
+                disk_quota = subprocess.check_output(['sudo', '/usr/bin/getfattr', '-n', 'ceph.quota.max_bytes', os.path.join(zoe_lib.config.get_conf().workspace_base_path, zoe_lib.config.get_conf().workspace_deployment_path, user.username)])
             except subprocess.CalledProcessError:
                 disk_quota = -1
                 disk_usage = -1
             else:
                 disk_quota = int(disk_quota.decode('utf-8').split('=')[1].lstrip('"').strip().rstrip('"'))
-                disk_usage = os.stat(os.path.join(zoe_lib.config.get_conf().workspace_base_path, zoe_lib.config.get_conf().workspace_deployment_path, self.current_user.username)).st_size
+                disk_usage = os.stat(os.path.join(zoe_lib.config.get_conf().workspace_base_path, zoe_lib.config.get_conf().workspace_deployment_path, user.username)).st_size
 
         else:
             disk_quota = -1
@@ -138,4 +147,4 @@ class HomeWeb(ZoeWebRequestHandler):
             'disk_quota': disk_quota,
             'disk_usage': disk_usage
         }
-        self.render('home_user.jinja2', **template_vars)
+        return template_vars
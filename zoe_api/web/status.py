@@ -15,6 +15,8 @@
 
 """Main points of entry for the Zoe web interface."""
 
+import tornado.gen
+
 from zoe_api.web.request_handler import ZoeWebRequestHandler
 from zoe_api.exceptions import ZoeException
 from zoe_lib.config import get_conf
@@ -35,26 +37,29 @@ class StatusEndpointWeb(ZoeWebRequestHandler):
         memory_usage = memory_reserved / memory_total
         return core_usage, memory_usage
 
+    @tornado.gen.coroutine
     def get(self):
         """Status and statistics page."""
         if self.current_user is None or not self.current_user.role.can_see_status:
             return
 
+        template_vars = yield self.async_api.run(self._template_vars)
+        self.render('status.jinja2', **template_vars)
+
+    def _template_vars(self):
+        """Query the master and the database, runs in the database thread pool."""
         stats = self.api_endpoint.statistics_scheduler()
         if stats is None:
             raise ZoeException('Cannot retrieve statistics from the Zoe master')
 
-        executions_in_queue = {}
-        for exec_id in stats['queue']:
-            executions_in_queue[exec_id] = self.api_endpoint.execution_by_id(None, exec_id)
-        for exec_id in stats['running_queue']:
-            executions_in_queue[exec_id] = self.api_endpoint.execution_by_id(None, exec_id)
-        for exec_id in stats['termination_queue']:
-            executions_in_queue[exec_id] = self.api_endpoint.execution_by_id(None, exec_id)
+        executions_in_queue = self.api_endpoint.executions_by_ids(stats['queue'] + stats['running_queue'] + stats['termination_queue'], prefetch=['services', 'owner'])
 
-        services_per_node = {}
+        node_names = [node['name'] for node in stats['platform_stats']['nodes']]
+        services_per_node = {name: [] for name in node_names}
+        if len(node_names) > 0:
+            for service in self.api_endpoint.sql.services.select(backend_host=node_names, backend_status='started', prefetch=['execution.owner']):
+                services_per_node[service.backend_host].append(service)
         for node in stats['platform_stats']['nodes']:
-            services_per_node[node['name']] = self.api_endpoint.sql.services.select(backend_host=node['name'], backend_status='started')
             for service in services_per_node[node['name']]:
                 if service.id not in node['service_stats']:
                     node['service_stats'][service.id] = {
@@ -72,5 +77,4 @@ class StatusEndpointWeb(ZoeWebRequestHandler):
             'eurecom': get_conf().eurecom,
             'platform_load': self._calculate_load(stats)
         }
-
-        self.render('status.jinja2', **template_vars)
+        return template_vars
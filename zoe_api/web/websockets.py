@@ -25,6 +25,7 @@ import tornado.gen
 import zoe_api.exceptions
 from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
 from zoe_api.custom_request_handler import ZoeWSRequestHandler
+from zoe_lib.state import Execution
 
 log = logging.getLogger(__name__)
 
@@ -37,6 +38,7 @@ class WebSocketEndpointWeb(ZoeWSRequestHandler):
         """Initializes the request handler."""
         super().initialize(**kwargs)
         self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.async_api = self.api_endpoint.async_api
         self.connection_closed = None
 
     def open(self, *args, **kwargs):
@@ -60,7 +62,7 @@ class WebSocketEndpointWeb(ZoeWSRequestHandler):
 
         if request['command'] == 'query_status':
             try:
-                execution = self.api_endpoint.execution_by_id(self.current_user, request['exec_id'])
+                exec_status = yield self.async_api.execution_status(self.current_user, request['exec_id'])
             except zoe_api.exceptions.ZoeNotFoundException:
                 response = {
                     'status': 'ok',
@@ -69,15 +71,16 @@ class WebSocketEndpointWeb(ZoeWSRequestHandler):
             else:
                 response = {
                     'status': 'ok',
-                    'exec_status': execution.status
+                    'exec_status': exec_status
                 }
-                if execution.status == execution.RUNNING_STATUS:
-                    services_info_, endpoints = self.api_endpoint.execution_endpoints(self.current_user, execution)
+                if exec_status == Execution.RUNNING_STATUS:
+                    execution = yield self.async_api.execution_by_id(self.current_user, request['exec_id'])
+                    services_info_, endpoints = yield self.async_api.execution_endpoints(self.current_user, execution)
                     response['endpoints'] = endpoints
             self.write_message(response)
         elif request['command'] == 'service_logs':
             try:
-                log_obj = self.api_endpoint.service_logs(self.current_user, request['service_id'])
+                log_obj = yield self.async_api.service_logs(self.current_user, request['service_id'])
             except zoe_api.exceptions.ZoeException as e:
                 self.write_message(str(e))
             else:
@@ -90,7 +93,7 @@ class WebSocketEndpointWeb(ZoeWSRequestHandler):
 
                     self.write_message(log_line)
         elif request['command'] == 'system_status':
-            stats = self.api_endpoint.statistics_scheduler()
+            stats = yield self.async_api.statistics_scheduler()
             self.write_message(json.dumps(stats))
         else:
             response = {
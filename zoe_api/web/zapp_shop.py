@@ -17,6 +17,7 @@
 
 import logging
 
+import tornado.gen
 from tornado.web import MissingArgumentError
 
 from zoe_api import zapp_shop
@@ -83,6 +84,7 @@ class ZAppStartWeb(ZoeWebRequestHandler):
         }
         self.render('zapp_start.jinja2', **template_vars)
 
+    @tornado.gen.coroutine
     def post(self, zapp_id):
         """Write the parameters in the description and start the ZApp."""
         if self.current_user is None:
@@ -116,7 +118,7 @@ class ZAppStartWeb(ZoeWebRequestHandler):
             return
         except MissingArgumentError:
             try:
-                new_id = self.api_endpoint.execution_start(self.current_user, exec_name, app_descr)
+                new_id = yield self.async_api.execution_start(self.current_user, exec_name, app_descr)
             except ZoeException as e:
                 self.error_page(e.message, 500)
                 return
@@ -28,6 +28,7 @@ from .statistics import ZoeStatisticsAPI
 from .user import ZoeUserAPI
 from .role import ZoeRoleAPI
 from .quota import ZoeQuotaAPI
+from .images import ZoeImagesAPI
 
 
 class ZoeAPI:
@@ -43,6 +44,7 @@ class ZoeAPI:
         self.user = ZoeUserAPI(url, self.token)
         self.role = ZoeRoleAPI(url, self.token)
         self.quota = ZoeQuotaAPI(url, self.token)
+        self.images = ZoeImagesAPI(url, self.token)
         self._check_api_version()
 
     def _check_api_version(self):
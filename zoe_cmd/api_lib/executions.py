@@ -71,6 +71,7 @@ class ZoeExecutionsAPI(ZoeAPIBase):
         * name: execution mane
         * user_id: user_id owning the execution (admin only)
         * limit: limit the number of returned entries
+        * last_seen: only executions with an ID lower than this one, to get the next page when used with limit
         * earlier_than_submit: all execution that where submitted earlier than this timestamp
         * earlier_than_start: all execution that started earlier than this timestamp
         * earlier_than_end: all execution that ended earlier than this timestamp
@@ -104,6 +105,28 @@ class ZoeExecutionsAPI(ZoeAPIBase):
         else:
             raise ZoeAPIException(data)
 
+    def wait_status_change(self, execution_id, known_status):
+        """
+        Retrieve the status of an execution, waiting on the server side for it to be different from the status already known.
+
+        The server gives up waiting after a timeout, so the returned status can still be equal to the known one.
+
+        :param execution_id: the execution to check
+        :param known_status: the last status seen by the caller
+        :return: the execution status, or None if the execution does not exist
+
+        :type execution_id: int
+        :type known_status: str
+        :rtype: str
+        """
+        data, status_code = self._rest_get('/execution/status/' + str(execution_id), {'wait_change': known_status})
+        if status_code == 200:
+            return data['status']
+        elif status_code == 404:
+            return None
+        else:
+            raise ZoeAPIException(data)
+
     def start(self, name, application_description):
         """
         Submit an application to the master to start a new execution.
@@ -0,0 +1,54 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module contains the Zoe Images API.
+"""
+
+import logging
+
+from zoe_cmd.api_lib.api_base import ZoeAPIBase
+from zoe_lib.exceptions import ZoeAPIException
+
+log = logging.getLogger(__name__)
+
+
+class ZoeImagesAPI(ZoeAPIBase):
+    """
+    The Images API class. This API is used by administrators to distribute images to the nodes before users need them.
+    """
+    def preload(self, image_name: str, seed_nodes=0):
+        """
+        Start pulling an image on all the nodes.
+
+        :param image_name: the image to pull, with its tag
+        :param seed_nodes: pull first on this many nodes, then on all the others
+        :return: the initial progress report
+        """
+        data, status_code = self._rest_post('/image/preload', {'image': image_name, 'seed_nodes': seed_nodes})
+        if status_code != 201:
+            raise ZoeAPIException(data)
+        return data['preload']
+
+    def preload_status(self):
+        """
+        Return the progress of the most recent preload of each image.
+
+        :return: a list of progress reports, with the status of the pull on each node
+        """
+        data, status_code = self._rest_get('/image/preload')
+        if status_code != 200:
+            raise ZoeAPIException(data)
+        return data['preloads']
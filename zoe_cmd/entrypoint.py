@@ -102,18 +102,19 @@ def exec_start_cmd(api: ZoeAPI, args):
         print("Execution created successfully with ID {}, waiting for status change".format(exec_id))
         old_status = 'submitted'
         while True:
-            execution = api.executions.get(exec_id)
-            current_status = execution['status']
+            current_status = api.executions.wait_status_change(exec_id, old_status)
             if old_status != current_status:
                 print('Execution is now {}'.format(current_status))
                 old_status = current_status
+            else:
+                time.sleep(0.2)  # the server is not pushing changes or the wait timed out
             if current_status == 'running':
                 break
-            time.sleep(0.2)
         if args.running:
             print('Execution running')
             exit(0)
         monitor_service_id = None
+        execution = api.executions.get(exec_id)
         for service_id in execution['services']:
             service = api.services.get(service_id)
             if service['description']['monitor']:
@@ -180,14 +181,14 @@ def exec_kill_cmd(api: ZoeAPI, args):
     if args.synchronous:
         old_status = None
         while True:
-            execution = api.executions.get(args.id)
-            current_status = execution['status']
+            current_status = api.executions.wait_status_change(args.id, old_status)
             if old_status != current_status:
                 print('Execution is now {}'.format(current_status))
                 old_status = current_status
+            else:
+                time.sleep(0.2)  # the server is not pushing changes or the wait timed out
             if current_status == 'terminated':
                 break
-            time.sleep(0.2)
         print('Execution terminated')
 
 
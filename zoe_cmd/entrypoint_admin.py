@@ -22,6 +22,7 @@ import json
 import logging
 import os
 import sys
+import time
 from argparse import ArgumentParser, Namespace, FileType, RawDescriptionHelpFormatter
 from typing import Tuple
 
@@ -372,6 +373,52 @@ def user_update_cmd(api: ZoeAPI, args):
     api.user.update(args.id, user_update)
 
 
+def _print_image_preload(preload):
+    """Print the progress of an image preload on each node."""
+    print('Image {} (seed nodes: {})'.format(preload['image_name'], ', '.join(preload['seed_nodes']) if len(preload['seed_nodes']) > 0 else 'none'))
+    print('Started: {}'.format(datetime.fromtimestamp(preload['time_start'], timezone.utc).astimezone()))
+    if preload['time_end'] is None:
+        print('Finished: not yet')
+    else:
+        print('Finished: {}'.format(datetime.fromtimestamp(preload['time_end'], timezone.utc).astimezone()))
+    print()
+    tabular_data = []
+    for name, node in sorted(preload['nodes'].items()):
+        if node['time_start'] is not None and node['time_end'] is not None:
+            duration = '{:.1f}'.format(node['time_end'] - node['time_start'])
+        else:
+            duration = ''
+        tabular_data.append([name, node['status'], duration, node['error'] if node['error'] is not None else ''])
+    headers = ['Node', 'Status', 'Pull time (s)', 'Error']
+    print(tabulate(tabular_data, headers))
+
+
+def image_preload_cmd(api: ZoeAPI, args):
+    """Pull an image on all the nodes."""
+    preload = api.images.preload(args.image, args.seeds)
+    print('Pulling image {} on {} nodes'.format(preload['image_name'], len(preload['nodes'])))
+    if not args.wait:
+        print('Use the image-preload-ls command to follow the progress')
+        return
+    reported = {}
+    while preload['time_end'] is None:
+        time.sleep(5)
+        preload = [p for p in api.images.preload_status() if p['image_name'] == args.image][0]
+        for name, node in sorted(preload['nodes'].items()):
+            if node['status'] != reported.get(name, 'waiting'):
+                print('{}: {}{}'.format(name, node['status'], '' if node['error'] is None else ' ({})'.format(node['error'])))
+                reported[name] = node['status']
+    print()
+    _print_image_preload(preload)
+
+
+def image_preload_ls_cmd(api: ZoeAPI, args_):
+    """Show the progress of the most recent preload of each image."""
+    for preload in api.images.preload_status():
+        _print_image_preload(preload)
+        print()
+
+
 ENV_HELP_TEXT = '''To authenticate with Zoe you need to define three environment variables:
 ZOE_URL: point to the URL of the Zoe Scheduler (ex.: http://localhost:5000/
 ZOE_USER: the username used for authentication
@@ -529,6 +576,16 @@ def process_arguments() -> Tuple[ArgumentParser, Namespace]:
     sub_parser.add_argument('--quota_id', help="Change quota")
     sub_parser.set_defaults(func=user_update_cmd)
 
+    # Images
+    sub_parser = subparser.add_parser('image-preload', help="Pull an image on all the nodes")
+    sub_parser.add_argument('image', help="Image name, including the tag")
+    sub_parser.add_argument('--seeds', type=int, default=0, help="Pull first on this many nodes, then on all the others")
+    sub_parser.add_argument('-w', '--wait', action='store_true', help="Wait for all the pulls to finish, printing their progress")
+    sub_parser.set_defaults(func=image_preload_cmd)
+
+    sub_parser = subparser.add_parser('image-preload-ls', help="Show the progress of image preloads on each node")
+    sub_parser.set_defaults(func=image_preload_ls_cmd)
+
     return parser, parser.parse_args()
 
 
@@ -57,6 +57,7 @@ def load_configuration(test_conf=None):
         argparser.add_argument('--dbpass', help='DB password', default='')
         argparser.add_argument('--dbhost', help='DB hostname', default='localhost')
         argparser.add_argument('--dbport', type=int, help='DB port', default=5432)
+        argparser.add_argument('--dbpool-size', type=int, help='Maximum number of DB connections, threads wait when all are in use, 0 computes it from the number of worker threads', default=0)
 
         # Master options
         argparser.add_argument('--api-listen-uri', help='ZMQ API listen address', default='tcp://*:4850')
@@ -82,6 +83,7 @@ def load_configuration(test_conf=None):
         argparser.add_argument('--listen-port', type=int, help='Port to listen to for incoming connections', default=5001)
         argparser.add_argument('--master-url', help='URL of the Zoe master process', default='tcp://127.0.0.1:4850')
         argparser.add_argument('--cookie-secret', help='secret used to encrypt cookies', default='changeme')
+        argparser.add_argument('--api-db-workers', type=int, help='Number of threads used by the API process to run database queries outside of the event loop', default=16)
 
         argparser.add_argument('--auth-file', help='Path to the CSV file containing user,pass,role lines for text authentication', default='zoepass.csv')
 
@@ -108,10 +110,15 @@ def load_configuration(test_conf=None):
 
         # Scheduler
         argparser.add_argument('--scheduler-class', help='Scheduler class to use for scheduling ZApps', choices=['ZoeElasticScheduler'], default='ZoeElasticScheduler')
-        argparser.add_argument('--scheduler-policy', help='Scheduler policy to use for scheduling ZApps', choices=['FIFO', 'SIZE', 'DYNSIZE'], default='FIFO')
+        argparser.add_argument('--scheduler-policy', help='Scheduler policy to use for scheduling ZApps', choices=['FIFO', 'SIZE', 'DYNSIZE', 'BACKFILL'], default='FIFO')
         argparser.add_argument('--placement-policy', help='Placement policy', choices=['waterfill', 'random', 'average'], default='average')
+        argparser.add_argument('--core-redistribution', help='How free cores are distributed among the services running on a node', choices=['equal', 'usage'], default='equal')
 
         argparser.add_argument('--backend', choices=['Kubernetes', 'DockerEngine'], default='DockerEngine', help='Which backend to enable')
+        argparser.add_argument('--backend-service-start-workers', type=int, help='Maximum number of services the back-end creates in parallel', default=16)
+        argparser.add_argument('--backend-execution-start-workers', type=int, help='Maximum number of executions started in parallel', default=4)
+        argparser.add_argument('--backend-termination-workers', type=int, help='Maximum number of services and executions terminated in parallel', default=16)
+        argparser.add_argument('--backend-image-pull-workers', type=int, help='Maximum number of image pulls run in parallel when preloading images', default=4)
 
         # Docker Engine backend options
         argparser.add_argument('--backend-docker-config-file', help='Location of the Docker Engine config file', default='docker.conf')
@@ -35,6 +35,9 @@ class BaseRecord:
         """Generates a dictionary that can be serialized in JSON."""
         raise NotImplementedError
 
+    def refresh(self, fields):
+        """Update the attributes of the columns that can change, with values read from or written to the database. Used by the identity map, records that are not loaded through it can ignore this."""
+
 
 class BaseTable:
     """Common abstraction for all tables."""
@@ -53,23 +56,36 @@ class BaseTable:
 
     def delete(self, record_id):
         """Delete a record from this table."""
+        self.sql_manager.drop_pending(self.table_name, record_id)
+        self.sql_manager.invalidate(self.table_name, record_id)
         query = 'DELETE FROM "{}" WHERE id = %s'.format(self.table_name)
         self.cursor.execute(query, (record_id,))
         self.sql_manager.commit()
 
     def update(self, record_id, **kwargs):
-        """Update the state of an execution."""
+        """Update the state of an execution. Inside a transaction the update is buffered and merged with the other updates to the same record."""
+        self.sql_manager.record_updated(self.table_name, record_id, kwargs)
+        if self.sql_manager.buffer_update(self.table_name, record_id, kwargs):
+            return
+        try:
+            self.execute_update(self.cursor, self.table_name, record_id, kwargs)
+            self.sql_manager.commit()
+        finally:
+            self.sql_manager.record_written(self.table_name, record_id, kwargs)
+
+    @staticmethod
+    def execute_update(cursor, table_name, record_id, fields):
+        """Run an UPDATE query for a single record, without committing."""
         arg_list = []
         value_list = []
-        for key, value in kwargs.items():
+        for key, value in fields.items():
             arg_list.append('{} = %s'.format(key))
             value_list.append(value)
         set_q = ", ".join(arg_list)
         value_list.append(record_id)
-        q_base = 'UPDATE "{}" SET '.format(self.table_name) + set_q + ' WHERE id=%s'
-        query = self.cursor.mogrify(q_base, value_list)
-        self.cursor.execute(query)
-        self.sql_manager.commit()
+        q_base = 'UPDATE "{}" SET '.format(table_name) + set_q + ' WHERE id=%s'
+        query = cursor.mogrify(q_base, value_list)
+        cursor.execute(query)
 
     def select(self, only_one=False, limit=-1, **kwargs):
         """Select records."""
@@ -18,6 +18,7 @@
 import datetime
 import logging
 import functools
+from typing import Iterator
 
 import psycopg2
 
@@ -84,6 +85,10 @@ class Execution(BaseRecord):
 
         self.app_name = self.description['name']
 
+        # Relations pre-loaded in bulk by ExecutionTable.prefetch()
+        self._services = None
+        self._owner = None
+
     def serialize(self):
         """Generates a dictionary that can be serialized in JSON."""
         return {
@@ -103,6 +108,16 @@ class Execution(BaseRecord):
     def __eq__(self, other):
         return self.id == other.id
 
+    def refresh(self, fields):
+        """Update the attributes of the columns that can change, with values read from or written to the database."""
+        if 'status' in fields:
+            self._status = fields['status']
+        for name in ('error_message', 'time_start', 'time_end'):
+            if name in fields:
+                setattr(self, name, fields[name])
+        if fields.get('size') is not None:
+            self.size = float(fields['size'])
+
     def set_queued(self):
         """The execution has been added to the scheduler queues."""
         self._status = self.QUEUED_STATUS
@@ -201,19 +216,41 @@ class Execution(BaseRecord):
         """Getter for the execution status."""
         return self._status
 
+    def attach_services(self, services):
+        """Attach a pre-loaded service list, that will be used instead of querying the database."""
+        self._services = services
+
+    def attach_owner(self, owner):
+        """Attach the pre-loaded owner of this execution."""
+        self._owner = owner
+
+    def clear_prefetched(self):
+        """Drop all pre-loaded relations, the next accesses will query the database again."""
+        self._services = None
+        self._owner = None
+
     @property
     def services(self):
         """Getter for this execution service list."""
+        services = self._services  # read once, another thread may drop the pre-loaded list
+        if services is not None:
+            return list(services)
         return self.sql_manager.services.select(execution_id=self.id)
 
     @property
     def essential_services(self):
         """Getter for this execution essential service list."""
+        services = self._services
+        if services is not None:
+            return [s for s in services if s.essential]
         return self.sql_manager.services.select(execution_id=self.id, essential=True)
 
     @property
     def elastic_services(self):
         """Getter for this execution elastic service list."""
+        services = self._services
+        if services is not None:
+            return [s for s in services if not s.essential]
         return self.sql_manager.services.select(execution_id=self.id, essential=False)
 
     @property
@@ -257,13 +294,17 @@ class Execution(BaseRecord):
     @property
     def total_reservations(self):
         """Return the union/sum of resources reserved by all services of this execution."""
-        if len(self.services) == 0:
+        services = self.services
+        if len(services) == 0:
             return None
-        return functools.reduce(lambda x, y: x + y, [s.resource_reservation for s in self.services])
+        return functools.reduce(lambda x, y: x + y, [s.resource_reservation for s in services])
 
     @property
     def owner(self):
         """Returns the full user object that owns this execution."""
+        owner = self._owner
+        if owner is not None:
+            return owner
         return self.sql_manager.user.select(only_one=True, **{'id': self.user_id})
 
     def __repr__(self):
@@ -299,48 +340,60 @@ class ExecutionTable(BaseTable):
         self.sql_manager.commit()
         return self.cursor.fetchone()[0]
 
-    def select(self, only_one=False, limit=-1, base=0, **kwargs):
+    @staticmethod
+    def _where(kwargs):
+        """Build the WHERE clause and its arguments for the given filters."""
+        if len(kwargs) == 0:
+            return '', []
+        filter_list = []
+        args_list = []
+        for key, value in kwargs.items():
+            if key == 'earlier_than_submit':
+                filter_list.append('"time_submit" <= to_timestamp(%s)')
+            elif key == 'earlier_than_start':
+                filter_list.append('"time_start" <= to_timestamp(%s)')
+            elif key == 'earlier_than_end':
+                filter_list.append('"time_end" <= to_timestamp(%s)')
+            elif key == 'later_than_submit':
+                filter_list.append('"time_submit" >= to_timestamp(%s)')
+            elif key == 'later_than_start':
+                filter_list.append('"time_start" >= to_timestamp(%s)')
+            elif key == 'later_than_end':
+                filter_list.append('"time_end" >= to_timestamp(%s)')
+            elif key == 'last_seen':
+                filter_list.append('id < %s')
+            elif isinstance(value, (list, tuple)):
+                filter_list.append('{} = ANY(%s)'.format(key))
+                value = list(value)
+            else:
+                filter_list.append('{} = %s'.format(key))
+            args_list.append(value)
+        return ' WHERE ' + ' AND '.join(filter_list), args_list
+
+    def select(self, only_one=False, limit=-1, base=0, prefetch=None, **kwargs):
         """
         Return a list of executions.
 
+        For deep pages use the last_seen filter instead of base: it returns the executions with an ID lower than the given one, newest first, without scanning the skipped rows.
+
         :param only_one: only one result is expected
         :type only_one: bool
         :param limit: limit the result to this number of entries
         :type limit: int
         :type base: int
         :param base: the base value to use when limiting result count
-        :param kwargs: filter executions based on their fields/columns
+        :param prefetch: relations to load in bulk together with the executions, see prefetch()
+        :type prefetch: list
+        :param kwargs: filter executions based on their fields/columns, list values match any of their elements
         :return: one or more executions
         """
-        q_base = 'SELECT * FROM execution'
-        if len(kwargs) > 0:
-            q = q_base + " WHERE "
-            filter_list = []
-            args_list = []
-            for key, value in kwargs.items():
-                if key == 'earlier_than_submit':
-                    filter_list.append('"time_submit" <= to_timestamp(%s)')
-                elif key == 'earlier_than_start':
-                    filter_list.append('"time_start" <= to_timestamp(%s)')
-                elif key == 'earlier_than_end':
-                    filter_list.append('"time_end" <= to_timestamp(%s)')
-                elif key == 'later_than_submit':
-                    filter_list.append('"time_submit" >= to_timestamp(%s)')
-                elif key == 'later_than_start':
-                    filter_list.append('"time_start" >= to_timestamp(%s)')
-                elif key == 'later_than_end':
-                    filter_list.append('"time_end" >= to_timestamp(%s)')
-                else:
-                    filter_list.append('{} = %s'.format(key))
-                args_list.append(value)
-            q += ' AND '.join(filter_list)
-            if limit > 0:
-                q += ' ORDER BY id DESC LIMIT {} OFFSET {}'.format(limit, base)
-            query = self.cursor.mogrify(q, args_list)
-        else:
-            if limit > 0:
-                q_base += ' ORDER BY id DESC LIMIT {} OFFSET {}'.format(limit, base)
-            query = self.cursor.mogrify(q_base)
+        where, args_list = self._where(kwargs)
+        q = 'SELECT * FROM execution' + where
+        if limit > 0:
+            q += ' ORDER BY id DESC LIMIT {} OFFSET {}'.format(limit, base)
+        elif 'last_seen' in kwargs:
+            q += ' ORDER BY id DESC'
+        query = self.cursor.mogrify(q, args_list)
 
         try:
             self.cursor.execute(query)
@@ -355,9 +408,33 @@ class ExecutionTable(BaseTable):
             row = self.cursor.fetchone()
             if row is None:
                 return None
-            return Execution(row, self.sql_manager)
+            execution = self.sql_manager.load_record(self.table_name, row, Execution)
+            if prefetch:
+                self.prefetch([execution], prefetch)
+            return execution
         else:
-            return [Execution(x, self.sql_manager) for x in self.cursor]
+            executions = [self.sql_manager.load_record(self.table_name, x, Execution) for x in self.cursor]
+            if prefetch:
+                self.prefetch(executions, prefetch)
+            return executions
+
+    def select_iter(self, batch_size=1000, prefetch=None, **kwargs) -> Iterator[Execution]:
+        """
+        Iterate over the executions matching the filters, newest first, without loading all of them in memory.
+
+        Each batch is read by an independent query that starts after the lowest ID of the previous batch, so no cursor or transaction is kept open between batches.
+
+        :param batch_size: number of rows read from the database at a time
+        :param prefetch: relations to load in bulk together with the executions, see prefetch()
+        :param kwargs: filter executions based on their fields/columns, as in select()
+        :return: an iterator of executions
+        """
+        while True:
+            executions = self.select(limit=batch_size, prefetch=prefetch, **kwargs)
+            yield from executions
+            if len(executions) < batch_size:
+                break
+            kwargs['last_seen'] = executions[-1].id
 
     def count(self, **kwargs):
         """
@@ -366,31 +443,8 @@ class ExecutionTable(BaseTable):
         :param kwargs: filter executions based on their fields/columns
         :return: one or more executions
         """
-        q_base = 'SELECT COUNT(*) FROM execution'
-        if len(kwargs) > 0:
-            q = q_base + " WHERE "
-            filter_list = []
-            args_list = []
-            for key, value in kwargs.items():
-                if key == 'earlier_than_submit':
-                    filter_list.append('"time_submit" <= to_timestamp(%s)')
-                elif key == 'earlier_than_start':
-                    filter_list.append('"time_start" <= to_timestamp(%s)')
-                elif key == 'earlier_than_end':
-                    filter_list.append('"time_end" <= to_timestamp(%s)')
-                elif key == 'later_than_submit':
-                    filter_list.append('"time_submit" >= to_timestamp(%s)')
-                elif key == 'later_than_start':
-                    filter_list.append('"time_start" >= to_timestamp(%s)')
-                elif key == 'later_than_end':
-                    filter_list.append('"time_end" >= to_timestamp(%s)')
-                else:
-                    filter_list.append('{} = %s'.format(key))
-                args_list.append(value)
-            q += ' AND '.join(filter_list)
-            query = self.cursor.mogrify(q, args_list)
-        else:
-            query = self.cursor.mogrify(q_base)
+        where, args_list = self._where(kwargs)
+        query = self.cursor.mogrify('SELECT COUNT(*) FROM execution' + where, args_list)
 
         try:
             self.cursor.execute(query)
@@ -400,3 +454,58 @@ class ExecutionTable(BaseTable):
 
         row = self.cursor.fetchone()
         return row[0]
+
+    def usage(self, user_id, statuses):
+        """
+        Compute with a single query the resources reserved by the executions of a user.
+
+        :param user_id: the owner of the executions
+        :param statuses: only executions in one of these statuses are counted
+        :return: a tuple with the number of executions, the total minimum cores and the total minimum memory reserved by their services
+        """
+        query = '''SELECT COUNT(DISTINCT e.id), COALESCE(SUM({}), 0), COALESCE(SUM({}), 0)
+                   FROM execution AS e LEFT JOIN service AS s ON s.execution_id = e.id
+                   WHERE e.user_id = %s AND e.status = ANY(%s)'''.format(self._resource_min_sql('cores'), self._resource_min_sql('memory'))
+        try:
+            self.cursor.execute(query, (user_id, list(statuses)))
+        except psycopg2.Error as e:
+            log.error('db error: {}'.format(e))
+            return 0, 0.0, 0
+
+        count, cores, memory = self.cursor.fetchone()
+        return count, float(cores), int(memory)
+
+    @staticmethod
+    def _resource_min_sql(resource):
+        """SQL expression for the minimum reservation of a service, that can be described as a number or as a min/max object, see ResourceLimits."""
+        field = "s.description->'resources'->'{}'".format(resource)
+        return "CASE json_typeof({0}) WHEN 'object' THEN COALESCE(({0}->>'min')::numeric, 0) WHEN 'number' THEN ({0}#>>'{{}}')::numeric ELSE 0 END".format(field)
+
+    def prefetch(self, executions, relations=('services', 'services.ports', 'owner')):
+        """
+        Load the related records of a list of executions with one query per table and attach them to the execution objects.
+
+        Until clear_prefetched() is called, the services, ports and owner of these executions are served from memory. Setters on the attached records keep writing through to the database.
+
+        :param executions: the executions whose relations should be loaded
+        :param relations: the relations to load, any of 'services', 'services.ports' and 'owner'
+        :return: None
+        """
+        if len(executions) == 0:
+            return
+
+        if 'services' in relations or 'services.ports' in relations:
+            services = sorted(self.sql_manager.services.select(execution_id=list({e.id for e in executions})), key=lambda s: s.id)
+            if 'services.ports' in relations:
+                self.sql_manager.services.prefetch(services, ('ports',))
+            services_by_execution = {e.id: [] for e in executions}
+            for service in services:
+                services_by_execution[service.execution_id].append(service)
+            for execution in executions:
+                execution.attach_services(services_by_execution[execution.id])
+
+        if 'owner' in relations:
+            users = self.sql_manager.user.select(id=list({e.user_id for e in executions}))
+            users_by_id = {u.id: u for u in users}
+            for execution in executions:
+                execution.attach_owner(users_by_id.get(execution.user_id))
@@ -0,0 +1,96 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Identity map that keeps a single live record object per table row."""
+
+import threading
+import weakref
+
+
+class IdentityMap:
+    """
+    Maps table rows to the record objects built from them, so that all threads of a process share the same objects.
+
+    Records are kept only while some other part of the code holds a reference to them. When a row is read again the existing object is refreshed with the new column values and the JSON description is not parsed again.
+    Columns that a thread is writing keep the written value until the write is committed: rows read in the meantime by other threads still have the old value.
+    """
+    def __init__(self):
+        self._records = {}
+        self._writes = {}  # (table name, record ID) -> {column name: IDs of the threads writing it}
+        self._lock = threading.Lock()
+
+    def _table(self, table_name) -> weakref.WeakValueDictionary:
+        return self._records.setdefault(table_name, weakref.WeakValueDictionary())
+
+    def _refresh(self, table_name, record, row):
+        """Refresh a record with the values read from the database, except for the columns being written. Called with the lock held."""
+        writes = self._writes.get((table_name, record.id))
+        if writes:
+            row = {name: value for name, value in row.items() if name not in writes}
+        record.refresh(dict(row))
+
+    def load(self, table_name, row, record_class, sql_manager):
+        """Return the live record for a row read from the database, creating it if needed."""
+        with self._lock:
+            record = self._table(table_name).get(row['id'])
+            if record is not None:
+                self._refresh(table_name, record, row)
+                return record
+
+        new_record = record_class(row, sql_manager)
+        with self._lock:
+            record = self._table(table_name).setdefault(new_record.id, new_record)
+            if record is not new_record:  # another thread built the same record in the meantime
+                self._refresh(table_name, record, row)
+        return record
+
+    def get(self, table_name, record_id):
+        """Return the live record for a row, or None."""
+        with self._lock:
+            return self._table(table_name).get(record_id)
+
+    def update(self, table_name, record_id, fields):
+        """Apply the values being written to a row to its live record, if there is one. The calling thread must call written() once the values are committed."""
+        with self._lock:
+            writes = self._writes.setdefault((table_name, record_id), {})
+            for name in fields:
+                writes.setdefault(name, set()).add(threading.get_ident())
+            record = self._table(table_name).get(record_id)
+            if record is not None:
+                record.refresh(fields)
+
+    def written(self, table_name, record_id, fields):
+        """The values passed to update() by the calling thread have been committed, or abandoned: the values read from the database are used again."""
+        with self._lock:
+            writes = self._writes.get((table_name, record_id))
+            if writes is None:
+                return
+            for name in fields:
+                writers = writes.get(name, set())
+                writers.discard(threading.get_ident())
+                if len(writers) == 0:
+                    writes.pop(name, None)
+            if len(writes) == 0:
+                del self._writes[(table_name, record_id)]
+
+    def invalidate(self, table_name=None, record_id=None):
+        """Forget a record, all records of a table or, without arguments, everything. The next reads will build new objects."""
+        with self._lock:
+            if table_name is None:
+                self._records.clear()
+            elif record_id is None:
+                self._records.pop(table_name, None)
+            else:
+                self._table(table_name).pop(record_id, None)
@@ -0,0 +1,79 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-place migrations of the SQL schema."""
+
+import logging
+
+from zoe_lib.version import SQL_SCHEMA_VERSION
+
+log = logging.getLogger(__name__)
+
+BASE_SCHEMA_VERSION = 7  # the version of the schema created by the create() methods of the tables
+
+# Statements to run to upgrade the schema to each version, they must be idempotent
+MIGRATIONS = {
+    8: [
+        'CREATE INDEX IF NOT EXISTS service_execution_id_idx ON service (execution_id)',
+        'CREATE INDEX IF NOT EXISTS service_backend_host_backend_id_idx ON service (backend_host, backend_id)',
+        'CREATE INDEX IF NOT EXISTS service_backend_host_backend_status_idx ON service (backend_host, backend_status)',
+        'CREATE INDEX IF NOT EXISTS port_service_id_idx ON port (service_id)',
+        'CREATE INDEX IF NOT EXISTS execution_status_user_id_idx ON execution (status, user_id)'
+    ],
+    9: [  # status changes are announced by the database, the channel name must match notifications.channel_name()
+        """CREATE OR REPLACE FUNCTION notify_execution_status() RETURNS trigger AS $$
+           BEGIN
+               PERFORM pg_notify('zoe_' || TG_TABLE_SCHEMA || '_state',
+                                 json_build_object('table', TG_TABLE_NAME, 'id', NEW.id, 'changes', json_build_object('status', NEW.status))::text);
+               RETURN NULL;
+           END;
+           $$ LANGUAGE plpgsql""",
+        'DROP TRIGGER IF EXISTS execution_status_notify ON execution',
+        'CREATE TRIGGER execution_status_notify AFTER UPDATE OF status ON execution FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status) EXECUTE PROCEDURE notify_execution_status()'
+    ],
+    10: [  # only the service columns that changed are in the payload
+        """CREATE OR REPLACE FUNCTION notify_service_status() RETURNS trigger AS $$
+           DECLARE
+               changes jsonb := '{}';
+           BEGIN
+               IF OLD.status IS DISTINCT FROM NEW.status THEN
+                   changes := changes || jsonb_build_object('status', NEW.status);
+               END IF;
+               IF OLD.backend_status IS DISTINCT FROM NEW.backend_status THEN
+                   changes := changes || jsonb_build_object('backend_status', NEW.backend_status);
+               END IF;
+               PERFORM pg_notify('zoe_' || TG_TABLE_SCHEMA || '_state',
+                                 json_build_object('table', TG_TABLE_NAME, 'id', NEW.id, 'changes', changes)::text);
+               RETURN NULL;
+           END;
+           $$ LANGUAGE plpgsql""",
+        'DROP TRIGGER IF EXISTS service_status_notify ON service',
+        'CREATE TRIGGER service_status_notify AFTER UPDATE OF status, backend_status ON service FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.backend_status IS DISTINCT FROM NEW.backend_status) EXECUTE PROCEDURE notify_service_status()'
+    ]
+}
+
+
+def can_upgrade(version: int) -> bool:
+    """Return True if a schema at the given version can be upgraded to the current one."""
+    return BASE_SCHEMA_VERSION <= version <= SQL_SCHEMA_VERSION
+
+
+def upgrade(cur, deployment_name: str, version: int) -> None:
+    """Apply in order all the migrations needed to bring the schema from the given version to the current one, updating the version table after each of them."""
+    for next_version in range(version + 1, SQL_SCHEMA_VERSION + 1):
+        log.info('Upgrading the SQL schema of deployment {} to version {}'.format(deployment_name, next_version))
+        for statement in MIGRATIONS[next_version]:
+            cur.execute(statement)
+        cur.execute("UPDATE public.versions SET version = %s WHERE deployment = %s", (next_version, deployment_name))
@@ -0,0 +1,29 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""PostgreSQL NOTIFY events sent when the status of executions and services changes."""
+
+import json
+
+
+def channel_name(deployment_name: str) -> str:
+    """The name of the channel used by a Zoe deployment, the notifications are sent by triggers on the execution and service tables (see migrations)."""
+    return 'zoe_{}_state'.format(deployment_name.lower())  # the schema name the trigger sees is folded to lower case
+
+
+def parse_payload(payload: str):
+    """Decode a notification payload into a (table name, record id, changed columns) tuple."""
+    data = json.loads(payload)
+    return data['table'], data['id'], data['changes']
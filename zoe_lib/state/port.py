@@ -18,6 +18,8 @@
 import hashlib
 import logging
 
+import psycopg2.extras
+
 from zoe_lib.state.base import BaseRecord, BaseTable
 import zoe_lib.config
 
@@ -30,6 +32,7 @@ class Port(BaseRecord):
     def __init__(self, d, sql_manager):
         super().__init__(d, sql_manager)
 
+        self.service_id = d['service_id']
         self.internal_name = d['internal_name']
         self.external_ip = d['external_ip']
         self.external_port = d['external_port']
@@ -57,6 +60,12 @@ class Port(BaseRecord):
     def __eq__(self, other):
         return self.id == other.id
 
+    def refresh(self, fields):
+        """Update the attributes of the columns that can change, with values read from or written to the database."""
+        for name in ('external_ip', 'external_port'):
+            if name in fields:
+                setattr(self, name, fields[name])
+
     def activate(self, ext_ip, ext_port):
         """The backend has exposed the port."""
         self.sql_manager.ports.update(self.id, external_ip=ext_ip, external_port=ext_port)
@@ -65,6 +74,8 @@ class Port(BaseRecord):
 
     def reset(self):
         """The backend has stopped exposing the port."""
+        if self.external_ip is None and self.external_port is None:
+            return
         self.sql_manager.ports.update(self.id, external_ip=None, external_port=None)
         self.external_port = None
         self.external_ip = None
@@ -97,6 +108,21 @@ class PortTable(BaseTable):
         self.sql_manager.commit()
         return self.cursor.fetchone()[0]
 
+    def insert_many(self, ports):
+        """
+        Adds many ports to the state with a single query. Inside a transaction the new rows are committed when the transaction ends.
+
+        :param ports: a list of (service_id, internal_name, description) tuples
+        :return: the IDs of the new ports, in the same order
+        """
+        if len(ports) == 0:
+            return []
+        values = [tuple(p) for p in ports]
+        rows = psycopg2.extras.execute_values(self.cursor, 'INSERT INTO port (service_id, internal_name, description) VALUES %s RETURNING id', values, page_size=len(values), fetch=True)
+        if not self.sql_manager.in_transaction():
+            self.sql_manager.commit()
+        return [row[0] for row in rows]
+
     def select(self, only_one=False, limit=-1, **kwargs):
         """
         Return a list of ports.
@@ -105,7 +131,7 @@ class PortTable(BaseTable):
         :type only_one: bool
         :param limit: limit the result to this number of entries
         :type limit: int
-        :param kwargs: filter services based on their fields/columns
+        :param kwargs: filter services based on their fields/columns, list values match any of their elements
         :return: one or more ports
         """
         q_base = 'SELECT * FROM port'
@@ -114,7 +140,11 @@ class PortTable(BaseTable):
             filter_list = []
             args_list = []
             for key, value in kwargs.items():
-                filter_list.append('{} = %s'.format(key))
+                if isinstance(value, (list, tuple)):
+                    filter_list.append('{} = ANY(%s)'.format(key))
+                    value = list(value)
+                else:
+                    filter_list.append('{} = %s'.format(key))
                 args_list.append(value)
             q += ' AND '.join(filter_list)
             if limit > 0:
@@ -130,6 +160,6 @@ class PortTable(BaseTable):
             row = self.cursor.fetchone()
             if row is None:
                 return None
-            return Port(row, self.sql_manager)
+            return self.sql_manager.load_record(self.table_name, row, Port)
         else:
-            return [Port(x, self.sql_manager) for x in self.cursor]
+            return [self.sql_manager.load_record(self.table_name, x, Port) for x in self.cursor]
@@ -17,6 +17,8 @@
 
 import logging
 
+import psycopg2.extras
+
 from zoe_lib.config import get_conf
 
 from zoe_lib.state.base import BaseTable, BaseRecord
@@ -156,6 +158,10 @@ class Service(BaseRecord):
         except KeyError:
             self.network = None
 
+        # Relations pre-loaded in bulk by ServiceTable.prefetch()
+        self._ports = None
+        self._execution = None
+
     def serialize(self):
         """Generates a dictionary that can be serialized in JSON."""
         return {
@@ -178,6 +184,16 @@ class Service(BaseRecord):
     def __eq__(self, other):
         return self.id == other.id
 
+    def refresh(self, fields):
+        """Update the attributes of the columns that can change, with values read from or written to the database."""
+        for name in ('status', 'error_message', 'backend_id', 'backend_status', 'backend_host', 'restart_count'):
+            if name in fields:
+                setattr(self, name, fields[name])
+        if 'ip_address' in fields:
+            self.ip_address = fields['ip_address']
+            if self.ip_address is not None and ('/32' in self.ip_address or '/128' in self.ip_address):
+                self.ip_address = self.ip_address.split('/')[0]
+
     def set_terminating(self):
         """The service is being terminated."""
         self.sql_manager.services.update(self.id, status=self.TERMINATING_STATUS)
@@ -226,7 +242,6 @@ class Service(BaseRecord):
             for port in self.ports:
                 port.reset()
             self.ip_address = None
-            self.sql_manager.services.update(self.id, backend_status=new_status, ip_address=None)
             if new_status == self.BACKEND_DESTROY_STATUS:
                 self.backend_id = None
                 self.sql_manager.services.update(self.id, backend_status=new_status, backend_id=None, ip_address=None)
@@ -248,12 +263,22 @@ class Service(BaseRecord):
     @property
     def user_id(self):
         """Getter for the user_id, that is actually taken from the parent execution."""
-        execution = self.sql_manager.executions.select(only_one=True, id=self.execution_id)
-        return execution.user_id
+        return self.execution.user_id
+
+    def attach_ports(self, ports):
+        """Attach a pre-loaded port list, that will be used instead of querying the database."""
+        self._ports = ports
+
+    def attach_execution(self, execution):
+        """Attach the pre-loaded parent execution of this service."""
+        self._execution = execution
 
     @property
     def ports(self):
         """Getter for the ports exposed by this service."""
+        ports = self._ports
+        if ports is not None:
+            return list(ports)
         return self.sql_manager.ports.select(service_id=self.id)
 
     @property
@@ -276,6 +301,9 @@ class Service(BaseRecord):
     @property
     def execution(self):
         """Return the parent execution."""
+        execution = self._execution
+        if execution is not None:
+            return execution
         return self.sql_manager.executions.select(only_one=True, id=self.execution_id)
 
     def restarted(self):
@@ -315,7 +343,22 @@ class ServiceTable(BaseTable):
         self.sql_manager.commit()
         return self.cursor.fetchone()[0]
 
-    def select(self, only_one=False, limit=-1, **kwargs):
+    def insert_many(self, services):
+        """
+        Adds many services to the state with a single query. Inside a transaction the new rows are committed when the transaction ends.
+
+        :param services: a list of (execution_id, name, service_group, description, is_essential) tuples
+        :return: the IDs of the new services, in the same order
+        """
+        if len(services) == 0:
+            return []
+        values = [(Service.CREATED_STATUS, ) + tuple(s) for s in services]
+        rows = psycopg2.extras.execute_values(self.cursor, 'INSERT INTO service (status, execution_id, name, service_group, description, essential) VALUES %s RETURNING id', values, page_size=len(values), fetch=True)
+        if not self.sql_manager.in_transaction():
+            self.sql_manager.commit()
+        return [row[0] for row in rows]
+
+    def select(self, only_one=False, limit=-1, prefetch=None, **kwargs):
         """
         Return a list of services.
 
@@ -323,7 +366,9 @@ class ServiceTable(BaseTable):
         :type only_one: bool
         :param limit: limit the result to this number of entries
         :type limit: int
-        :param kwargs: filter services based on their fields/columns
+        :param prefetch: relations to load in bulk together with the services, see prefetch()
+        :type prefetch: list
+        :param kwargs: filter services based on their fields/columns, list values match any of their elements
         :return: one or more services
         """
         q_base = 'SELECT * FROM service'
@@ -334,6 +379,9 @@ class ServiceTable(BaseTable):
             for key, value in kwargs.items():
                 if key.startswith('not_'):
                     filter_list.append('{} != %s'.format(key[4:]))
+                elif isinstance(value, (list, tuple)):
+                    filter_list.append('{} = ANY(%s)'.format(key))
+                    value = list(value)
                 else:
                     filter_list.append('{} = %s'.format(key))
                 args_list.append(value)
@@ -351,6 +399,37 @@ class ServiceTable(BaseTable):
             row = self.cursor.fetchone()
             if row is None:
                 return None
-            return Service(row, self.sql_manager)
+            service = self.sql_manager.load_record(self.table_name, row, Service)
+            if prefetch:
+                self.prefetch([service], prefetch)
+            return service
         else:
-            return [Service(x, self.sql_manager) for x in self.cursor]
+            services = [self.sql_manager.load_record(self.table_name, x, Service) for x in self.cursor]
+            if prefetch:
+                self.prefetch(services, prefetch)
+            return services
+
+    def prefetch(self, services, relations=('ports',)):
+        """
+        Load the related records of a list of services with one query per table and attach them to the service objects.
+
+        :param services: the services whose relations should be loaded
+        :param relations: the relations to load, any of 'ports', 'execution' and 'execution.owner'
+        :return: None
+        """
+        if len(services) == 0:
+            return
+
+        if 'ports' in relations:
+            ports_by_service = {s.id: [] for s in services}
+            for port in sorted(self.sql_manager.ports.select(service_id=list(ports_by_service.keys())), key=lambda p: p.id):
+                ports_by_service[port.service_id].append(port)
+            for service in services:
+                service.attach_ports(ports_by_service[service.id])
+
+        if 'execution' in relations or 'execution.owner' in relations:
+            execution_relations = ['owner'] if 'execution.owner' in relations else None
+            executions = self.sql_manager.executions.select(id=list({s.execution_id for s in services}), prefetch=execution_relations)
+            executions_by_id = {e.id: e for e in executions}
+            for service in services:
+                service.attach_execution(executions_by_id.get(service.execution_id))
@@ -15,15 +15,24 @@
 
 """Interface to PostgresQL for Zoe state."""
 
+from collections import OrderedDict
+import contextlib
 import logging
+import threading
+import weakref
 
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
 
 from zoe_lib.config import get_conf
 from zoe_lib.version import SQL_SCHEMA_VERSION
 import zoe_lib.exceptions
 
+from . import migrations
+from .base import BaseTable
+from .identity_map import IdentityMap
 from .service import ServiceTable
 from .execution import ExecutionTable
 from .port import PortTable
@@ -36,46 +45,238 @@ log = logging.getLogger(__name__)
 psycopg2.extensions.register_adapter(dict, psycopg2.extras.Json)
 
 
+POOL_WAIT_WARNING = 10  # seconds a thread waits for a DB connection before a warning is logged
+POOL_EXTRA_CONNECTIONS = 16  # scheduler, metrics, Docker synchro and other long-lived threads
+
+_managers = weakref.WeakSet()
+
+
+def release_thread_connections():
+    """Give the DB connections of the calling thread back to their pools, at the end of a unit of work run by a pool thread."""
+    for manager in list(_managers):
+        manager.release_connection()
+
+
+def default_pool_size(conf) -> int:
+    """The number of DB connections needed by the worker threads configured for the master and for the API."""
+    return conf.backend_service_start_workers + conf.backend_execution_start_workers + 2 * conf.backend_termination_workers + \
+        2 * conf.backend_image_pull_workers + conf.api_db_workers + POOL_EXTRA_CONNECTIONS
+
+
+class _ThreadConnection:
+    """The connection used by a thread, it is given back when the thread releases it or terminates."""
+    def __init__(self, conn, put_connection):
+        self.conn = conn
+        self.finalizer = weakref.finalize(self, put_connection, self.conn)
+        self.finalizer.atexit = False
+
+
 class SQLManager:
-    """The SQLManager class, should be used as a singleton."""
-    def __init__(self, conf):
+    """The SQLManager class, should be used as a singleton.
+
+    Each thread gets its own connection from a pool and keeps it until it releases it or terminates, so that transactions from different threads are never interleaved. When all connections are in use, threads wait for one to be released.
+
+    With identity_map set to True, executions, services and ports are loaded through an identity map and all threads share one live object per row.
+    """
+    def __init__(self, conf, identity_map=False):
         self.dbuser = conf.dbuser
         self.password = conf.dbpass
         self.host = conf.dbhost
         self.port = conf.dbport
         self.dbname = conf.dbname
+        self.pool_size = conf.dbpool_size if conf.dbpool_size > 0 else default_pool_size(conf)
         self.schema = conf.deployment_name
-        self.conn = None
+        self._local = threading.local()
+        self._pool = None
+        self._available = threading.Semaphore(self.pool_size)
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self.identity_map = IdentityMap() if identity_map else None
         self._connect()
+        _managers.add(self)
+
+    def _dsn(self):
+        return 'dbname=' + self.dbname + \
+               ' user=' + self.dbuser + \
+               ' password=' + self.password + \
+               ' host=' + self.host + \
+               ' port=' + str(self.port) + \
+               " options='-c search_path={},public'".format(self.schema)  # set once, when the connection is opened
 
     def _connect(self):
-        dsn = 'dbname=' + self.dbname + \
-              ' user=' + self.dbuser + \
-              ' password=' + self.password + \
-              ' host=' + self.host + \
-              ' port=' + str(self.port)
+        self._pool = psycopg2.pool.ThreadedConnectionPool(1, self.pool_size, self._dsn())
+
+    def listen_connection(self):
+        """Open a new connection in autocommit mode, outside of the pool, for a thread that waits for notifications."""
+        conn = psycopg2.connect(self._dsn())
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    @property
+    def conn(self):
+        """The connection of the calling thread, taken from the pool on first use."""
+        thread_conn = getattr(self._local, 'thread_conn', None)
+        if thread_conn is not None and thread_conn.conn.closed:
+            self._discard_connection(thread_conn)
+            thread_conn = None
+        if thread_conn is None:
+            thread_conn = _ThreadConnection(self._get_connection(), self._put_connection)
+            self._local.thread_conn = thread_conn
+        return thread_conn.conn
+
+    def _get_connection(self):
+        """Wait for a free connection, idle connections are reused before opening new ones."""
+        while not self._available.acquire(timeout=POOL_WAIT_WARNING):
+            log.warning('All {} DB connections are in use, waiting for one to be released'.format(self.pool_size))
+        with self._idle_lock:
+            if len(self._idle) > 0:
+                return self._idle.pop()
+        try:
+            return self._pool.getconn()
+        except Exception:
+            self._available.release()
+            raise
+
+    def _put_connection(self, conn):
+        """Keep a connection open for the next thread that needs one, leaving no transaction open on it."""
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._pool.putconn(conn, close=True)
+        else:
+            with self._idle_lock:
+                self._idle.append(conn)
+        finally:
+            self._available.release()
 
-        self.conn = psycopg2.connect(dsn)
+    def release_connection(self):
+        """Give the connection of the calling thread back, unless a transaction block is open. Rows read and not committed are rolled back."""
+        thread_conn = getattr(self._local, 'thread_conn', None)
+        if thread_conn is None or self.in_transaction():
+            return
+        self._local.thread_conn = None
+        if thread_conn.conn.closed:
+            self._discard_connection(thread_conn)
+        else:
+            thread_conn.finalizer()
+
+    def _discard_connection(self, thread_conn: _ThreadConnection):
+        """Close a broken connection and give it back to the pool."""
+        thread_conn.finalizer.detach()
+        self._local.thread_conn = None
+        try:
+            self._pool.putconn(thread_conn.conn, close=True)
+        finally:
+            self._available.release()
 
     def cursor(self):
         """Get a cursor, making sure the connection to the database is established."""
+        conn = self.conn
+        if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            conn.rollback()
         try:
-            cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         except psycopg2.InterfaceError:
-            self._connect()
-            cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        try:
-            cur.execute('SET search_path TO {},public'.format(self.schema))
-        except psycopg2.InternalError:
-            self._connect()
+            self._discard_connection(self._local.thread_conn)
             cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-            cur.execute('SET search_path TO {},public'.format(self.schema))
         return cur
 
     def commit(self):
         """Commit a transaction."""
         self.conn.commit()
 
+    def close(self):
+        """Close all the connections in the pool."""
+        self._pool.closeall()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        A unit of work: record updates made by the calling thread inside this block are buffered, merged by record and written in a single transaction when the outermost block exits.
+
+        Updates are written also when the block exits with an exception, since the record objects in memory have already been changed.
+        No SQL is sent for the buffered updates before the block exits: records read inside the block include them, but the WHERE clauses of queries see the committed values. Blocks must not wait for the back-end or for other threads.
+        """
+        depth = getattr(self._local, 'transaction_depth', 0)
+        if depth == 0:
+            self._local.pending_updates = OrderedDict()
+        self._local.transaction_depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.transaction_depth = depth
+            if depth == 0:
+                pending = list(self._local.pending_updates.items())
+                try:
+                    self.flush_pending()
+                    self.commit()
+                finally:
+                    self._local.pending_updates = None
+                    for (table_name, record_id), fields in pending:
+                        self.record_written(table_name, record_id, fields)
+
+    def in_transaction(self) -> bool:
+        """Return True if the calling thread is inside a transaction() block."""
+        return getattr(self._local, 'transaction_depth', 0) > 0
+
+    def buffer_update(self, table_name, record_id, fields) -> bool:
+        """Buffer an update if the calling thread is inside a transaction, return False otherwise."""
+        pending = getattr(self._local, 'pending_updates', None)
+        if pending is None:
+            return False
+        pending.setdefault((table_name, record_id), {}).update(fields)
+        return True
+
+    def drop_pending(self, table_name, record_id):
+        """Forget the buffered updates for a record that is being deleted."""
+        pending = getattr(self._local, 'pending_updates', None)
+        if pending is not None:
+            fields = pending.pop((table_name, record_id), None)
+            if fields is not None:
+                self.record_written(table_name, record_id, fields)
+
+    def flush_pending(self):
+        """Execute the buffered updates of the calling thread, without committing. Called only when the outermost transaction block exits, so that no row is locked while the block runs."""
+        pending = getattr(self._local, 'pending_updates', None)
+        if not pending:
+            return
+        cur = self.cursor()
+        for (table_name, record_id), fields in pending.items():
+            BaseTable.execute_update(cur, table_name, record_id, fields)
+        pending.clear()
+
+    def load_record(self, table_name, row, record_class):
+        """
+        Build a record from a row, or return its live object if the identity map is enabled.
+
+        Updates buffered by the calling thread are applied to the row, so that a thread inside a transaction reads its own writes.
+        """
+        pending = getattr(self._local, 'pending_updates', None)
+        if pending:
+            fields = pending.get((table_name, row['id']))
+            if fields is not None:
+                row = dict(row)
+                row.update(fields)
+        if self.identity_map is None:
+            return record_class(row, self)
+        return self.identity_map.load(table_name, row, record_class, self)
+
+    def record_updated(self, table_name, record_id, fields):
+        """Keep the live object of a record up to date with the values being written, until record_written() rows read by other threads do not change them."""
+        if self.identity_map is not None:
+            self.identity_map.update(table_name, record_id, fields)
+
+    def record_written(self, table_name, record_id, fields):
+        """The values written by the calling thread to a record have been committed."""
+        if self.identity_map is not None:
+            self.identity_map.written(table_name, record_id, fields)
+
+    def invalidate(self, table_name=None, record_id=None):
+        """Drop records from the identity map, for rows that have been changed by another process."""
+        if self.identity_map is not None:
+            self.identity_map.invalidate(table_name, record_id)
+
     @property
     def executions(self) -> ExecutionTable:
         """Access the execution state."""
@@ -129,21 +330,24 @@ class SQLManager:
         if not self._check_schema_version(cur, get_conf().deployment_name):
             self._create_tables()
 
+        cur.execute("SELECT version FROM public.versions WHERE deployment = %s", (get_conf().deployment_name,))
+        migrations.upgrade(cur, get_conf().deployment_name, cur.fetchone()[0])
+
         self.commit()
         cur.close()
 
     def _check_schema_version(self, cur, deployment_name):
-        """Check if the schema version matches this source code version."""
+        """Check if the schema version matches this source code version, or can be upgraded to it."""
         cur.execute("SELECT version FROM public.versions WHERE deployment = %s", (deployment_name,))
         row = cur.fetchone()
         if row is None:
-            cur.execute("INSERT INTO public.versions (deployment, version) VALUES (%s, %s)", (deployment_name, SQL_SCHEMA_VERSION))
+            cur.execute("INSERT INTO public.versions (deployment, version) VALUES (%s, %s)", (deployment_name, migrations.BASE_SCHEMA_VERSION))
             cur.execute("SELECT EXISTS(SELECT 1 FROM pg_catalog.pg_namespace WHERE nspname = %s)", (deployment_name,))
             if not cur.fetchone()[0]:
                 cur.execute('CREATE SCHEMA {}'.format(deployment_name))
-            return False  # Tables need to be created
+            return False  # Tables need to be created, then upgraded
         else:
-            if row[0] == SQL_SCHEMA_VERSION:
+            if migrations.can_upgrade(row[0]):
                 return True
             else:
                 raise zoe_lib.exceptions.ZoeLibException('SQL database schema version mismatch: need {}, found {}'.format(SQL_SCHEMA_VERSION, row[0]))
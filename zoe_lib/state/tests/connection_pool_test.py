@@ -0,0 +1,90 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the DB connections used by the threads of the state layer."""
+
+import threading
+
+import psycopg2.extensions
+
+from zoe_lib.state.sql_manager import SQLManager, default_pool_size, release_thread_connections
+from zoe_lib.state.tests.mock_sql_manager import Conf
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+
+
+class MockConnection:
+    """A connection that is always idle."""
+    closed = False
+
+    def get_transaction_status(self):
+        """Fake status."""
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        """Fake rollback."""
+
+    def commit(self):
+        """Fake commit."""
+
+
+class MockPool:
+    """Counts the connections opened."""
+    def __init__(self):
+        self.opened = 0
+
+    def getconn(self):
+        """Open a fake connection."""
+        self.opened += 1
+        return MockConnection()
+
+    def putconn(self, conn, close=False):
+        """Fake close."""
+
+
+class MockPoolSQLManager(SQLManager):
+    """A SQL manager that uses fake connections."""
+    def _connect(self):
+        self._pool = MockPool()
+
+
+class TestConnectionPool:
+    """Connection pool tests."""
+
+    def test_wait_for_release(self):
+        """When all connections are in use threads wait for one to be released, released connections are reused."""
+        state = MockPoolSQLManager(Conf(dbuser='', dbpass='', dbhost='', dbport=5432, dbname='', dbpool_size=1, deployment_name='test'))
+        conn = state.conn
+        waiting = []
+        waiter = threading.Thread(target=lambda: waiting.append(state.conn))
+        waiter.start()
+        waiter.join(timeout=0.2)
+        assert waiter.is_alive()
+
+        release_thread_connections()
+        waiter.join(timeout=5)
+        assert waiting == [conn]
+        assert state._pool.opened == 1  # pylint: disable=protected-access
+
+    def test_keep_during_transaction(self):
+        """The connection is not released inside a transaction block."""
+        state = MockPoolSQLManager(Conf(dbuser='', dbpass='', dbhost='', dbport=5432, dbname='', dbpool_size=1, deployment_name='test'))
+        with state.transaction():
+            conn = state.conn
+            state.release_connection()
+            assert state.conn is conn
+
+    def test_default_size(self, zoe_configuration):  # pylint: disable=redefined-outer-name
+        """The default size covers all the worker threads."""
+        assert default_pool_size(zoe_configuration) == 4 + 2 + 2 * 4 + 2 * 2 + 2 + 16
@@ -0,0 +1,95 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the queries of the execution table."""
+
+import psycopg2
+
+from zoe_lib.state.execution import ExecutionTable
+from zoe_lib.state.tests.mock_sql_manager import MockSQLManager
+
+
+class MockCursor:
+    """Records the queries instead of running them, or fails with the given error."""
+    def __init__(self):
+        self.queries = []
+        self.error = None
+
+    def mogrify(self, query, args):
+        """Fake mogrify."""
+        self.queries.append((query, args))
+        return query
+
+    def execute(self, query, args=None):  # pylint: disable=unused-argument
+        """Fake execute."""
+        if self.error is not None:
+            raise self.error
+
+    def __iter__(self):
+        return iter([])
+
+
+class MockExecution:
+    """A minimal stand-in for a Zoe execution."""
+    def __init__(self, execution_id):
+        self.id = execution_id
+
+
+class TestExecutionTable:
+    """Execution table tests."""
+
+    def test_where(self):
+        """Filters are translated into a WHERE clause, list values match any of their elements."""
+        where, args_list = ExecutionTable._where({'status': 'running', 'user_id': (1, 2), 'later_than_submit': 1500000000, 'last_seen': 42})  # pylint: disable=protected-access
+        assert where == ' WHERE status = %s AND user_id = ANY(%s) AND "time_submit" >= to_timestamp(%s) AND id < %s'
+        assert args_list == ['running', [1, 2], 1500000000, 42]
+        assert ExecutionTable._where({}) == ('', [])  # pylint: disable=protected-access
+
+    def test_select_last_seen(self):
+        """A page that starts after last_seen is read newest first, also without a limit."""
+        table = MockSQLManager().executions
+        table.cursor = MockCursor()
+        table.select(limit=10, last_seen=42)
+        table.select(last_seen=42)
+        assert table.cursor.queries == [
+            ('SELECT * FROM execution WHERE id < %s ORDER BY id DESC LIMIT 10 OFFSET 0', [42]),
+            ('SELECT * FROM execution WHERE id < %s ORDER BY id DESC', [42])
+        ]
+
+    def test_select_iter(self, monkeypatch):
+        """Batches are independent queries, each one starts after the lowest ID of the previous batch."""
+        table = MockSQLManager().executions
+        calls = []
+
+        def select(limit, prefetch=None, **kwargs):
+            """Return the executions with IDs from 1 to 7, newest first."""
+            calls.append((limit, prefetch, dict(kwargs)))
+            last_seen = kwargs.get('last_seen', 8)
+            return [MockExecution(execution_id) for execution_id in range(last_seen - 1, 0, -1)][:limit]
+
+        monkeypatch.setattr(table, 'select', select)
+        assert [e.id for e in table.select_iter(batch_size=3, prefetch=['services'], status='terminated')] == [7, 6, 5, 4, 3, 2, 1]
+        assert calls == [
+            (3, ['services'], {'status': 'terminated'}),
+            (3, ['services'], {'status': 'terminated', 'last_seen': 5}),
+            (3, ['services'], {'status': 'terminated', 'last_seen': 2})
+        ]
+
+    def test_usage_db_error(self):
+        """A database error is logged and no usage is reported, as in count()."""
+        table = MockSQLManager().executions
+        table.cursor = MockCursor()
+        table.cursor.error = psycopg2.OperationalError('connection lost')
+        assert table.usage(1, ['running']) == (0, 0.0, 0)
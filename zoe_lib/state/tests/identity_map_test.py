@@ -0,0 +1,96 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the identity map of the state layer."""
+
+import threading
+
+from zoe_lib.state.base import BaseRecord, BaseTable
+from zoe_lib.state.identity_map import IdentityMap
+from zoe_lib.state.tests.mock_sql_manager import MockSQLManager
+
+
+class MockRecord(BaseRecord):
+    """A record with a single mutable column, that counts how many times it has been built."""
+    built = 0
+
+    def __init__(self, d, sql_manager):
+        super().__init__(d, sql_manager)
+        MockRecord.built += 1
+        self.status = d['status']
+
+    def serialize(self):
+        return {'id': self.id, 'status': self.status}
+
+    def refresh(self, fields):
+        if 'status' in fields:
+            self.status = fields['status']
+
+
+class TestIdentityMap:
+    """Identity map tests."""
+
+    def test_one_object_per_row(self):
+        """Reading a row again returns the same object, refreshed with the new values."""
+        id_map = IdentityMap()
+        MockRecord.built = 0
+        first = id_map.load('test', {'id': 1, 'status': 'created'}, MockRecord, None)
+        second = id_map.load('test', {'id': 1, 'status': 'active'}, MockRecord, None)
+        assert first is second
+        assert first.status == 'active'
+        assert MockRecord.built == 1
+
+        id_map.update('test', 1, {'status': 'terminated'})
+        assert first.status == 'terminated'
+
+    def test_invalidate(self):
+        """After invalidation a new object is built."""
+        id_map = IdentityMap()
+        first = id_map.load('test', {'id': 1, 'status': 'created'}, MockRecord, None)
+        id_map.invalidate('test', 1)
+        assert id_map.get('test', 1) is None
+        assert id_map.load('test', {'id': 1, 'status': 'created'}, MockRecord, None) is not first
+
+    def test_weak_references(self):
+        """The map does not keep records alive."""
+        id_map = IdentityMap()
+        id_map.load('test', {'id': 1, 'status': 'created'}, MockRecord, None)
+        assert id_map.get('test', 1) is None
+
+    def test_uncommitted_writes_kept(self, monkeypatch):
+        """A row read by a thread does not undo the values another thread is writing in a transaction, until they are committed."""
+        monkeypatch.setattr(BaseTable, 'execute_update', staticmethod(lambda cursor, table, record_id, fields: None))
+        state = MockSQLManager()
+        state.identity_map = IdentityMap()
+        record = state.load_record('service', {'id': 1, 'status': 'starting'}, MockRecord)
+        updated = threading.Event()
+        commit = threading.Event()
+
+        def spawn():
+            """Set the service active in a transaction, commit when told to."""
+            with state.transaction():
+                BaseTable(state, 'service').update(1, status='active')
+                updated.set()
+                assert commit.wait(timeout=5)
+
+        writer = threading.Thread(target=spawn)
+        writer.start()
+        assert updated.wait(timeout=5)
+        assert state.load_record('service', {'id': 1, 'status': 'starting'}, MockRecord).status == 'active'
+        commit.set()
+        writer.join(timeout=5)
+
+        assert state.load_record('service', {'id': 1, 'status': 'inactive'}, MockRecord) is record
+        assert record.status == 'inactive'
@@ -0,0 +1,53 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the SQL schema migrations."""
+
+from zoe_lib.state import migrations
+from zoe_lib.version import SQL_SCHEMA_VERSION
+
+
+class MockCursor:
+    """Records the executed queries."""
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, args=None):
+        """Fake execute."""
+        self.queries.append((query, args))
+
+
+class TestMigrations:
+    """Schema migration tests."""
+
+    def test_all_versions_covered(self):
+        """There is a migration for every version after the base schema."""
+        assert sorted(migrations.MIGRATIONS) == list(range(migrations.BASE_SCHEMA_VERSION + 1, SQL_SCHEMA_VERSION + 1))
+        assert migrations.can_upgrade(migrations.BASE_SCHEMA_VERSION)
+        assert not migrations.can_upgrade(SQL_SCHEMA_VERSION + 1)
+
+    def test_upgrade_from_base(self):
+        """Each migration is followed by the update of the version table."""
+        cur = MockCursor()
+        migrations.upgrade(cur, 'test', migrations.BASE_SCHEMA_VERSION)
+        version_updates = [args for query, args in cur.queries if query.startswith('UPDATE public.versions')]
+        assert version_updates[-1] == (SQL_SCHEMA_VERSION, 'test')
+        assert cur.queries[-1][0].startswith('UPDATE public.versions')
+
+    def test_upgrade_up_to_date(self):
+        """Nothing is done on an up-to-date schema."""
+        cur = MockCursor()
+        migrations.upgrade(cur, 'test', SQL_SCHEMA_VERSION)
+        assert len(cur.queries) == 0
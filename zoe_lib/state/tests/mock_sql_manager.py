@@ -21,17 +21,24 @@ from collections import namedtuple
 from zoe_lib.state.sql_manager import SQLManager
 
 
-Conf = namedtuple('Conf', ['dbuser', 'dbpass', 'dbhost', 'dbport', 'dbname', 'deployment_name'])
+Conf = namedtuple('Conf', ['dbuser', 'dbpass', 'dbhost', 'dbport', 'dbname', 'dbpool_size', 'deployment_name'])
 
 
 class MockSQLManager(SQLManager):
     """A mock SQL manager."""
     def __init__(self):
-        fake_conf = Conf(dbuser='', dbpass='', dbhost='', dbport=5432, dbname='', deployment_name='test')
+        fake_conf = Conf(dbuser='', dbpass='', dbhost='', dbport=5432, dbname='', dbpool_size=1, deployment_name='test')
         super().__init__(fake_conf)
 
     def _connect(self):
-        self.conn = sqlite3.connect(':memory:')
+        self._sqlite_conn = sqlite3.connect(':memory:', check_same_thread=False)  # pylint: disable=attribute-defined-outside-init
 
-    def _cursor(self):
+    @property
+    def conn(self):
+        return self._sqlite_conn
+
+    def cursor(self):
         return self.conn.cursor()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,66 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the unit-of-work transactions of the state layer."""
+
+import pytest
+
+from zoe_lib.state.base import BaseTable
+from zoe_lib.state.tests.mock_sql_manager import MockSQLManager
+
+
+class TestTransaction:
+    """Transaction tests."""
+
+    @pytest.fixture
+    def executed(self, monkeypatch):
+        """Record the UPDATE queries instead of running them."""
+        queries = []
+        monkeypatch.setattr(BaseTable, 'execute_update', staticmethod(lambda cursor, table, record_id, fields: queries.append((table, record_id, dict(fields)))))
+        return queries
+
+    def test_updates_are_merged(self, executed):  # pylint: disable=redefined-outer-name
+        """Updates to the same record are merged and written when the outermost block exits."""
+        state = MockSQLManager()
+        with state.transaction():
+            state.buffer_update('service', 1, {'status': 'starting'})
+            with state.transaction():
+                state.buffer_update('service', 1, {'status': 'active', 'ip_address': '10.0.0.1'})
+                state.buffer_update('port', 7, {'active': True})
+            assert len(executed) == 0
+        assert executed == [('service', 1, {'status': 'active', 'ip_address': '10.0.0.1'}), ('port', 7, {'active': True})]
+        assert not state.buffer_update('service', 1, {'status': 'inactive'})
+
+    def test_flush_on_error(self, executed):  # pylint: disable=redefined-outer-name
+        """Buffered updates are written even if the block raises, deleted records are skipped."""
+        state = MockSQLManager()
+        with pytest.raises(ValueError):
+            with state.transaction():
+                state.buffer_update('service', 1, {'status': 'error'})
+                state.buffer_update('service', 2, {'status': 'error'})
+                state.drop_pending('service', 2)
+                raise ValueError
+        assert executed == [('service', 1, {'status': 'error'})]
+
+    def test_reads_see_buffered_updates(self, executed):  # pylint: disable=redefined-outer-name
+        """Records loaded inside a block include the buffered updates, without sending them to the database."""
+        state = MockSQLManager()
+        with state.transaction():
+            state.buffer_update('service', 1, {'status': 'active'})
+            record = state.load_record('service', {'id': 1, 'status': 'starting', 'name': 'spark-master'}, lambda row, sql_manager: row)
+            assert record == {'id': 1, 'status': 'active', 'name': 'spark-master'}
+            assert state.load_record('service', {'id': 2, 'status': 'starting'}, lambda row, sql_manager: row)['status'] == 'starting'
+            assert len(executed) == 0
+        assert executed == [('service', 1, {'status': 'active'})]
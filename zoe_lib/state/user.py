@@ -149,7 +149,7 @@ class UserTable(BaseTable):
 
         :param only_one: only one result is expected
         :type only_one: bool
-        :param kwargs: filter services based on their fields/columns
+        :param kwargs: filter services based on their fields/columns, list values match any of their elements
         :return: one or more ports
         """
         q_base = 'SELECT * FROM "user"'
@@ -158,7 +158,11 @@ class UserTable(BaseTable):
             filter_list = []
             args_list = []
             for key, value in kwargs.items():
-                filter_list.append('{} = %s'.format(key))
+                if isinstance(value, (list, tuple)):
+                    filter_list.append('{} = ANY(%s)'.format(key))
+                    value = list(value)
+                else:
+                    filter_list.append('{} = %s'.format(key))
                 args_list.append(value)
             q += ' AND '.join(filter_list)
             query = self.cursor.mogrify(q, args_list)
@@ -31,6 +31,7 @@ def zoe_configuration():
     zoe_api_args.dbuser = 'zoeuser'
     zoe_api_args.dbpass = 'zoepass'
     zoe_api_args.dbname = 'zoe'
+    zoe_api_args.dbpool_size = 0
     zoe_api_args.api_listen_uri = 'tcp://*:4850'
     zoe_api_args.kairosdb_enable = False
     zoe_api_args.workspace_base_path = '/tmp'
@@ -39,14 +40,20 @@ def zoe_configuration():
     zoe_api_args.gelf_listener = 0
     zoe_api_args.listen_address = '0.0.0.0'
     zoe_api_args.listen_port = 5100
+    zoe_api_args.api_db_workers = 2
     zoe_api_args.master_url = 'tcp://127.0.0.1:4850'
     zoe_api_args.cookie_secret = 'changeme'
     zoe_api_args.auth_type = 'text'
     zoe_api_args.auth_file = 'zoepass.csv'
     zoe_api_args.scheduler_class = 'ZoeElasticScheduler'
     zoe_api_args.scheduler_policy = 'FIFO'
+    zoe_api_args.core_redistribution = 'equal'
     zoe_api_args.backend = 'DockerEngine'
     zoe_api_args.backend_docker_config_file = 'integration_tests/sample_docker.conf'
+    zoe_api_args.backend_service_start_workers = 4
+    zoe_api_args.backend_execution_start_workers = 2
+    zoe_api_args.backend_termination_workers = 4
+    zoe_api_args.backend_image_pull_workers = 2
     zoe_api_args.zapp_shop_path = 'contrib/zapp-shop-sample'
     zoe_api_args.log_file = 'stderr'
     zoe_api_args.max_core_limit = 1
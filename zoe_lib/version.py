@@ -18,4 +18,4 @@
 ZOE_VERSION = '2018.12'
 ZOE_API_VERSION = '0.7'
 ZOE_APPLICATION_FORMAT_VERSION = 3
-SQL_SCHEMA_VERSION = 7  # ---> Increment this value every time the SQL schema changes !!! <---
+SQL_SCHEMA_VERSION = 10  # ---> Increment this value every time the SQL schema changes !!! <---
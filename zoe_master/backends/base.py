@@ -15,10 +15,11 @@
 
 """The base class that all back-ends should implement."""
 
-from typing import List
+from typing import List, Tuple
 
 from zoe_lib.state import Service
 from zoe_master.stats import ClusterStats
+from zoe_master.backends.image_index import ImageIndex
 from zoe_master.backends.service_instance import ServiceInstance
 
 
@@ -56,14 +57,19 @@ class BaseBackend:
         """Get the platform state. This method should fill-in a new ClusterStats object at each call, with fresh statistics on the available nodes and resource availability. This information will be used for taking scheduling decisions."""
         raise NotImplementedError
 
-    def preload_image(self, image_name: str) -> None:
-        """Make a service image available."""
+    def preload_image(self, image_name: str, node_name: str) -> None:
+        """Make a service image available on a node, raise ZoeException if it cannot be pulled."""
         raise NotImplementedError
 
     def update_service(self, service, cores=None, memory=None):
         """Update a service reservation."""
         raise NotImplementedError
 
+    def update_services_cores(self, node_name: str, updates: List[Tuple[Service, float]]) -> None:  # pylint: disable=unused-argument
+        """Update the core limits of many services running on the same node. Back-ends can override this method to apply all updates with a single connection."""
+        for service, cores in updates:
+            self.update_service(service, cores=cores)
+
     def node_list(self) -> List[str]:
         """List node names configured in the back-end."""
         raise NotImplementedError
@@ -71,3 +77,7 @@ class BaseBackend:
     def list_available_images(self, node_name):
         """List the images available on the specified node."""
         raise NotImplementedError
+
+    def image_index(self) -> ImageIndex:
+        """Return the index of image names available on each node, kept up to date by the back-end."""
+        raise NotImplementedError
@@ -54,7 +54,7 @@ def gen_environment(execution: Execution, service: Service, env_subst_dict: Dict
 
 def gen_volumes(service: Service, execution: Execution) -> List[VolumeDescription]:
     """Return the list of default volumes to be added to all containers."""
-    vol_list = service.volumes
+    vol_list = list(service.volumes)
 
     wk_vol = ZoeFSWorkspace().get(execution.owner)
 
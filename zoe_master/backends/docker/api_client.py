@@ -16,7 +16,7 @@
 """Interface to the low-level Docker API."""
 
 import logging
-from typing import List, Callable, Dict, Any
+from typing import List, Dict, Any
 
 import docker
 import docker.tls
@@ -61,6 +61,17 @@ class DockerClient:
         except docker.errors.DockerException as e:
             raise ZoeException("Cannot connect to Docker host {} at address {}: {}".format(docker_config.name, docker_config.address, str(e)))
 
+    def ping(self) -> bool:
+        """Check that the Docker engine answers."""
+        try:
+            return self.cli.ping()
+        except (docker.errors.APIError, requests.exceptions.RequestException):
+            return False
+
+    def close(self) -> None:
+        """Close the connections to the Docker engine."""
+        self.cli.api.close()
+
     def info(self) -> Dict:
         """Retrieve engine statistics."""
         return self.cli.info()
@@ -223,25 +234,13 @@ class DockerClient:
         except docker.errors.APIError as e:
             log.warning(str(e))
 
-    def event_listener(self, callback: Callable[[str], bool]) -> None:
-        """An infinite loop that listens for events from Swarm."""
-        event_gen = self.cli.events(decode=True)
-        while True:
-            try:
-                event = next(event_gen)
-            except requests.exceptions.RequestException:
-                log.warning('Docker closed event connection, retrying...')
-                event_gen = self.cli.events(decode=True)
-                continue
-
-            try:
-                res = callback(event)
-            except Exception:
-                log.exception('Uncaught exception in swarm event callback')
-                log.warning('event was: {}'.format(event))
-                continue
-            if not res:
-                break
+    def events(self, since: int, until: int, filters=None):
+        """Generate the events that happened on the engine between two timestamps, when until is in the future the generator blocks until that time."""
+        try:
+            for event in self.cli.events(since=since, until=until, filters=filters, decode=True):
+                yield event
+        except (docker.errors.APIError, requests.exceptions.RequestException) as e:
+            raise ZoeException('Cannot read the events from host {}: {}'.format(self.name, e)) from e
 
     def list(self, only_label=None, status=None) -> List[dict]:
         """
@@ -320,8 +319,8 @@ class DockerClient:
             log.error('Cannot download image {}: {}'.format(image_name, e))
             raise ZoeException('Cannot download image {}: {}'.format(image_name, e))
 
-    def update(self, docker_id, cpu_quota=None, mem_reservation=None, mem_limit=None):
-        """Update the resource reservation for a container."""
+    def update(self, docker_id, cpu_quota=None, mem_reservation=None, mem_limit=None) -> bool:
+        """Update the resource reservation for a container, return False if the engine refused the update. Raises ZoeException if the engine cannot be reached."""
         kwargs = {}
         if cpu_quota is not None:
             kwargs['cpu_quota'] = cpu_quota
@@ -331,11 +330,10 @@ class DockerClient:
             kwargs['mem_limit'] = mem_limit
 
         try:
-            cont = self.cli.containers.get(docker_id)
-        except (docker.errors.NotFound, docker.errors.APIError):
-            return
-
-        try:
-            cont.update(**kwargs)
-        except docker.errors.APIError:
-            pass
+            self.cli.api.update_container(docker_id, **kwargs)
+        except (docker.errors.NotFound, docker.errors.APIError) as e:
+            log.warning('Cannot update container {} on host {}: {}'.format(docker_id, self.name, e))
+            return False
+        except requests.exceptions.RequestException as e:
+            raise ZoeException('Cannot update container {} on host {}: {}'.format(docker_id, self.name, e)) from e
+        return True
@@ -23,7 +23,7 @@ from typing import Union
 from zoe_lib.config import get_conf
 from zoe_lib.state import Service
 import zoe_master.backends.base
-from zoe_master.backends.docker.api_client import DockerClient
+from zoe_master.backends.docker.client_pool import DockerClientPool
 from zoe_master.backends.docker.config import DockerConfig, DockerHostConfig  # pylint: disable=unused-import
 from zoe_master.backends.docker.threads import DockerStateSynchronizer
 from zoe_master.backends.service_instance import ServiceInstance
@@ -40,24 +40,36 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
     """Zoe backend implementation for old-style stand-alone Docker Swarm."""
     def __init__(self, opts):
         super().__init__(opts)
-        self.docker_config = DockerConfig(get_conf().backend_docker_config_file).read_config()
+        self.clients = DockerClientPool()
+        self.config_file = DockerConfig(get_conf().backend_docker_config_file)
+        self.docker_config = []
+        self._host_configs = {}
+        self._set_hosts(self.config_file.read_config())
+
+    def _set_hosts(self, hosts):
+        self._host_configs = {host.name: host for host in hosts}
+        self.docker_config = hosts
 
     def _get_config(self, host) -> Union[DockerHostConfig, None]:
-        for conf in self.docker_config:
-            if conf.name == host:
-                return conf
-        return None
+        return self._host_configs.get(host)
+
+    def reload_config(self) -> bool:
+        """Parse the configuration file again if it has changed on disk, return True if the host list was reloaded."""
+        if not self.config_file.changed():
+            return False
+        self._set_hosts(self.config_file.read_config())
+        log.info('Docker backend configuration reloaded, {} hosts configured'.format(len(self.docker_config)))
+        return True
 
-    @classmethod
-    def init(cls, state):
+    def init(self, state):
         """Initializes Swarm backend starting the event monitoring thread."""
         global _checker
-        _checker = DockerStateSynchronizer(state)
+        _checker = DockerStateSynchronizer(state, self)
 
-    @classmethod
-    def shutdown(cls):
+    def shutdown(self):
         """Performs a clean shutdown of the resources used by Swarm backend."""
         _checker.quit()
+        self.clients.close_all()
 
     def spawn_service(self, service_instance: ServiceInstance):
         """Spawn a service, translating a Zoe Service into a Docker container."""
@@ -66,7 +78,7 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
             raise ZoeStartExecutionFatalException('Image {} does not have a version tag'.format(service_instance.image_name))
         conf = self._get_config(service_instance.backend_host)
         try:
-            engine = DockerClient(conf)
+            engine = self.clients.get(conf)
             cont_info = engine.spawn_container(service_instance)
         except ZoeNotEnoughResourcesException:
             raise ZoeStartExecutionRetryException('Not enough free resources to satisfy reservation request for service {}'.format(service_instance.name))
@@ -80,7 +92,7 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
         conf = self._get_config(service.backend_host)
         service.set_terminating()
         try:
-            engine = DockerClient(conf)
+            engine = self.clients.get(conf)
         except ZoeException as e:
             log.error('Cannot terminate service {}: {}'.format(service.id, str(e)))
             return
@@ -110,29 +122,18 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
     def service_log(self, service: Service):
         """Get the log."""
         conf = self._get_config(service.backend_host)
-        engine = DockerClient(conf)
+        engine = self.clients.get(conf)
         return engine.logs(service.backend_id, True, False)
 
-    def preload_image(self, image_name):
-        """Pull an image from a Docker registry into each host. We shuffle the list to prevent the scheduler to find always the first host in the list."""
+    def preload_image(self, image_name, node_name):
+        """Pull an image from a Docker registry into a host."""
         parsed_name = re.search(r'^(?:([^/]+)/)?(?:([^/]+)/)?([^@:/]+)(?:[@:](.+))?$', image_name)
         if parsed_name.group(4) is None:
             raise ZoeException('Image {} does not have a version tag'.format(image_name))
-        one_success = False
-        for host_conf in self.docker_config:
-            log.debug('Pre-loading image {} on host {}'.format(image_name, host_conf.name))
-            time_start = time.time()
-            my_engine = DockerClient(host_conf)
-            try:
-                my_engine.pull_image(image_name)
-            except ZoeException:
-                log.error('Image {} pre-loading failed on host {}'.format(image_name, host_conf.name))
-                continue
-            else:
-                one_success = True
-            log.debug('Image {} pre-loaded on host {} in {:.2f}s'.format(image_name, host_conf.name, time.time() - time_start))
-        if not one_success:
-            raise ZoeException('Cannot pull image {}'.format(image_name))
+        conf = self._get_config(node_name)
+        if conf is None:
+            raise ZoeException('Host {} is not configured'.format(node_name))
+        self.clients.get(conf).pull_image(image_name)
 
     def list_available_images(self, node_name):
         """List the images available on the specified node."""
@@ -142,11 +143,15 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
             return []
         return node_stats.images
 
+    def image_index(self):
+        """Return the image index maintained by the synchro threads."""
+        return _checker.image_index
+
     def update_service(self, service, cores=None, memory=None):
         """Update a service reservation."""
         conf = self._get_config(service.backend_host)
         try:
-            engine = DockerClient(conf)
+            engine = self.clients.get(conf)
         except ZoeException as e:
             log.error(str(e))
             return
@@ -157,8 +162,39 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
             if memory is not None and memory > info['MemTotal']:
                 memory = info['MemTotal']
             cpu_quota = int(cores * 100000)
-            engine.update(service.backend_id, cpu_quota=cpu_quota, mem_reservation=memory)
+            try:
+                updated = engine.update(service.backend_id, cpu_quota=cpu_quota, mem_reservation=memory)
+            except ZoeException as e:
+                log.error(str(e))
+                self.clients.discard(service.backend_host)
+                return
+            if updated:
+                _checker.record_core_limit(service.backend_host, service.id, service.backend_id, cpu_quota / 100000)
         else:
             log.error('Cannot update reservations for service {} ({}), since it has no backend ID'.format(service.name, service.id))
             if service.status == service.INACTIVE_STATUS:
                 service.set_backend_status(service.BACKEND_UNDEFINED_STATUS)
+
+    def update_services_cores(self, node_name, updates):
+        """Update the core limits of many services running on the same host, using a single connection. Only the limits applied by Docker are recorded, if the host cannot be reached the remaining updates are skipped."""
+        conf = self._get_config(node_name)
+        try:
+            engine = self.clients.get(conf)
+        except ZoeException as e:
+            log.error(str(e))
+            return
+        for service, cores in updates:
+            if service.backend_id is None:
+                log.error('Cannot update reservations for service {} ({}), since it has no backend ID'.format(service.name, service.id))
+                if service.status == service.INACTIVE_STATUS:
+                    service.set_backend_status(service.BACKEND_UNDEFINED_STATUS)
+                continue
+            cpu_quota = int(cores * 100000)
+            try:
+                updated = engine.update(service.backend_id, cpu_quota=cpu_quota)
+            except ZoeException as e:
+                log.error('{}, the other core limits on this host are not updated'.format(e))
+                self.clients.discard(node_name)
+                return
+            if updated:
+                _checker.record_core_limit(node_name, service.id, service.backend_id, cpu_quota / 100000)
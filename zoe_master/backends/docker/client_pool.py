@@ -0,0 +1,83 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Long-lived Docker API clients, shared by all the threads of the master."""
+
+import logging
+import threading
+import time
+
+from zoe_master.backends.docker.api_client import DockerClient
+from zoe_master.backends.docker.config import DockerHostConfig  # pylint: disable=unused-import
+
+log = logging.getLogger(__name__)
+
+CLIENT_CHECK_INTERVAL = 30
+
+
+class DockerClientPool:
+    """
+    One DockerClient per host, created on first use and kept open.
+
+    Creating a client costs a version negotiation round-trip and, for TLS hosts, a handshake, while the connections of an existing client are kept alive. A client that has not been checked for CLIENT_CHECK_INTERVAL seconds is pinged before being returned and is replaced if the host does not answer.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._host_locks = {}
+        self._clients = {}  # host name -> (host config, client, time of the last successful check)
+
+    def _host_lock(self, host_name) -> threading.Lock:
+        with self._lock:
+            if host_name not in self._host_locks:
+                self._host_locks[host_name] = threading.Lock()
+            return self._host_locks[host_name]
+
+    def get(self, host_config: DockerHostConfig) -> DockerClient:
+        """Return the client for a host, connecting to it if needed. Raises ZoeException if the host cannot be reached."""
+        with self._host_lock(host_config.name):
+            entry = self._clients.get(host_config.name)
+            if entry is not None and vars(entry[0]) != vars(host_config):
+                log.debug('Configuration of Docker host {} has changed, reconnecting'.format(host_config.name))
+                self._close(host_config.name)
+                entry = None
+            if entry is not None and time.time() - entry[2] > CLIENT_CHECK_INTERVAL:
+                if entry[1].ping():
+                    entry = (entry[0], entry[1], time.time())
+                    self._clients[host_config.name] = entry
+                else:
+                    log.info('Connection to Docker host {} lost, reconnecting'.format(host_config.name))
+                    self._close(host_config.name)
+                    entry = None
+            if entry is None:
+                entry = (host_config, DockerClient(host_config), time.time())
+                self._clients[host_config.name] = entry
+            return entry[1]
+
+    def discard(self, host_name: str) -> None:
+        """Close the client for a host, for instance after an error, the next call to get() will connect again."""
+        with self._host_lock(host_name):
+            self._close(host_name)
+
+    def _close(self, host_name):
+        entry = self._clients.pop(host_name, None)
+        if entry is not None:
+            entry[1].close()
+
+    def close_all(self) -> None:
+        """Close all the clients."""
+        with self._lock:
+            host_names = list(self._host_locks.keys())
+        for host_name in host_names:
+            self.discard(host_name)
@@ -17,6 +17,7 @@
 
 import configparser
 import logging
+import os
 from typing import List
 
 log = logging.getLogger(__name__)
@@ -39,9 +40,21 @@ class DockerConfig:
     """A class that holds the configuration for the Docker Engine backend."""
     def __init__(self, config_file):
         self.conffile = config_file
+        self.mtime = None
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.conffile).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        """Return True if the configuration file has been modified since the last call to read_config()."""
+        return self._file_mtime() != self.mtime
 
     def read_config(self) -> List[DockerHostConfig]:
         """Parse the configuration file."""
+        self.mtime = self._file_mtime()
         config = configparser.ConfigParser()
         config.read(self.conffile)
         hosts = []
@@ -17,7 +17,9 @@
 
 import time
 
+import docker.errors
 import pytest
+import requests.exceptions
 
 from zoe_master.backends.docker import api_client
 from zoe_master.backends.docker.config import DockerHostConfig
@@ -28,6 +30,7 @@ class MockDocker:
     """A mock object for the official docker client."""
     def __init__(self):
         self.containers = MockContainerModel()
+        self.api = MockLowLevelAPI()
 
     def info(self):
         """The info method."""
@@ -163,6 +166,23 @@ class MockDocker:
         }
 
 
+    def events(self, since, until, filters, decode):
+        """The events method, the stream breaks after the first event."""
+        assert decode and since < until
+        yield {'Type': 'container', 'Action': 'die', 'Actor': {'ID': 'test', 'Attributes': {}}, 'filters': filters}
+        raise requests.exceptions.ConnectionError('connection closed')
+
+
+class MockLowLevelAPI:
+    """A mock object for the low-level API of the docker client."""
+    def update_container(self, docker_id, **kwargs):  # pylint: disable=unused-argument
+        """The update_container method, fails for the 'missing' and 'unreachable' containers."""
+        if docker_id == 'missing':
+            raise docker.errors.NotFound('no such container')
+        if docker_id == 'unreachable':
+            raise requests.exceptions.ConnectionError('connection refused')
+
+
 class MockContainerModel:
     """A mock object fot the docker container model."""
     def get(self, docker_id):
@@ -392,3 +412,25 @@ class TestDockerEngineApiClient:
         cli = api_client.DockerClient(dhc, mock_client)
         cli.terminate_container('test')
         cli.terminate_container('test', delete=True)
+
+    def test_events(self, docker_client):
+        """Test that errors in the event stream are translated into Zoe exceptions."""
+        dhc = DockerHostConfig()
+        dhc.name = 'test'
+        cli = api_client.DockerClient(dhc, docker_client)
+        received = []
+        with pytest.raises(ZoeException):
+            for event in cli.events(since=10, until=15, filters={'type': ['container']}):
+                received.append(event)
+        assert len(received) == 1
+        assert received[0]['Action'] == 'die'
+
+    def test_update(self, docker_client):
+        """Updates refused by the engine return False, connection errors are translated into Zoe exceptions."""
+        dhc = DockerHostConfig()
+        dhc.name = 'test'
+        cli = api_client.DockerClient(dhc, docker_client)
+        assert cli.update('test', cpu_quota=100000)
+        assert not cli.update('missing', cpu_quota=100000)
+        with pytest.raises(ZoeException):
+            cli.update('unreachable', cpu_quota=100000)
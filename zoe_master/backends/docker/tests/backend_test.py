@@ -0,0 +1,81 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the Docker back-end."""
+
+from types import SimpleNamespace
+
+from zoe_master.backends.docker import backend
+from zoe_master.backends.docker.config import DockerHostConfig
+from zoe_master.exceptions import ZoeException
+
+
+class MockEngine:
+    """A Docker client that refuses the updates of the 'refused' containers and loses the connection on the 'unreachable' ones."""
+    def __init__(self):
+        self.updated = []
+
+    def update(self, docker_id, cpu_quota=None):  # pylint: disable=unused-argument
+        """Fake update."""
+        if docker_id == 'unreachable':
+            raise ZoeException('connection refused')
+        self.updated.append(docker_id)
+        return docker_id != 'refused'
+
+
+class MockClientPool:
+    """Always returns the same client."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.discarded = []
+
+    def get(self, host_config):  # pylint: disable=unused-argument
+        """Fake get."""
+        return self.engine
+
+    def discard(self, host_name):
+        """Fake discard."""
+        self.discarded.append(host_name)
+
+
+class MockChecker:
+    """Records the core limits."""
+    def __init__(self):
+        self.limits = []
+
+    def record_core_limit(self, host_name, service_id, container_id, cores):
+        """Fake record."""
+        self.limits.append((host_name, service_id, container_id, cores))
+
+
+def _service(service_id, backend_id):
+    return SimpleNamespace(id=service_id, name='service{}'.format(service_id), backend_id=backend_id)
+
+
+class TestDockerEngineBackend:
+    """Docker back-end tests."""
+
+    def test_update_services_cores(self, monkeypatch):
+        """Only the limits applied by Docker are recorded, a connection error skips the other services of the host."""
+        checker = MockChecker()
+        monkeypatch.setattr(backend, '_checker', checker)
+        docker_backend = backend.DockerEngineBackend.__new__(backend.DockerEngineBackend)
+        docker_backend.clients = MockClientPool(MockEngine())
+        docker_backend._host_configs = {'n1': DockerHostConfig()}  # pylint: disable=protected-access
+
+        docker_backend.update_services_cores('n1', [(_service(1, 'c1'), 1.5), (_service(2, 'refused'), 2), (_service(3, 'unreachable'), 2), (_service(4, 'c4'), 2)])
+        assert checker.limits == [('n1', 1, 'c1', 1.5)]
+        assert docker_backend.clients.engine.updated == ['c1', 'refused']
+        assert docker_backend.clients.discarded == ['n1']
@@ -0,0 +1,84 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests"""
+
+from zoe_master.backends.docker import client_pool
+from zoe_master.backends.docker.config import DockerHostConfig
+
+
+class MockClient:
+    """A stand-in for the Zoe DockerClient that does not connect anywhere."""
+    healthy = True
+
+    def __init__(self, host_config):
+        self.name = host_config.name
+        self.closed = False
+
+    def ping(self):
+        """Fake health check."""
+        return self.healthy
+
+    def close(self):
+        """Fake close."""
+        self.closed = True
+
+
+def _host_config(name, address):
+    conf = DockerHostConfig()
+    conf.name = name
+    conf.address = address
+    return conf
+
+
+class TestDockerClientPool:
+    """Docker client pool tests."""
+
+    def test_client_reuse(self, monkeypatch):
+        """The same client is returned until the host configuration changes."""
+        monkeypatch.setattr(client_pool, 'DockerClient', MockClient)
+        pool = client_pool.DockerClientPool()
+        client = pool.get(_host_config('host1', 'tcp://host1:2375'))
+        assert pool.get(_host_config('host1', 'tcp://host1:2375')) is client
+        assert pool.get(_host_config('host2', 'tcp://host2:2375')) is not client
+
+        new_client = pool.get(_host_config('host1', 'tcp://host1:2376'))
+        assert new_client is not client
+        assert client.closed
+
+    def test_health_check(self, monkeypatch):
+        """Clients that do not answer the ping are replaced."""
+        monkeypatch.setattr(client_pool, 'DockerClient', MockClient)
+        monkeypatch.setattr(client_pool, 'CLIENT_CHECK_INTERVAL', -1)
+        pool = client_pool.DockerClientPool()
+        client = pool.get(_host_config('host1', 'tcp://host1:2375'))
+        assert pool.get(_host_config('host1', 'tcp://host1:2375')) is client
+
+        client.healthy = False
+        new_client = pool.get(_host_config('host1', 'tcp://host1:2375'))
+        assert new_client is not client
+        assert client.closed
+
+    def test_discard(self, monkeypatch):
+        """Discarded and closed clients are created again on the next request."""
+        monkeypatch.setattr(client_pool, 'DockerClient', MockClient)
+        pool = client_pool.DockerClientPool()
+        client = pool.get(_host_config('host1', 'tcp://host1:2375'))
+        pool.discard('host1')
+        assert client.closed
+        other = pool.get(_host_config('host1', 'tcp://host1:2375'))
+        assert other is not client
+        pool.close_all()
+        assert other.closed
@@ -15,6 +15,8 @@
 
 """Unit tests"""
 
+import os
+
 from zoe_master.backends.docker import config
 
 
@@ -29,3 +31,18 @@ class TestDockerEngineBackendConfig:
         """Test Docker backend config parsing."""
         hosts = config.DockerConfig(config_file='integration_tests/sample_docker.conf').read_config()
         assert len(hosts) == 1
+
+    def test_config_file_changed(self, tmp_path):
+        """Test the detection of configuration file changes."""
+        conf_file = tmp_path / 'docker.conf'
+        conf_file.write_text('[host1]\ndocker_address = tcp://host1:2375\nexternal_address = 10.0.0.1\nuse_tls = no\n')
+        docker_config = config.DockerConfig(config_file=str(conf_file))
+        assert docker_config.changed()
+        assert len(docker_config.read_config()) == 1
+        assert not docker_config.changed()
+
+        conf_file.write_text(conf_file.read_text() + '\n[host2]\ndocker_address = tcp://host2:2375\nexternal_address = 10.0.0.2\nuse_tls = no\n')
+        os.utime(str(conf_file), ns=(docker_config.mtime + 1000000000, docker_config.mtime + 1000000000))
+        assert docker_config.changed()
+        assert [host.name for host in docker_config.read_config()] == ['host1', 'host2']
+        assert not docker_config.changed()
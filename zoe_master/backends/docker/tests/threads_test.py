@@ -0,0 +1,253 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the synchronization of the Zoe state with the Docker event streams."""
+
+import contextlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.state import Service
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+from zoe_master.backends import events
+from zoe_master.backends.docker import threads
+from zoe_master.backends.docker.config import DockerHostConfig
+from zoe_master.backends.image_index import ImageIndex
+from zoe_master.exceptions import ZoeException
+from zoe_master.stats import NodeStats
+
+GB = 1024 ** 3
+
+
+class MockService:
+    """A minimal stand-in for a Zoe service."""
+    def __init__(self, service_id, backend_id):
+        self.id = service_id
+        self.name = 'service{}'.format(service_id)
+        self.backend_id = backend_id
+        self.backend_status = Service.BACKEND_UNDEFINED_STATUS
+        self.status = Service.ACTIVE_STATUS
+        self.resource_reservation = SimpleNamespace(memory=SimpleNamespace(min=GB), cores=SimpleNamespace(min=1))
+
+    def set_backend_status(self, new_status):
+        """Fake state change."""
+        self.backend_status = new_status
+
+
+class MockServiceTable:
+    """Returns the services by ID."""
+    def __init__(self, services):
+        self.services = {service.id: service for service in services}
+
+    def select(self, only_one=False, **kwargs):
+        """Fake select."""
+        assert only_one
+        return self.services.get(kwargs['id'])
+
+
+class MockState:
+    """A minimal stand-in for the SQL manager."""
+    def __init__(self, services):
+        self.services = MockServiceTable(services)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Fake transaction."""
+        yield self
+
+    def release_connection(self):
+        """Fake release."""
+
+
+class MockEngine:
+    """A Docker client whose containers all have a limit of 2 cores and 1GB of memory."""
+    def __init__(self, event_windows=(), stop=None):
+        self.event_windows = list(event_windows)
+        self.windows_read = []
+        self.stop = stop
+
+    def inspect_container(self, docker_id):  # pylint: disable=unused-argument
+        """Fake inspect."""
+        return {'cpu_quota': 200000, 'cpu_period': 100000, 'memory_hard_limit': GB}
+
+    def events(self, since, until, filters=None):  # pylint: disable=unused-argument
+        """Return the next window of events, or raise if it is an exception. The stop event is set after the last window."""
+        self.windows_read.append((since, until))
+        window = self.event_windows.pop(0)
+        if len(self.event_windows) == 0:
+            self.stop.set()
+        if isinstance(window, Exception):
+            raise window
+        return window
+
+
+class MockClientPool:
+    """Always returns the same client."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.discarded = []
+
+    def get(self, host_config):  # pylint: disable=unused-argument
+        """Fake get."""
+        return self.engine
+
+    def discard(self, host_name):
+        """Fake discard."""
+        self.discarded.append(host_name)
+
+
+def _container_event(action, container_id, service_id):
+    return {'Type': 'container', 'Action': action, 'Actor': {'ID': container_id, 'Attributes': {'zoe_deployment_name': 'integration_test', 'zoe_service_id': str(service_id)}}}
+
+
+def _host_config():
+    conf = DockerHostConfig()
+    conf.name = 'n1'
+    return conf
+
+
+def _synchronizer(services, engine):
+    synchronizer = threads.DockerStateSynchronizer.__new__(threads.DockerStateSynchronizer)
+    synchronizer.state = MockState(services)
+    synchronizer.backend = SimpleNamespace(clients=MockClientPool(engine))
+    synchronizer.image_index = ImageIndex()
+    node = NodeStats('n1')
+    node.status = 'online'
+    node.cores_total = 8
+    node.memory_total = 16 * GB
+    synchronizer.host_stats = {'n1': node}
+    synchronizer.host_reservations = {'n1': {}}
+    synchronizer.host_running = {'n1': set()}
+    synchronizer.host_limits = {'n1': {}}
+    synchronizer.limits_lock = threading.Lock()
+    return synchronizer
+
+
+class TestDockerStateSynchronizer:
+    """Docker event handling tests."""
+
+    @pytest.fixture(autouse=True)
+    def mock_config(self, zoe_configuration):  # pylint: disable=redefined-outer-name
+        """Fixture for mock config."""
+        load_configuration(zoe_configuration)
+
+    @pytest.fixture
+    def notified(self):
+        """Record the back-end events."""
+        received = []
+
+        def callback(event_name, node_name):
+            """Record an event."""
+            received.append((event_name, node_name))
+
+        events.subscribe(callback)
+        yield received
+        events.unsubscribe(callback)
+
+    def test_container_lifecycle(self, notified):  # pylint: disable=redefined-outer-name
+        """Status, reservations, limits and container counts follow the events of a container."""
+        service = MockService(1, 'c1')
+        engine = MockEngine()
+        synchronizer = _synchronizer([service], engine)
+        node = synchronizer.host_stats['n1']
+        host_config = _host_config()
+
+        synchronizer._apply_event(host_config, engine, _container_event('create', 'c1', 1))  # pylint: disable=protected-access
+        assert service.backend_status == Service.BACKEND_CREATE_STATUS
+        assert (node.memory_reserved, node.cores_reserved) == (GB, 1)
+        assert (node.memory_allocated, node.cores_allocated) == (GB, 2)
+        assert node.service_stats[1] == {'core_limit': 2, 'mem_limit': GB}
+        assert node.container_count == 0
+
+        synchronizer._apply_event(host_config, engine, _container_event('start', 'c1', 1))  # pylint: disable=protected-access
+        assert service.backend_status == Service.BACKEND_START_STATUS
+        assert node.container_count == 1
+
+        synchronizer._apply_event(host_config, engine, _container_event('die', 'c1', 1))  # pylint: disable=protected-access
+        assert service.backend_status == Service.BACKEND_DIE_STATUS
+        assert node.container_count == 0
+        assert notified == [(events.SERVICE_DIED, 'n1')]
+
+        synchronizer._apply_event(host_config, engine, _container_event('destroy', 'c1', 1))  # pylint: disable=protected-access
+        assert service.backend_status == Service.BACKEND_DESTROY_STATUS
+        assert (node.memory_reserved, node.cores_reserved) == (0, 0)
+        assert (node.memory_allocated, node.cores_allocated) == (0, 0)
+        assert 1 not in node.service_stats
+        assert notified[-1] == (events.NODE_CHANGED, 'n1')
+
+    def test_die_after_oom(self, notified):  # pylint: disable=redefined-outer-name
+        """The die event that follows an oom does not hide the oom status, the death is notified once."""
+        service = MockService(1, 'c1')
+        engine = MockEngine()
+        synchronizer = _synchronizer([service], engine)
+        synchronizer._apply_event(_host_config(), engine, _container_event('start', 'c1', 1))  # pylint: disable=protected-access
+        synchronizer._apply_event(_host_config(), engine, _container_event('oom', 'c1', 1))  # pylint: disable=protected-access
+        synchronizer._apply_event(_host_config(), engine, _container_event('die', 'c1', 1))  # pylint: disable=protected-access
+        assert service.backend_status == Service.BACKEND_OOM_STATUS
+        assert notified.count((events.SERVICE_DIED, 'n1')) == 1
+
+    def test_older_container_ignored(self):
+        """Events of an older container of the same service do not change the service."""
+        service = MockService(1, 'c2')
+        service.backend_status = Service.BACKEND_START_STATUS
+        engine = MockEngine()
+        synchronizer = _synchronizer([service], engine)
+        synchronizer.host_reservations['n1'][1] = (GB, 1)
+        synchronizer._apply_event(_host_config(), engine, _container_event('destroy', 'c1', 1))  # pylint: disable=protected-access
+        assert service.backend_status == Service.BACKEND_START_STATUS
+        assert synchronizer.host_stats['n1'].cores_reserved == 1
+
+    def test_record_core_limit(self):
+        """Core limits applied to containers created after the last reconciliation are recorded."""
+        service = MockService(1, 'c1')
+        engine = MockEngine()
+        synchronizer = _synchronizer([service], engine)
+        synchronizer._apply_event(_host_config(), engine, _container_event('create', 'c1', 1))  # pylint: disable=protected-access
+        synchronizer.record_core_limit('n1', 1, 'c1', 0.5)
+        node = synchronizer.host_stats['n1']
+        assert node.service_stats[1]['core_limit'] == 0.5
+        assert node.cores_allocated == 0.5
+
+    def test_service_stats_replaced(self):
+        """The service stats read by other threads are never changed in place."""
+        service = MockService(1, 'c1')
+        engine = MockEngine()
+        synchronizer = _synchronizer([service], engine)
+        node = synchronizer.host_stats['n1']
+        initial_stats = node.service_stats
+        synchronizer._apply_event(_host_config(), engine, _container_event('create', 'c1', 1))  # pylint: disable=protected-access
+        created_stats = node.service_stats
+        synchronizer.record_core_limit('n1', 1, 'c1', 0.5)
+        synchronizer._apply_event(_host_config(), engine, _container_event('destroy', 'c1', 1))  # pylint: disable=protected-access
+        assert initial_stats == {}
+        assert created_stats == {1: {'core_limit': 2, 'mem_limit': GB}}
+        assert node.service_stats == {}
+
+    def test_event_windows(self, monkeypatch):
+        """Each window starts where the previous one ended, a stream error causes a reconciliation and the window is read again."""
+        stop = threading.Event()
+        engine = MockEngine([[], ZoeException('connection lost'), []], stop)
+        synchronizer = _synchronizer([], engine)
+        reconciliations = []
+        monkeypatch.setattr(synchronizer, '_reconcile', lambda host_config: reconciliations.append(len(engine.windows_read)) or True)
+
+        synchronizer._host_subthread(_host_config(), stop)  # pylint: disable=protected-access
+        assert reconciliations == [0, 2]
+        assert engine.windows_read[1][0] == engine.windows_read[0][1]
+        assert engine.windows_read[2][0] == engine.windows_read[1][0]
+        assert synchronizer.backend.clients.discarded == ['n1']
@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Monitor for the Swarm event stream."""
+"""Synchronization of the Zoe state with the Docker engines, driven by their event streams."""
 
 import logging
 import threading
@@ -21,125 +21,334 @@ import time
 
 from zoe_lib.config import get_conf
 from zoe_lib.state import SQLManager, Service
-from zoe_master.backends.docker.api_client import DockerClient
-from zoe_master.backends.docker.config import DockerConfig, DockerHostConfig  # pylint: disable=unused-import
+from zoe_master.backends.docker.config import DockerHostConfig  # pylint: disable=unused-import
+from zoe_master.backends import events
+from zoe_master.backends.image_index import ImageIndex
 from zoe_master.exceptions import ZoeException
 from zoe_master.stats import NodeStats
 
 log = logging.getLogger(__name__)
 
 CHECK_INTERVAL = 10
+RECONCILE_INTERVAL = 60
+EVENT_WAIT = 5
+
+# Backend status of a service after each container event
+CONTAINER_EVENTS = {
+    'create': Service.BACKEND_CREATE_STATUS,
+    'start': Service.BACKEND_START_STATUS,
+    'die': Service.BACKEND_DIE_STATUS,
+    'oom': Service.BACKEND_OOM_STATUS,
+    'destroy': Service.BACKEND_DESTROY_STATUS
+}
+IMAGE_EVENTS = ('pull', 'tag', 'untag', 'delete', 'import', 'load')
 
 
 class DockerStateSynchronizer(threading.Thread):
     """The Docker Checker."""
 
-    def __init__(self, state: SQLManager) -> None:
+    def __init__(self, state: SQLManager, backend) -> None:
+        """
+        :type backend: zoe_master.backends.docker.backend.DockerEngineBackend
+        """
         super().__init__()
         self.setName('checker')
-        self.stop = threading.Event()
         self.my_stop = threading.Event()
         self.state = state
+        self.backend = backend
         self.setDaemon(True)
-        self.host_checkers = []
+        self.host_checkers = {}
         self.host_stats = {}
-        for docker_host in DockerConfig(get_conf().backend_docker_config_file).read_config():
-            th = threading.Thread(target=self._host_subthread, args=(docker_host,), name='synchro_' + docker_host.name, daemon=True)
-            th.start()
-            self.host_checkers.append((th, docker_host))
+        self.host_reservations = {}  # host name -> {service ID: (memory, cores)}
+        self.host_running = {}  # host name -> IDs of the running containers
+        self.host_limits = {}  # host name -> {container ID: (memory limit, core limit)}
+        self.limits_lock = threading.Lock()  # the limits are changed also by the core limit thread
+        self.image_index = ImageIndex()
+        for docker_host in backend.docker_config:
+            self._start_host_thread(docker_host)
 
         self.start()
 
-    def _host_subthread(self, host_config: DockerHostConfig):  # pylint: disable=too-many-locals
+    def _start_host_thread(self, host_config: DockerHostConfig):
+        stop = threading.Event()
+        th = threading.Thread(target=self._host_subthread, args=(host_config, stop), name='synchro_' + host_config.name, daemon=True)
+        th.start()
+        self.host_checkers[host_config.name] = (th, host_config, stop)
+
+    def _update_hosts(self, hosts):
+        """Stop the threads of the hosts that were removed or changed in the configuration and start the ones for the new hosts."""
+        new_hosts = {host.name: host for host in hosts}
+        for name, (th, conf, stop) in list(self.host_checkers.items()):
+            if name in new_hosts and vars(new_hosts[name]) == vars(conf):
+                continue
+            log.info('Stopping synchro thread for host {}, its configuration has changed'.format(name))
+            stop.set()
+            th.join()
+            del self.host_checkers[name]
+            self.backend.clients.discard(name)
+            if name not in new_hosts:
+                self.host_stats.pop(name, None)
+                self.host_reservations.pop(name, None)
+                self.host_running.pop(name, None)
+                self.host_limits.pop(name, None)
+                self.image_index.remove_node(name)
+                events.notify(events.NODE_CHANGED, name)
+        for name, conf in new_hosts.items():
+            if name not in self.host_checkers:
+                self._start_host_thread(conf)
+
+    def _host_subthread(self, host_config: DockerHostConfig, stop: threading.Event):
+        """Follow the event stream of a host, with a full reconciliation at startup, every RECONCILE_INTERVAL seconds and after errors."""
         log.info("Synchro thread for host {} started".format(host_config.name))
 
         self.host_stats[host_config.name] = NodeStats(host_config.name)
+        self.host_reservations[host_config.name] = {}
+        self.host_running[host_config.name] = set()
+        self.host_limits[host_config.name] = {}
 
-        while True:
-            time_start = time.time()
+        since = None
+        last_reconcile = None
+        while not stop.is_set():
+            if last_reconcile is None or time.time() - last_reconcile > RECONCILE_INTERVAL:
+                time_start = int(time.time())
+                online = self._reconcile(host_config)
+                self.state.release_connection()
+                if not online:
+                    since = None
+                    stop.wait(timeout=CHECK_INTERVAL)
+                    continue
+                last_reconcile = time.time()
+                if since is None:
+                    since = time_start - 1  # events are applied idempotently, replaying a few of them is harmless
+
+            # Events are read in windows of EVENT_WAIT seconds, the next window starts where the previous ended, so none is lost
+            until = int(time.time()) + EVENT_WAIT
             try:
-                my_engine = DockerClient(host_config)
-                container_list = my_engine.list(only_label='zoe_deployment_name={}'.format(get_conf().deployment_name))
-                running_container_list = my_engine.list(status='running')
-                info = my_engine.info()
+                my_engine = self.backend.clients.get(host_config)
+                for event in my_engine.events(since=since, until=until, filters={'type': ['container', 'image']}):
+                    self._apply_event(host_config, my_engine, event)
+                    self.state.release_connection()  # not kept while waiting for the next event
             except ZoeException as e:
-                self.host_stats[host_config.name].status = 'offline'
-                log.error(str(e))
-                log.info('Node {} is offline'.format(host_config.name))
+                log.warning('Event stream of host {} interrupted: {}'.format(host_config.name, e))
+                self.backend.clients.discard(host_config.name)
+                last_reconcile = None  # some changes may have been missed
             else:
-                if self.host_stats[host_config.name].status == 'offline':
-                    log.info('Node {} is now online'.format(host_config.name))
-                    self.host_stats[host_config.name].status = 'online'
-
-                self.host_stats[host_config.name].container_count = len(running_container_list)
-                self.host_stats[host_config.name].cores_total = info['NCPU']
-                self.host_stats[host_config.name].memory_total = info['MemTotal']
-                self.host_stats[host_config.name].labels = host_config.labels
-                if info['Labels'] is not None:
-                    self.host_stats[host_config.name].labels.union(set(info['Labels']))
-
-                self.host_stats[host_config.name].memory_allocated = sum([cont['memory_hard_limit'] for cont in container_list if cont['memory_hard_limit'] != info['MemTotal']])
-                self.host_stats[host_config.name].cores_allocated = sum([cont['cpu_quota'] / cont['cpu_period'] for cont in container_list if cont['cpu_period'] != 0])
-
-                stats = {}
-                tmp_memory_reserved = 0
-                tmp_cores_reserved = 0
-                for cont in container_list:
-                    service = self.state.services.select(only_one=True, backend_host=host_config.name, backend_id=cont['id'])
-                    if service is None:
-                        log.warning('Container {} on host {} has no corresponding service'.format(cont['name'], host_config.name))
-                        if cont['state'] == Service.BACKEND_DIE_STATUS:
-                            log.warning('Terminating dead and orphan container {}'.format(cont['name']))
-                            my_engine.terminate_container(cont['id'], delete=True)
-                        continue
-                    if service.status == service.TERMINATING_STATUS:
-                        if service.backend_id is not None:
-                            my_engine.terminate_container(service.backend_id, delete=True)
-                        else:
-                            service.set_inactive()
-
-                    self._update_service_status(service, cont)
-                    tmp_memory_reserved += service.resource_reservation.memory.min
-                    tmp_cores_reserved += service.resource_reservation.cores.min
-                    stats[service.id] = {
-                        'core_limit': cont['cpu_quota'] / cont['cpu_period'],
-                        'mem_limit': cont['memory_hard_limit']
-                    }
-                self.host_stats[host_config.name].memory_reserved = tmp_memory_reserved
-                self.host_stats[host_config.name].cores_reserved = tmp_cores_reserved
-                self.host_stats[host_config.name].service_stats = stats
-
-                tmp_images = []
-                for dk_image in my_engine.list_images():
-                    image = {
-                        'id': dk_image.attrs['Id'],
-                        'size': dk_image.attrs['Size'],
-                        'names': dk_image.tags
-                    }
-                    for name in image['names']:
-                        if name[-7:] == ':latest':  # add an image with the name without 'latest' to fake Docker image lookup algorithm
-                            image['names'].append(name[:-7])
-                            break
-                    tmp_images.append(image)
-                self.host_stats[host_config.name].images = tmp_images
-                self.host_stats[host_config.name].timestamp = time_start
-                self.host_stats[host_config.name].valid = True
-
-            sleep_time = CHECK_INTERVAL - (time.time() - time_start)
-            if sleep_time <= 0:
-                log.warning('synchro thread for host {} is late by {:.2f} seconds'.format(host_config.name, sleep_time * -1))
-                sleep_time = 0
-            if self.stop.wait(timeout=sleep_time):
-                break
+                since = until
 
         log.info("Synchro thread for host {} stopped".format(host_config.name))
 
-    def _update_service_status(self, service: Service, container):
-        """Update the service status."""
-        if service.backend_status != container['state']:
+    def _reconcile(self, host_config: DockerHostConfig) -> bool:  # pylint: disable=too-many-locals
+        """Rebuild the node statistics and check the status of all services of a host, return False if the host is offline."""
+        node_stats = self.host_stats[host_config.name]
+        try:
+            my_engine = self.backend.clients.get(host_config)
+            container_list = my_engine.list(only_label='zoe_deployment_name={}'.format(get_conf().deployment_name))
+            running_container_list = my_engine.list(status='running')
+            info = my_engine.info()
+        except ZoeException as e:
+            self.backend.clients.discard(host_config.name)
+            if node_stats.status != 'offline':
+                events.notify(events.NODE_CHANGED, host_config.name)
+            node_stats.status = 'offline'
+            self.image_index.remove_node(host_config.name)
+            log.error(str(e))
+            log.info('Node {} is offline'.format(host_config.name))
+            return False
+
+        time_start = time.time()
+        old_capacity = self._node_free_capacity(node_stats)
+        if node_stats.status == 'offline':
+            log.info('Node {} is now online'.format(host_config.name))
+            node_stats.status = 'online'
+
+        node_stats.cores_total = info['NCPU']
+        node_stats.memory_total = info['MemTotal']
+        node_stats.labels = host_config.labels
+        if info['Labels'] is not None:
+            node_stats.labels.union(set(info['Labels']))
+
+        stats = {}
+        reservations = {}
+        service_died = False
+        container_ids = [cont['id'] for cont in container_list]
+        if len(container_ids) > 0:
+            services = {service.backend_id: service for service in self.state.services.select(backend_host=host_config.name, backend_id=container_ids)}
+        else:
+            services = {}
+        to_terminate = []
+        with self.state.transaction():  # all the status changes of this host are written at once
+            for cont in container_list:
+                service = services.get(cont['id'])
+                if service is None:
+                    log.warning('Container {} on host {} has no corresponding service'.format(cont['name'], host_config.name))
+                    if cont['state'] == Service.BACKEND_DIE_STATUS:
+                        log.warning('Terminating dead and orphan container {}'.format(cont['name']))
+                        to_terminate.append(cont['id'])
+                    continue
+                if service.status == service.TERMINATING_STATUS:
+                    if service.backend_id is not None:
+                        to_terminate.append(service.backend_id)
+                    else:
+                        service.set_inactive()
+
+                if self._update_service_status(service, cont['state']):
+                    service_died = True
+                reservations[service.id] = (service.resource_reservation.memory.min, service.resource_reservation.cores.min)
+                memory, cores = self._container_limits(cont)
+                stats[service.id] = {
+                    'core_limit': cores,
+                    'mem_limit': memory
+                }
+        for container_id in to_terminate:  # Docker is called only after the transaction has been committed
+            my_engine.terminate_container(container_id, delete=True)
+        if service_died:  # notify only once the new status has been committed
+            events.notify(events.SERVICE_DIED, host_config.name)
+        self.host_reservations[host_config.name] = reservations
+        self.host_running[host_config.name] = {cont['id'] for cont in running_container_list}
+        with self.limits_lock:
+            self.host_limits[host_config.name] = {cont['id']: self._container_limits(cont) for cont in container_list}
+            self._update_reserved(host_config.name)
+            node_stats.service_stats = stats
+        new_capacity = self._node_free_capacity(node_stats)
+        if old_capacity is None or new_capacity[0] > old_capacity[0] or new_capacity[1] > old_capacity[1]:
+            events.notify(events.NODE_CHANGED, host_config.name)
+
+        self._update_images(host_config.name, my_engine)
+        node_stats.timestamp = time_start
+        node_stats.valid = True
+        return True
+
+    def _update_images(self, host_name, my_engine):
+        """Read the list of images available on a host."""
+        tmp_images = []
+        for dk_image in my_engine.list_images():
+            image = {
+                'id': dk_image.attrs['Id'],
+                'size': dk_image.attrs['Size'],
+                'names': dk_image.tags
+            }
+            for name in image['names']:
+                if name[-7:] == ':latest':  # add an image with the name without 'latest' to fake Docker image lookup algorithm
+                    image['names'].append(name[:-7])
+                    break
+            tmp_images.append(image)
+        self.host_stats[host_name].images = tmp_images
+        if self.image_index.update_node(host_name, [name for image in tmp_images for name in image['names']]):
+            events.notify(events.IMAGE_AVAILABLE, host_name)
+
+    def _update_reserved(self, host_name):
+        """Recompute the reserved and allocated resources and the number of running containers of a node."""
+        node_stats = self.host_stats[host_name]
+        reservations = self.host_reservations[host_name].values()
+        node_stats.memory_reserved = sum([memory for memory, cores_ in reservations])
+        node_stats.cores_reserved = sum([cores for memory_, cores in reservations])
+        limits = self.host_limits[host_name].values()
+        node_stats.memory_allocated = sum([memory for memory, cores_ in limits if memory != node_stats.memory_total])
+        node_stats.cores_allocated = sum([cores for memory_, cores in limits])
+        node_stats.container_count = len(self.host_running[host_name])
+
+    @staticmethod
+    def _container_limits(cont):
+        """Return the memory and core limits of a container."""
+        cores = cont['cpu_quota'] / cont['cpu_period'] if cont['cpu_period'] != 0 else 0
+        return cont['memory_hard_limit'], cores
+
+    def _apply_event(self, host_config: DockerHostConfig, my_engine, event):
+        """Apply a Docker event to the node statistics and to the service that owns the container."""
+        if event.get('Type') == 'image':
+            if event.get('Action') in IMAGE_EVENTS:
+                self._update_images(host_config.name, my_engine)
+            return
+
+        action = event.get('Action')
+        container_id = event['Actor']['ID']
+        node_stats = self.host_stats[host_config.name]
+        old_capacity = self._node_free_capacity(node_stats)
+        if action == 'start':
+            self.host_running[host_config.name].add(container_id)
+        elif action in ('die', 'destroy'):
+            self.host_running[host_config.name].discard(container_id)
+
+        labels = event['Actor'].get('Attributes', {})
+        own_container = labels.get('zoe_deployment_name') == get_conf().deployment_name
+        if own_container:  # as in the reconciliation, only the limits of the containers of this deployment are counted
+            self._update_limits(host_config.name, my_engine, container_id, action)
+
+        service = None
+        if action in CONTAINER_EVENTS and own_container and 'zoe_service_id' in labels:
+            service = self.state.services.select(only_one=True, id=int(labels['zoe_service_id']))
+        if service is not None and service.backend_id in (None, container_id):  # events of older containers of the same service are ignored
+            with self.limits_lock:
+                if action == 'destroy':
+                    self.host_reservations[host_config.name].pop(service.id, None)
+                    self._set_service_stats(node_stats, service.id, None)
+                else:
+                    self.host_reservations[host_config.name][service.id] = (service.resource_reservation.memory.min, service.resource_reservation.cores.min)
+                    if action in ('create', 'start') and container_id in self.host_limits[host_config.name]:
+                        memory, cores = self.host_limits[host_config.name][container_id]
+                        self._set_service_stats(node_stats, service.id, {'core_limit': cores, 'mem_limit': memory})
+            # the backend ID is written when the spawn completes, until then the service status belongs to the start code
+            if service.backend_id is not None and not (action == 'die' and service.backend_status == Service.BACKEND_OOM_STATUS):
+                log.debug('Docker event {} for service {} on host {}'.format(action, service.id, host_config.name))
+                if self._update_service_status(service, CONTAINER_EVENTS[action]):
+                    events.notify(events.SERVICE_DIED, host_config.name)
+
+        with self.limits_lock:
+            self._update_reserved(host_config.name)
+        new_capacity = self._node_free_capacity(node_stats)
+        if old_capacity is not None and (new_capacity[0] > old_capacity[0] or new_capacity[1] > old_capacity[1]):
+            events.notify(events.NODE_CHANGED, host_config.name)
+
+    def _update_limits(self, host_name, my_engine, container_id, action):
+        """Keep the limits of a container up to date, they are read from Docker when the container is created."""
+        new_limits = None
+        if action == 'create' or (action == 'start' and container_id not in self.host_limits[host_name]):
+            try:
+                new_limits = self._container_limits(my_engine.inspect_container(container_id))
+            except ZoeException as e:
+                log.debug('Cannot read the limits of container {} on host {}: {}'.format(container_id, host_name, e))
+        with self.limits_lock:
+            if action == 'destroy':
+                self.host_limits[host_name].pop(container_id, None)
+            elif new_limits is not None:
+                self.host_limits[host_name][container_id] = new_limits
+
+    def record_core_limit(self, host_name, service_id, container_id, cores):
+        """Store a core limit applied by Zoe, so that it is known before the next reconciliation."""
+        node_stats = self.host_stats.get(host_name)
+        if node_stats is None:
+            return
+        with self.limits_lock:
+            self._set_service_stats(node_stats, service_id, {'core_limit': cores})
+            limits = self.host_limits[host_name]
+            if container_id in limits:
+                limits[container_id] = (limits[container_id][0], cores)
+                self._update_reserved(host_name)
+
+    @staticmethod
+    def _set_service_stats(node_stats: NodeStats, service_id, stats):
+        """Update the stats of a service, None removes them. The stats are read without locks by other threads, so a new dict is assigned instead of changing it in place."""
+        service_stats = dict(node_stats.service_stats)
+        if stats is None:
+            service_stats.pop(service_id, None)
+        else:
+            service_stats[service_id] = dict(service_stats.get(service_id, {}), **stats)
+        node_stats.service_stats = service_stats
+
+    def _node_free_capacity(self, node_stats: NodeStats):
+        """Return the free memory and cores of an online node, None if it is offline."""
+        if node_stats.status != 'online':
+            return None
+        return node_stats.memory_total - node_stats.memory_reserved, node_stats.cores_total - node_stats.cores_reserved
+
+    def _update_service_status(self, service: Service, new_state) -> bool:
+        """Update the service backend status, return True if the service has just died."""
+        if service.backend_status != new_state:
             old_status = service.backend_status
-            service.set_backend_status(container['state'])
-            log.debug('Updated service status, {} from {} to {}'.format(service.name, old_status, container['state']))
+            service.set_backend_status(new_state)
+            log.debug('Updated service status, {} from {} to {}'.format(service.name, old_status, new_state))
+            return new_state in (Service.BACKEND_DIE_STATUS, Service.BACKEND_OOM_STATUS)
+        return False
 
     def run(self):
         """The thread loop."""
@@ -148,25 +357,19 @@ class DockerStateSynchronizer(threading.Thread):
             ret = self.my_stop.wait(timeout=CHECK_INTERVAL)
             if ret:
                 break
-            to_remove = []
-            to_add = []
-            for th, conf in self.host_checkers:
+            if self.backend.reload_config():
+                self._update_hosts(self.backend.docker_config)
+            for th, conf, stop_ in list(self.host_checkers.values()):
                 if not th.is_alive():
                     log.warning('Thread {} has died, starting a new one.'.format(th.name))
-                    to_remove.append((th, conf))
-                    th = threading.Thread(target=self._host_subthread, args=(conf,), name='synchro_' + conf.name, daemon=True)
-                    th.start()
-                    to_add.append((th, conf))
-            for dead_th in to_remove:
-                self.host_checkers.remove(dead_th)
-            for new_th in to_add:
-                self.host_checkers.append(new_th)
+                    self._start_host_thread(conf)
         log.info("Checker thread stopped")
 
     def quit(self):
         """Stops the thread."""
-        self.stop.set()
-        for th, conf_ in self.host_checkers:
-            th.join()
         self.my_stop.set()
         self.join()
+        for th_, conf_, stop in self.host_checkers.values():
+            stop.set()
+        for th, conf_, stop_ in self.host_checkers.values():
+            th.join()
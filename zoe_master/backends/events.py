@@ -0,0 +1,56 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Notifications for back-end events that can change scheduling decisions."""
+
+import logging
+import threading
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+SERVICE_DIED = 'service_died'
+NODE_CHANGED = 'node_changed'
+IMAGE_AVAILABLE = 'image_available'
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def subscribe(callback: Callable[[str, str], None]) -> None:
+    """Register a function that will be called with the event name and the node name every time a back-end event happens."""
+    with _listeners_lock:
+        _listeners.append(callback)
+
+
+def unsubscribe(callback: Callable[[str, str], None]) -> None:
+    """Remove a previously registered function."""
+    with _listeners_lock:
+        try:
+            _listeners.remove(callback)
+        except ValueError:
+            pass
+
+
+def notify(event: str, node_name: str) -> None:
+    """Called by the back-ends to signal an event. Listeners are called in the back-end thread and must not block."""
+    log.debug('Back-end event {} on node {}'.format(event, node_name))
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(event, node_name)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Error in back-end event listener')
@@ -0,0 +1,70 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Index of the container images available on each node of the platform."""
+
+import threading
+from typing import Iterable, Set
+
+
+class ImageIndex:
+    """A thread-safe map of image names to the nodes where the image is available.
+
+    The back-end synchronization threads keep it up to date, while the scheduler and the pre-processing code use it to check image availability with a single hash lookup.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._node_images = {}
+        self._image_nodes = {}
+
+    def update_node(self, node_name: str, image_names: Iterable[str]) -> bool:
+        """Replace the set of images available on a node, return True if new images have become available."""
+        new_names = frozenset(image_names)
+        with self._lock:
+            old_names = self._node_images.get(node_name, frozenset())
+            if old_names == new_names:
+                return False
+            for name in old_names - new_names:
+                nodes = self._image_nodes[name]
+                nodes.discard(node_name)
+                if len(nodes) == 0:
+                    del self._image_nodes[name]
+            for name in new_names - old_names:
+                self._image_nodes.setdefault(name, set()).add(node_name)
+            self._node_images[node_name] = new_names
+            return len(new_names - old_names) > 0
+
+    def remove_node(self, node_name: str) -> None:
+        """Forget all images of a node, for example because it went offline."""
+        self.update_node(node_name, [])
+        with self._lock:
+            self._node_images.pop(node_name, None)
+
+    def is_available(self, node_name: str, image_name: str) -> bool:
+        """Return True if the image is available on the given node."""
+        return image_name in self._node_images.get(node_name, frozenset())
+
+    def nodes_with_image(self, image_name: str) -> Set[str]:
+        """Return the names of the nodes where the image is available."""
+        with self._lock:
+            return set(self._image_nodes.get(image_name, set()))
+
+    def is_available_anywhere(self, image_name: str) -> bool:
+        """Return True if the image is available on at least one node."""
+        return image_name in self._image_nodes
+
+    def is_empty(self) -> bool:
+        """Return True if no node has any image."""
+        return len(self._image_nodes) == 0
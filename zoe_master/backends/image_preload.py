@@ -0,0 +1,86 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Progress of the distribution of an image to the nodes of the platform."""
+
+import threading
+import time
+from typing import Dict, List
+
+
+class ImagePreload:
+    """Tracks the pull of an image on each node, it is updated by the pull workers and read by the API."""
+    WAITING_STATUS = 'waiting'
+    PULLING_STATUS = 'pulling'
+    DONE_STATUS = 'done'
+    FAILED_STATUS = 'failed'
+    SKIPPED_STATUS = 'skipped'
+
+    def __init__(self, image_name: str, node_names: List[str], seed_nodes: List[str]) -> None:
+        self.image_name = image_name
+        self.seed_nodes = seed_nodes
+        self.time_start = time.time()
+        self.time_end = None
+        self._lock = threading.Lock()
+        self.nodes = {name: {'status': self.WAITING_STATUS, 'time_start': None, 'time_end': None, 'error': None} for name in node_names}  # type: Dict[str, Dict]
+
+    def node_pulling(self, node_name: str) -> None:
+        """The pull on a node has started."""
+        with self._lock:
+            self.nodes[node_name]['status'] = self.PULLING_STATUS
+            self.nodes[node_name]['time_start'] = time.time()
+
+    def node_done(self, node_name: str) -> None:
+        """The image is available on a node."""
+        with self._lock:
+            self.nodes[node_name]['status'] = self.DONE_STATUS
+            self.nodes[node_name]['time_end'] = time.time()
+
+    def node_failed(self, node_name: str, error: str, status=FAILED_STATUS) -> None:
+        """The image could not be pulled on a node."""
+        with self._lock:
+            self.nodes[node_name]['status'] = status
+            self.nodes[node_name]['time_end'] = time.time()
+            self.nodes[node_name]['error'] = error
+
+    def count(self, status: str) -> int:
+        """Return the number of nodes in a certain status."""
+        with self._lock:
+            return len([node for node in self.nodes.values() if node['status'] == status])
+
+    def waiting_nodes(self) -> List[str]:
+        """Return the names of the nodes where the pull has not started yet."""
+        with self._lock:
+            return [name for name, node in self.nodes.items() if node['status'] == self.WAITING_STATUS]
+
+    def finished(self) -> None:
+        """All the pulls have completed."""
+        self.time_end = time.time()
+
+    @property
+    def is_finished(self) -> bool:
+        """True when no pull is waiting or running."""
+        return self.time_end is not None
+
+    def serialize(self) -> Dict:
+        """Generates a dictionary that can be serialized in JSON."""
+        with self._lock:
+            return {
+                'image_name': self.image_name,
+                'seed_nodes': list(self.seed_nodes),
+                'time_start': self.time_start,
+                'time_end': self.time_end,
+                'nodes': {name: dict(node) for name, node in self.nodes.items()}
+            }
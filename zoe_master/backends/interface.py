@@ -15,14 +15,20 @@
 
 """The high-level interface that Zoe uses to talk to the configured container backend."""
 
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import itertools
 import logging
-import time
-from typing import List, Union
+import random
+import threading
+from typing import Dict, List, Tuple, Union
 
 from zoe_lib.config import get_conf
 from zoe_lib.state import Execution, Service  # pylint: disable=unused-import
+from zoe_lib.state.sql_manager import release_thread_connections
 
 from zoe_master.backends.base import BaseBackend
+from zoe_master.backends.image_index import ImageIndex
+from zoe_master.backends.image_preload import ImagePreload
 from zoe_master.backends.service_instance import ServiceInstance
 from zoe_master.exceptions import ZoeStartExecutionFatalException, ZoeStartExecutionRetryException, ZoeException
 from zoe_master.stats import ClusterStats  # pylint: disable=unused-import
@@ -39,8 +45,28 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+_pools_lock = threading.Lock()
+_pools = {}
+
+_backend_lock = threading.Lock()
+_backend = None
+
+_preloads_lock = threading.Lock()
+_preloads = {}  # image name -> ImagePreload, the most recent preload of each image
+_preload_stop = threading.Event()
+
 
 def _get_backend() -> Union[BaseBackend, None]:
+    """Return the backend instance, it is created on first use and then shared by all callers."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def _create_backend() -> Union[BaseBackend, None]:
     """Return the right backend instance by reading the global configuration."""
     backend_name = get_conf().backend
     assert backend_name in ['Kubernetes', 'Swarm', 'DockerEngine']
@@ -65,12 +91,96 @@ def initialize_backend(state):
 
 def shutdown_backend():
     """Shuts down the configured backend."""
+    _preload_stop.set()  # pulls that have not started yet are skipped
+    with _pools_lock:
+        for name in sorted(_pools.keys()):  # execution and image_preload pools first, their tasks wait on the service and image_pull pools
+            _pools[name].shutdown(wait=True)
+        _pools.clear()
+    global _backend
     backend = _get_backend()
     backend.shutdown()
+    with _backend_lock:
+        _backend = None
+
+
+class _WorkerPool(ThreadPoolExecutor):
+    """A thread pool whose tasks give their DB connection back when they end, so that idle workers hold none."""
+    def submit(self, func, *args, **kwargs):  # pylint: disable=arguments-differ
+        return super().submit(_run_task, func, *args, **kwargs)
+
+
+def _run_task(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        release_thread_connections()
+
+
+def _get_pool(name: str, workers: int) -> ThreadPoolExecutor:
+    """Return the named worker pool, creating it on first use.
+
+    Tasks running in the execution pools wait for tasks in the service pools, never for tasks of their own pool, so that a full pool cannot deadlock.
+    """
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = _WorkerPool(max_workers=workers, thread_name_prefix=name)
+        return _pools[name]
+
+
+def _spawn_service_group(backend: BaseBackend, execution: Execution, service_group: List[Service], env_subst_dict, placement):  # pylint: disable=too-many-locals
+    """Create the containers for a group of services in parallel, return 'ok', 'requeue' or 'fatal' and the error message."""
+    instances = []
+    with execution.sql_manager.transaction():
+        for service in service_group:
+            service_env_subst_dict = env_subst_dict.copy()
+            service_env_subst_dict['dns_name#self'] = service.dns_name
+            if placement is not None:
+                service.assign_backend_host(placement[service.id])
+            service.set_starting()
+            instances.append((service, ServiceInstance(execution, service, service_env_subst_dict)))
+
+    pool = _get_pool('service_start', get_conf().backend_service_start_workers)
+    spawning = [(service, instance, pool.submit(backend.spawn_service, instance)) for service, instance in instances]
+
+    results = []
+    for service, instance, future in spawning:  # wait for the back-end outside of transactions
+        try:
+            results.append((service, instance, future.result(), None))
+        except Exception as ex:  # pylint: disable=broad-except
+            results.append((service, instance, None, ex))
+
+    ret = "ok"
+    reason = None
+    with execution.sql_manager.transaction():
+        for service, instance, result, ex in results:
+            if isinstance(ex, ZoeStartExecutionRetryException):
+                log.warning('Temporary failure starting service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
+                service.set_error(ex.message)
+                if ret == "ok":
+                    ret, reason = "requeue", ex.message
+            elif isinstance(ex, ZoeStartExecutionFatalException):
+                log.error('Fatal error trying to start service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
+                service.set_error(ex.message)
+                if ret != "fatal":
+                    ret, reason = "fatal", ex.message
+            elif ex is not None:
+                log.error('Fatal error trying to start service {} of execution {}'.format(service.id, execution.id))
+                log.error('BUG, this error should have been caught earlier', exc_info=ex)
+                service.set_error(str(ex))
+                if ret != "fatal":
+                    ret, reason = "fatal", str(ex)
+            else:
+                log.debug('Service {} started'.format(instance.name))
+                backend_id, ip_address, ports = result
+                service.set_active(backend_id, ip_address, ports)
+    return ret, reason
 
 
 def service_list_to_containers(execution: Execution, service_list: List[Service], placement=None) -> str:
-    """Given a subset of services from an execution, tries to start them, return one of 'ok', 'requeue' for temporary failures and 'fatal' for fatal failures."""
+    """Given a subset of services from an execution, tries to start them, return one of 'ok', 'requeue' for temporary failures and 'fatal' for fatal failures.
+
+    Services with the same startup order are created in parallel, groups with a higher startup order are created only after the previous groups have started.
+    """
     backend = _get_backend()
 
     ordered_service_list = sorted(service_list, key=lambda x: x.startup_order)
@@ -85,35 +195,16 @@ def service_list_to_containers(execution: Execution, service_list: List[Service]
     for service in execution.services:
         env_subst_dict['dns_name#' + service.name] = service.dns_name
 
-    for service in ordered_service_list:
-        env_subst_dict['dns_name#self'] = service.dns_name
-        if placement is not None:
-            service.assign_backend_host(placement[service.id])
-        service.set_starting()
-        instance = ServiceInstance(execution, service, env_subst_dict)
-        try:
-            backend_id, ip_address, ports = backend.spawn_service(instance)
-        except ZoeStartExecutionRetryException as ex:
-            log.warning('Temporary failure starting service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
-            service.set_error(ex.message)
-            terminate_execution(execution, reason=ex.message)
-            execution.set_queued()
-            return "requeue"
-        except ZoeStartExecutionFatalException as ex:
-            log.error('Fatal error trying to start service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
-            service.set_error(ex.message)
-            terminate_execution(execution, reason=ex.message)
-            execution.set_error()
-            return "fatal"
-        except Exception as ex:
-            log.error('Fatal error trying to start service {} of execution {}'.format(service.id, execution.id))
-            log.exception('BUG, this error should have been caught earlier')
-            terminate_execution(execution, reason=str(ex))
-            execution.set_error()
-            return "fatal"
-        else:
-            log.debug('Service {} started'.format(instance.name))
-            service.set_active(backend_id, ip_address, ports)
+    for startup_order, service_group in itertools.groupby(ordered_service_list, key=lambda x: x.startup_order):
+        log.debug('execution {}: starting services with startup order {}'.format(execution.id, startup_order))
+        ret, reason = _spawn_service_group(backend, execution, list(service_group), env_subst_dict, placement)
+        if ret != "ok":
+            terminate_execution(execution, reason=reason)
+            if ret == "requeue":
+                execution.set_queued()
+            else:
+                execution.set_error()
+            return ret
 
     return "ok"
 
@@ -142,8 +233,25 @@ def start_elastic(execution: Execution, placement) -> str:
     return service_list_to_containers(execution, elastic_to_start, placement)
 
 
+def _start_execution(execution: Execution, placement) -> str:
+    """Start the essential services of an execution, if needed, and its runnable elastic services."""
+    if not execution.essential_services_running:
+        ret = start_essential(execution, placement)
+        if ret != "ok":
+            return ret
+        execution.set_running()
+    start_elastic(execution, placement)
+    return "ok"
+
+
+def start_executions(executions: List[Execution], placement) -> List[str]:
+    """Start a list of executions in parallel, return one of 'ok', 'requeue' or 'fatal' for each execution, in the same order."""
+    futures = [_get_pool('execution_start', get_conf().backend_execution_start_workers).submit(_start_execution, execution, placement) for execution in executions]
+    return [future.result() for future in futures]
+
+
 def terminate_service(service: Service) -> None:
-    """Terminate a single service."""
+    """Terminate a single service. No transaction is kept open while the back-end removes the container."""
     backend = _get_backend()
     if service.status != Service.INACTIVE_STATUS:
         if service.status == Service.ERROR_STATUS:
@@ -167,28 +275,94 @@ def terminate_service(service: Service) -> None:
 
 
 def terminate_execution(execution: Execution, reason: Union[None, str] = None) -> None:
-    """Terminate an execution."""
-    for service in execution.services:  # type: Service
-        terminate_service(service)
+    """Terminate an execution, its services are terminated in parallel."""
+    pool = _get_pool('service_terminate', get_conf().backend_termination_workers)
+    futures = [pool.submit(terminate_service, service) for service in execution.services]
+    for future in futures:
+        try:
+            future.result()
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Error terminating a service of execution {}'.format(execution.id))
     execution.set_terminated(reason)
 
 
+def terminate_execution_async(execution: Execution, reason: Union[None, str] = None) -> Future:
+    """Terminate an execution in a background worker, the returned future completes when all its services have been terminated."""
+    return _get_pool('execution_terminate', get_conf().backend_termination_workers).submit(terminate_execution, execution, reason)
+
+
 def get_platform_state() -> ClusterStats:
     """Retrieves the state of the platform by querying the container backend. Platform state includes information on free/reserved resources for each node."""
     backend = _get_backend()
     return backend.platform_state()
 
 
-def preload_image(image_name):
-    """Make a service image available on the cluster, according to the backend support."""
+def preload_image(image_name: str, seed_nodes=0) -> ImagePreload:
+    """Pull an image on all the nodes in the background, return the object that tracks the progress on each node.
+
+    Up to backend-image-pull-workers pulls run at the same time. With seed_nodes the image is first pulled on that many nodes, chosen at random among the online ones, and the other nodes start as soon as one seed has the image, so that registry caches are warm before the fan-out. Offline nodes are skipped. A preload of an image that is still in progress is returned instead of starting a new one.
+    """
+    with _preloads_lock:
+        preload = _preloads.get(image_name)
+        if preload is not None and not preload.is_finished:
+            return preload
+        nodes = node_list()
+        offline = {node.name for node in get_platform_state().nodes if node.status == 'offline'}
+        online = [name for name in nodes if name not in offline]
+        preload = ImagePreload(image_name, nodes, random.sample(online, min(seed_nodes, len(online))))
+        for name in offline & set(nodes):
+            preload.node_failed(name, 'the node is offline', ImagePreload.SKIPPED_STATUS)
+        _preloads[image_name] = preload
+    log.info('Preloading image {} on {} nodes, {} seeds, {} offline'.format(image_name, len(online), len(preload.seed_nodes), len(nodes) - len(online)))
+    _get_pool('image_preload', get_conf().backend_image_pull_workers).submit(_preload_image, preload)
+    return preload
+
+
+def _preload_image(preload: ImagePreload) -> None:
+    """Pull an image on the seed nodes, then, as soon as one of them has it, on all the other nodes."""
     backend = _get_backend()
-    log.debug('Preloading image {}'.format(image_name))
-    time_start = time.time()
+    pool = _get_pool('image_pull', get_conf().backend_image_pull_workers)
+    others = [name for name in preload.waiting_nodes() if name not in preload.seed_nodes]
+    pulls = [pool.submit(_pull_image, backend, preload, name) for name in preload.seed_nodes]
+    if len(pulls) > 0:
+        pending = set(pulls)
+        while len(pending) > 0 and preload.count(ImagePreload.DONE_STATUS) == 0:
+            done_, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if preload.count(ImagePreload.DONE_STATUS) == 0:
+            log.error('Image {} could not be pulled on any seed node, the other nodes are skipped'.format(preload.image_name))
+            for name in others:
+                preload.node_failed(name, 'the pull failed on all the seed nodes', ImagePreload.SKIPPED_STATUS)
+            others = []
+    pulls += [pool.submit(_pull_image, backend, preload, name) for name in others]
+    wait(pulls)
+    preload.finished()
+    log.info('Image {} preloaded on {} of {} nodes in {:.2f}s'.format(preload.image_name, preload.count(ImagePreload.DONE_STATUS), len(preload.nodes), preload.time_end - preload.time_start))
+
+
+def _pull_image(backend: BaseBackend, preload: ImagePreload, node_name: str) -> None:
+    if _preload_stop.is_set():
+        preload.node_failed(node_name, 'Zoe is shutting down', ImagePreload.SKIPPED_STATUS)
+        return
+    preload.node_pulling(node_name)
     try:
-        backend.preload_image(image_name)
-        log.info('Image {} preloaded in {:.2f}s'.format(image_name, time.time() - time_start))
+        backend.preload_image(preload.image_name, node_name)
     except NotImplementedError:
-        log.warning('Backend {} does not support image preloading'.format(get_conf().backend))
+        preload.node_failed(node_name, 'Backend {} does not support image preloading'.format(get_conf().backend))
+    except ZoeException as e:
+        log.error('Image {} pre-loading failed on node {}: {}'.format(preload.image_name, node_name, e.message))
+        preload.node_failed(node_name, e.message)
+    except Exception as e:  # pylint: disable=broad-except
+        log.exception('Image {} pre-loading failed on node {}'.format(preload.image_name, node_name))
+        preload.node_failed(node_name, str(e))
+    else:
+        preload.node_done(node_name)
+        log.info('Image {} pre-loaded on node {} in {:.2f}s'.format(preload.image_name, node_name, preload.nodes[node_name]['time_end'] - preload.nodes[node_name]['time_start']))
+
+
+def preload_status() -> List[ImagePreload]:
+    """Return the most recent preload of each image, oldest first."""
+    with _preloads_lock:
+        return sorted(_preloads.values(), key=lambda p: p.time_start)
 
 
 def update_service_resource_limits(service, cores=None, memory=None):
@@ -198,6 +372,15 @@ def update_service_resource_limits(service, cores=None, memory=None):
         backend.update_service(service, cores, memory)
 
 
+def update_services_core_limits(updates: Dict[str, List[Tuple[Service, float]]]) -> None:
+    """Apply new core limits, updates maps node names to lists of (service, cores) tuples. The back-end applies the updates for each node in a single batch."""
+    backend = _get_backend()
+    for node_name, node_updates in updates.items():
+        node_updates = [(service, cores) for service, cores in node_updates if 'gpu' not in service.labels]  # see https://github.com/NVIDIA/nvidia-docker/issues/515
+        if len(node_updates) > 0:
+            backend.update_services_cores(node_name, node_updates)
+
+
 def node_list():
     """List node names configured in the back-end."""
     backend = _get_backend()
@@ -208,3 +391,12 @@ def list_available_images(node_name):
     """List the images available on the specified node."""
     backend = _get_backend()
     return backend.list_available_images(node_name)
+
+
+def get_image_index() -> Union[ImageIndex, None]:
+    """Return the per-node image index, or None if the back-end does not track image availability."""
+    backend = _get_backend()
+    try:
+        return backend.image_index()
+    except NotImplementedError:
+        return None
@@ -78,7 +78,7 @@ class KubernetesBackend(zoe_master.backends.base.BaseBackend):
             node.cores_in_use = node.cores_reserved
         return info
 
-    def preload_image(self, image_name: str) -> None:
+    def preload_image(self, image_name: str, node_name: str) -> None:
         """Make a service image available."""
         raise NotImplementedError
 
@@ -23,6 +23,7 @@ import pykube
 from zoe_lib.config import get_conf
 from zoe_lib.state import SQLManager, Service
 from zoe_master.backends.kubernetes.api_client import KubernetesClient
+from zoe_master.backends import events
 
 log = logging.getLogger(__name__)
 
@@ -113,8 +114,10 @@ class KubernetesStateSynchronizer(threading.Thread):
                 if rep['running'] is False:
                     log.info('resetting status of service {}, died with no event'.format(service.name))
                     service.set_backend_status(service.BACKEND_DIE_STATUS)
+                    events.notify(events.SERVICE_DIED, service.backend_host)
         if not found:
             service.set_backend_status(service.BACKEND_DESTROY_STATUS)
+            events.notify(events.NODE_CHANGED, service.backend_host)
 
     def run(self):
         """The thread loop."""
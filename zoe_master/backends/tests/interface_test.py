@@ -0,0 +1,300 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the concurrent service start and termination paths of the back-end interface."""
+
+import contextlib
+import threading
+import time
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+from zoe_master.backends import interface
+from zoe_master.backends.image_preload import ImagePreload
+from zoe_master.exceptions import ZoeStartExecutionFatalException, ZoeStartExecutionRetryException, ZoeException
+from zoe_master.stats import ClusterStats, NodeStats
+
+
+class MockService:
+    """A minimal stand-in for a Zoe service."""
+    def __init__(self, service_id, startup_order):
+        self.id = service_id
+        self.name = 'service{}'.format(service_id)
+        self.dns_name = self.name
+        self.startup_order = startup_order
+        self.status = 'created'
+        self.backend_host = None
+
+    def assign_backend_host(self, host):
+        """Fake state change."""
+        self.backend_host = host
+
+    def set_starting(self):
+        """Fake state change."""
+        self.status = 'starting'
+
+    def set_active(self, backend_id, ip_address, ports):  # pylint: disable=unused-argument
+        """Fake state change."""
+        self.status = 'active'
+
+    def set_error(self, message):  # pylint: disable=unused-argument
+        """Fake state change."""
+        self.status = 'error'
+
+
+class MockSQLManager:
+    """Counts the transactions."""
+    def __init__(self):
+        self.transactions = 0
+        self.open = False
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Fake transaction."""
+        self.transactions += 1
+        self.open = True
+        try:
+            yield self
+        finally:
+            self.open = False
+
+
+class MockOwner:
+    """A minimal stand-in for a Zoe user."""
+    username = 'test'
+
+
+class MockExecution:
+    """A minimal stand-in for a Zoe execution."""
+    def __init__(self, services):
+        self.id = 1
+        self.name = 'test'
+        self.owner = MockOwner()
+        self.services = services
+        self.status = 'starting'
+        self.sql_manager = MockSQLManager()
+        self.termination_reason = None
+
+    def set_queued(self):
+        """Fake state change."""
+        self.status = 'queued'
+
+    def set_error(self):
+        """Fake state change."""
+        self.status = 'error'
+
+    def set_terminated(self, reason=None):
+        """Fake state change."""
+        self.status = 'terminated'
+        self.termination_reason = reason
+
+
+class MockInstance:
+    """A minimal stand-in for a service instance."""
+    def __init__(self, execution, service, env_subst_dict):  # pylint: disable=unused-argument
+        self.name = service.name
+        self.service = service
+        self.execution = execution
+
+
+class MockBackend:
+    """A back-end that records the order in which services are spawned."""
+    def __init__(self, barrier_parties, failures=None):
+        self.barrier = threading.Barrier(barrier_parties, timeout=5)
+        self.failures = failures if failures is not None else {}
+        self.spawned = []
+        self.in_transaction = []
+
+    def spawn_service(self, instance):
+        """Services of the first startup group wait for each other, proving they are started concurrently."""
+        if instance.service.startup_order == 0:
+            self.barrier.wait()
+        self.in_transaction.append(instance.execution.sql_manager.open)
+        self.spawned.append(instance.service.id)
+        if instance.service.id in self.failures:
+            raise self.failures[instance.service.id]('failure')
+        return 'container{}'.format(instance.service.id), '127.0.0.1', {}
+
+
+class TestServiceStart:
+    """Concurrent service start tests."""
+
+    @pytest.fixture(autouse=True)
+    def mock_interface(self, zoe_configuration, monkeypatch):  # pylint: disable=redefined-outer-name
+        """Fixture for mock config and helpers."""
+        load_configuration(zoe_configuration)
+        monkeypatch.setattr(interface, 'ServiceInstance', MockInstance)
+        monkeypatch.setattr(interface, 'terminate_execution', lambda execution, reason=None: None)
+
+    def test_startup_order_groups(self, monkeypatch):
+        """Services with the same startup order are spawned in parallel, groups in order."""
+        backend = MockBackend(3)
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+        services = [MockService(4, 1), MockService(1, 0), MockService(2, 0), MockService(3, 0)]
+        execution = MockExecution(services)
+
+        assert interface.service_list_to_containers(execution, services, {1: 'n1', 2: 'n1', 3: 'n2', 4: 'n2'}) == 'ok'
+        assert backend.spawned[-1] == 4
+        assert all(s.status == 'active' for s in services)
+        assert services[2].backend_host == 'n1'
+        assert not any(backend.in_transaction)
+        assert execution.sql_manager.transactions == 4
+
+    def test_fatal_takes_precedence(self, monkeypatch):
+        """When services of a group fail in different ways the execution is thrown away and later groups are not started."""
+        backend = MockBackend(2, {1: ZoeStartExecutionRetryException, 2: ZoeStartExecutionFatalException})
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+        services = [MockService(1, 0), MockService(2, 0), MockService(3, 1)]
+        execution = MockExecution(services)
+
+        assert interface.service_list_to_containers(execution, services) == 'fatal'
+        assert execution.status == 'error'
+        assert 3 not in backend.spawned
+
+    def test_requeue(self, monkeypatch):
+        """A temporary failure requeues the execution."""
+        backend = MockBackend(1, {1: ZoeStartExecutionRetryException})
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+        services = [MockService(1, 0)]
+        execution = MockExecution(services)
+
+        assert interface.service_list_to_containers(execution, services) == 'requeue'
+        assert execution.status == 'queued'
+
+
+class TestTermination:
+    """Parallel termination tests."""
+
+    @pytest.fixture(autouse=True)
+    def mock_config(self, zoe_configuration):  # pylint: disable=redefined-outer-name
+        """Fixture for mock config."""
+        load_configuration(zoe_configuration)
+
+    def test_parallel_termination(self, monkeypatch):
+        """All services of an execution are terminated at the same time and the execution is marked as terminated at the end."""
+        barrier = threading.Barrier(3, timeout=5)
+        terminated = []
+
+        def terminate_service(service):
+            """Wait for the other services, proving they are terminated concurrently."""
+            barrier.wait()
+            terminated.append(service.id)
+
+        monkeypatch.setattr(interface, 'terminate_service', terminate_service)
+        execution = MockExecution([MockService(1, 0), MockService(2, 0), MockService(3, 1)])
+
+        interface.terminate_execution_async(execution, 'killed').result(timeout=10)
+        assert sorted(terminated) == [1, 2, 3]
+        assert execution.status == 'terminated'
+        assert execution.termination_reason == 'killed'
+
+
+class MockPullBackend:
+    """A back-end that records image pulls, pulls on the blocked nodes wait until they are released."""
+    def __init__(self, nodes, failures=(), offline=(), blocked=()):
+        self.nodes = nodes
+        self.failures = failures
+        self.offline = offline
+        self.blocked = blocked
+        self.released = threading.Event()
+        self.pulled = []
+
+    def node_list(self):
+        """The configured nodes."""
+        return list(self.nodes)
+
+    def platform_state(self):
+        """The status of the nodes."""
+        stats = ClusterStats()
+        for name in self.nodes:
+            node = NodeStats(name)
+            node.status = 'offline' if name in self.offline else 'online'
+            stats.nodes.append(node)
+        return stats
+
+    def preload_image(self, image_name, node_name):  # pylint: disable=unused-argument
+        """Fake pull."""
+        if node_name in self.blocked:
+            assert self.released.wait(timeout=5)
+        self.pulled.append(node_name)
+        if node_name in self.failures:
+            raise ZoeException('pull failed')
+
+
+class TestImagePreload:
+    """Parallel image preload tests."""
+
+    @pytest.fixture(autouse=True)
+    def mock_config(self, zoe_configuration, monkeypatch):  # pylint: disable=redefined-outer-name
+        """Fixture for mock config, seed nodes are the first online nodes."""
+        load_configuration(zoe_configuration)
+        monkeypatch.setattr(interface.random, 'sample', lambda population, count: population[:count])
+
+    @staticmethod
+    def _wait(condition):
+        for attempt_ in range(100):
+            if condition():
+                return
+            time.sleep(0.05)
+        pytest.fail('image preload did not progress')
+
+    def test_seed_nodes(self, monkeypatch):
+        """The image is pulled on a seed node before the others, a failed node does not stop the others."""
+        backend = MockPullBackend(['n1', 'n2', 'n3', 'n4'], failures=('n3',))
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+
+        preload = interface.preload_image('test/image:1', seed_nodes=2)
+        self._wait(lambda: preload.is_finished)
+        assert preload.seed_nodes == ['n1', 'n2']
+        assert backend.pulled[0] in ('n1', 'n2')
+        assert sorted(backend.pulled) == ['n1', 'n2', 'n3', 'n4']
+        assert preload.count(ImagePreload.DONE_STATUS) == 3
+        assert preload.serialize()['nodes']['n3']['error'] == 'pull failed'
+        assert preload in interface.preload_status()
+
+    def test_fan_out_after_first_seed(self, monkeypatch):
+        """The other nodes do not wait for the slowest seed node."""
+        backend = MockPullBackend(['n1', 'n2', 'n3', 'n4'], blocked=('n2',))
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+
+        preload = interface.preload_image('test/image:2', seed_nodes=2)
+        self._wait(lambda: sorted(backend.pulled) == ['n1', 'n3', 'n4'])
+        assert not preload.is_finished
+        backend.released.set()
+        self._wait(lambda: preload.is_finished)
+        assert preload.count(ImagePreload.DONE_STATUS) == 4
+
+    def test_offline_nodes(self, monkeypatch):
+        """Offline nodes are skipped and never chosen as seeds."""
+        backend = MockPullBackend(['n1', 'n2', 'n3'], offline=('n1',))
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+
+        preload = interface.preload_image('test/image:3', seed_nodes=1)
+        self._wait(lambda: preload.is_finished)
+        assert preload.seed_nodes == ['n2']
+        assert sorted(backend.pulled) == ['n2', 'n3']
+        assert preload.serialize()['nodes']['n1']['status'] == ImagePreload.SKIPPED_STATUS
+
+    def test_seed_failure(self, monkeypatch):
+        """When the pull fails on all the seed nodes the other nodes are skipped."""
+        backend = MockPullBackend(['n1', 'n2', 'n3'], failures=('n1',))
+        monkeypatch.setattr(interface, '_get_backend', lambda: backend)
+
+        preload = interface.preload_image('test/image:4', seed_nodes=1)
+        self._wait(lambda: preload.is_finished)
+        assert backend.pulled == ['n1']
+        assert preload.count(ImagePreload.SKIPPED_STATUS) == 2
@@ -63,7 +63,7 @@ def main(test_conf=None):
         return ret
 
     log.info("Initializing DB manager")
-    state = SQLManager(args)
+    state = SQLManager(args, identity_map=True)
 
     try:
         zoe_master.backends.interface.initialize_backend(state)
@@ -105,4 +105,5 @@ def main(test_conf=None):
         if gelf_listener is not None:
             log.info('Terminating GELF listener thread')
             gelf_listener.quit()
+        state.close()
     return 0
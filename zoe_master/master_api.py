@@ -22,6 +22,7 @@ import zmq
 
 import zoe_lib.config
 from zoe_lib.state import SQLManager
+import zoe_master.backends.interface
 import zoe_master.preprocessing
 from zoe_master.exceptions import ZoeException
 from zoe_master.metrics.base import StatsManager
@@ -83,6 +84,7 @@ class APIManager:
                 execution = self.state.executions.select(id=exec_id, only_one=True)
                 if execution is not None:
                     zoe_master.preprocessing.execution_delete(execution)
+                self.state.invalidate('execution', exec_id)
                 self._reply_ok()
             elif message['command'] == 'scheduler_stats':
                 try:
@@ -96,6 +98,16 @@ class APIManager:
                     self._reply_error(str(e))
                 else:
                     self._reply_ok(data=data)
+            elif message['command'] == 'image_preload':
+                try:
+                    preload = zoe_master.backends.interface.preload_image(message['image_name'], message['seed_nodes'])
+                except ZoeException as e:
+                    log.error(str(e))
+                    self._reply_error(str(e))
+                else:
+                    self._reply_ok(data=preload.serialize())
+            elif message['command'] == 'image_preload_status':
+                self._reply_ok(data=[preload.serialize() for preload in zoe_master.backends.interface.preload_status()])
             else:
                 log.error('Unknown command: {}'.format(message['command']))
                 self._reply_error('unknown command')
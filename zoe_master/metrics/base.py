@@ -77,11 +77,11 @@ class StatsManager(threading.Thread):
                 for node in self._current_platform_stats.nodes:
                     node_cores = 0
                     node_memory = 0
-                    for service_id in node.service_stats:
+                    service_stats = node.service_stats  # the back-end replaces the dict when services change, the values are replaced here
+                    for service_id, stats in list(service_stats.items()):
                         usage = self.usage_metrics.get_service_usage(service_id)
                         try:
-                            node.service_stats[service_id]['cores_in_use'] = usage['cpu_usage']
-                            node.service_stats[service_id]['memory_in_use'] = usage['mem_usage']
+                            service_stats[service_id] = dict(stats, cores_in_use=usage['cpu_usage'], memory_in_use=usage['mem_usage'])
                         except KeyError:  # happens while a service is being terminated
                             continue
                         except TypeError:  # happens while KairosDB cannot be reached
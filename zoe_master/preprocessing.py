@@ -22,28 +22,24 @@ import shutil
 from zoe_lib.state import Execution, SQLManager
 from zoe_lib.config import get_conf
 from zoe_master.scheduler import ZoeBaseScheduler
-from zoe_master.backends.interface import terminate_execution, node_list, list_available_images
+from zoe_master.backends.interface import terminate_execution, get_image_index
 
 log = logging.getLogger(__name__)
 
 
 def _digest_application_description(state: SQLManager, execution: Execution):
     """Read an application description and expand it into services that can be deployed."""
-    if get_conf().backend == 'DockerEngine':
-        nodes = node_list()
-        images = []
-        for node in nodes:
-            images += list_available_images(node)
-
-        images = [name for image in images for name in image['names']]
-        if len(images) == 0:
+    image_index = get_image_index()
+    if image_index is not None:
+        if image_index.is_empty():
             log.warning('The image list reported by the back-end is empty')
         for service_descr in execution.description['services']:
-            if service_descr['image'] not in images:
+            if not image_index.is_available_anywhere(service_descr['image']):
                 execution.set_error()
                 execution.set_error_message('image {} is not available'.format(service_descr['image']))
                 return False
 
+    new_services = []
     for service_descr in execution.description['services']:
         essential_count = service_descr['essential_count']
         total_count = service_descr['total_count']
@@ -51,30 +47,19 @@ def _digest_application_description(state: SQLManager, execution: Execution):
             execution.set_error()
             execution.set_error_message('total_count is less than essential_count for service {}'.format(service_descr['name']))
             return False
-        elastic_count = total_count - essential_count
-        counter = 0
-        for service_n_ in range(essential_count):
+        for counter in range(total_count):
             name = "{}{}".format(service_descr['name'], counter)
-            sid = state.services.insert(execution.id, name, service_descr['name'], service_descr, True)
-
-            # Ports
-            for port_descr in service_descr['ports']:
+            new_services.append((execution.id, name, service_descr['name'], service_descr, counter < essential_count))
+
+    # Services and ports are written with one query per table, in a single transaction
+    with state.transaction():
+        service_ids = state.services.insert_many(new_services)
+        new_ports = []
+        for sid, new_service in zip(service_ids, new_services):
+            for port_descr in new_service[3]['ports']:
                 port_internal = str(port_descr['port_number']) + '/' + port_descr['protocol']
-                state.ports.insert(sid, port_internal, port_descr)
-
-            counter += 1
-
-        for service_n_ in range(elastic_count):
-            name = "{}{}".format(service_descr['name'], counter)
-            sid = state.services.insert(execution.id, name, service_descr['name'], service_descr, False)
-
-            # Ports
-            for port_descr in service_descr['ports']:
-                port_internal = str(port_descr['port_number']) + '/' + port_descr['protocol']
-                state.ports.insert(sid, port_internal, port_descr)
-
-            counter += 1
-        assert counter == total_count
+                new_ports.append((sid, port_internal, port_descr))
+        state.ports.insert_many(new_ports)
 
     if get_conf().scheduler_policy == 'DYNSIZE':
         execution.set_size(execution.total_reservations.cores.min * execution.total_reservations.memory.min)
@@ -18,22 +18,33 @@ The Elastic scheduler is the implementation of the scheduling algorithm presente
 https://arxiv.org/abs/1611.09528
 """
 
+from collections import deque
 import logging
 import threading
 import time
+from typing import Dict, List, Tuple, Union
 
+from zoe_lib.config import get_conf
 from zoe_lib.state import Execution, SQLManager, Service  # pylint: disable=unused-import
 from zoe_master.exceptions import ZoeException
 
-from zoe_master.backends.interface import terminate_execution, terminate_service, start_elastic, start_essential, update_service_resource_limits
+from zoe_master.backends import events
+from zoe_master.backends.interface import terminate_execution_async, terminate_service, start_executions, update_services_core_limits
+from zoe_master.scheduler.execution_queue import ExecutionQueue
 from zoe_master.scheduler.simulated_platform import SimulatedPlatform
+from zoe_master.scheduler.trigger import CoalescingTrigger
 from zoe_master.exceptions import UnsupportedSchedulerPolicyError
-from zoe_master.stats import NodeStats  # pylint: disable=unused-import
+from zoe_master.stats import ClusterStats, NodeStats
 from zoe_master.metrics.base import StatsManager  # pylint: disable=unused-import
 
 log = logging.getLogger(__name__)
 
-SELF_TRIGGER_TIMEOUT = 60  # the scheduler will trigger itself periodically in case platform resources have changed outside its control
+SELF_TRIGGER_TIMEOUT = 60  # with a non-empty queue and no events, the scheduler will trigger itself in case platform resources have changed outside its control
+CORE_LIMIT_TOLERANCE = 0.01  # core limits are not updated for changes smaller than this
+CORE_DEMAND_SMOOTHING = 0.3  # weight of the last usage sample in the moving average of core demand
+CORE_DEMAND_MIN = 0.01  # idle services are considered to use at least this many cores
+CORE_USAGE_HYSTERESIS = 0.2  # with usage-based redistribution, core limits are not updated for changes smaller than this fraction of the current limit
+TRIGGER_DEBOUNCE = 0.1  # triggers arriving within this many seconds are merged into a single scheduler pass
 
 
 def catch_exceptions_and_retry(func):
@@ -59,34 +70,45 @@ class ExecutionProgress:
 
 
 class ZoeElasticScheduler:
-    """The Scheduler class for size-based scheduling. Policy can be "FIFO" or "SIZE"."""
+    """The Scheduler class for size-based scheduling. Policy can be "FIFO", "SIZE", "DYNSIZE" or "BACKFILL"."""
     def __init__(self, state: SQLManager, policy, metrics: StatsManager):
-        if policy not in ('FIFO', 'SIZE', 'DYNSIZE'):
+        if policy not in ('FIFO', 'SIZE', 'DYNSIZE', 'BACKFILL'):
             raise UnsupportedSchedulerPolicyError
         self.metrics = metrics
-        self.trigger_semaphore = threading.Semaphore(0)
+        self.trigger_event = CoalescingTrigger(TRIGGER_DEBOUNCE)
         self.policy = policy
-        self.queue = []
-        self.queue_running = []
-        self.queue_termination = []
+        self.queue = ExecutionQueue(policy)
+        self.queue_running = {}
+        self.queue_termination = deque()
+        self.terminations_in_progress = {}
+        self.terminations_lock = threading.Lock()
         self.additional_exec_state = {}
+        self.simulated_platform = None
         self.loop_quit = False
         self.loop_th = threading.Thread(target=self.loop_start_th, name='scheduler')
         self.core_limit_recalc_trigger = threading.Event()
+        self.core_demand = {}
+        self.core_demand_timestamp = None
         self.core_limit_th = threading.Thread(target=self._adjust_core_limits, name='adjust_core_limits')
         self.state = state
         for execution in self.state.executions.select(status='running'):
             if execution.all_services_running:
-                self.queue_running.append(execution)
+                self.queue_running[execution.id] = execution
             else:
                 self.queue.append(execution)
                 self.additional_exec_state[execution.id] = ExecutionProgress()
+        events.subscribe(self._backend_event)
         self.loop_th.start()
         self.core_limit_th.start()
 
     def trigger(self):
         """Trigger a scheduler run."""
-        self.trigger_semaphore.release()
+        self.trigger_event.fire()
+
+    def _backend_event(self, event, node_name):
+        """A container died, node capacity changed or new images are available: the schedule may change."""
+        log.debug('Scheduler triggered by back-end event {} on node {}'.format(event, node_name))
+        self.trigger()
 
     def incoming(self, execution: Execution):
         """
@@ -107,16 +129,17 @@ class ZoeElasticScheduler:
         """
         execution.set_cleaning_up()
         self.queue_termination.append(execution)
+        self.trigger()
 
     def _terminate_executions(self):
         while len(self.queue_termination) > 0:
-            execution = self.queue_termination.pop(0)
+            execution = self.queue_termination.popleft()
             try:
                 self.queue.remove(execution)
             except ValueError:
                 try:
-                    self.queue_running.remove(execution)
-                except ValueError:
+                    del self.queue_running[execution.id]
+                except KeyError:
                     log.warning('Execution {} is not in any queue, attempting termination anyway'.format(execution.id))
 
             try:
@@ -124,16 +147,30 @@ class ZoeElasticScheduler:
             except KeyError:
                 pass
 
-            terminate_execution(execution)
+            with self.terminations_lock:
+                if execution.id in self.terminations_in_progress:
+                    continue
+                future = terminate_execution_async(execution)
+                self.terminations_in_progress[execution.id] = execution
+            future.add_done_callback(lambda f, e=execution: self._termination_done(e, f))
+
+    def _termination_done(self, execution: Execution, future):
+        """Called by the termination workers, the resources used by the execution are now free."""
+        with self.terminations_lock:
+            del self.terminations_in_progress[execution.id]
+        if future.exception() is not None:
+            log.error('Error terminating execution {}: {}'.format(execution.id, future.exception()))
+        else:
             log.info('Execution {} terminated successfully'.format(execution.id))
+        self.trigger()
 
     def _refresh_execution_sizes(self):
-        if self.policy == "FIFO":
+        if self.policy in ("FIFO", "BACKFILL"):
             return
         elif self.policy == "SIZE":
             return
         elif self.policy == "DYNSIZE":
-            for execution in self.queue:  # type: Execution
+            for execution in self.queue.executions():  # type: Execution
                 try:
                     exec_data = self.additional_exec_state[execution.id]
                 except KeyError:
@@ -145,190 +182,250 @@ class ZoeElasticScheduler:
                     continue
                 new_size = execution.size - (time.time() - exec_data.last_time_scheduled) * (256 * 1024 ** 2)  # to be tuned
                 execution.set_size(new_size)
+                self.queue.update(execution)
 
     def _pop_all(self):
-        out_list = []
+        """Generate the queued executions in scheduling order, the queue is sorted lazily so that a pass that stops early does not sort all of it."""
         for execution in self.queue:  # type: Execution
             if execution.status != Execution.TERMINATED_STATUS or execution.status != Execution.CLEANING_UP_STATUS:
-                out_list.append(execution)
+                yield execution
             else:
                 log.debug('While popping, throwing away execution {} that is in status {}'.format(execution.id, execution.status))
 
-        return out_list
-
     def _requeue(self, execution: Execution):
         self.additional_exec_state[execution.id].last_time_scheduled = time.time()
         if execution not in self.queue:  # sanity check: the execution should be in the queue
             log.warning("Execution {} wants to be re-queued, but it is not in the queue".format(execution.id))
 
     @catch_exceptions_and_retry
-    def loop_start_th(self):  # pylint: disable=too-many-locals
+    def loop_start_th(self):
         """The Scheduler thread loop."""
-        auto_trigger = SELF_TRIGGER_TIMEOUT
         while True:
-            ret = self.trigger_semaphore.acquire(timeout=1)
-            if not ret:  # Semaphore timeout, do some cleanup
-                auto_trigger -= 1
-                if auto_trigger == 0:
-                    auto_trigger = SELF_TRIGGER_TIMEOUT
-                    self.trigger()
-                continue
+            # Sleep until something happens, if executions are waiting wake up anyway after a while
+            if not self.trigger_event.wait(timeout=SELF_TRIGGER_TIMEOUT if len(self.queue) > 0 else None):
+                log.debug('No scheduler triggers in {} seconds, running a pass for the waiting executions'.format(SELF_TRIGGER_TIMEOUT))
 
             if self.loop_quit:
                 break
 
-            self._check_dead_services()
-            self._terminate_executions()
-
-            if len(self.queue) == 0:
-                log.debug("Scheduler loop has been triggered, but the queue is empty")
-                self.core_limit_recalc_trigger.set()
-                continue
-            log.debug("Scheduler loop has been triggered")
-
-            while True:  # Inner loop will run until no new executions can be started or the queue is empty
-                self._refresh_execution_sizes()
-
-                if self.policy == "SIZE" or self.policy == "DYNSIZE":
-                    self.queue.sort(key=lambda execution: execution.size)
-
-                jobs_to_attempt_scheduling = self._pop_all()
-                log.debug('Scheduler inner loop, jobs to attempt scheduling:')
-                for job in jobs_to_attempt_scheduling:
-                    log.debug("-> {} ({})".format(job, job.size))
-
-                try:
-                    platform_state = self.metrics.current_stats
-                except ZoeException:
-                    log.error('Cannot retrieve platform state, cannot schedule')
-                    for job in jobs_to_attempt_scheduling:
-                        self._requeue(job)
-                    break
-
-                cluster_status_snapshot = SimulatedPlatform(platform_state)
-
-                jobs_to_launch = []
-                free_resources = cluster_status_snapshot.aggregated_free_memory()
-
-                # Try to find a placement solution using a snapshot of the platform status
-                for job in jobs_to_attempt_scheduling:  # type: Execution
-                    jobs_to_launch_copy = jobs_to_launch.copy()
-
-                    # remove all elastic services from the previous simulation loop
-                    for job_aux in jobs_to_launch:  # type: Execution
-                        cluster_status_snapshot.deallocate_elastic(job_aux)
+            # Load services, ports and owners of all known executions with a few bulk queries, the whole pass works on this snapshot
+            snapshot = self.queue.executions() + list(self.queue_running.values())
+            self.state.executions.prefetch(snapshot)
+            try:
+                self._schedule_pass()
+            finally:
+                for execution in snapshot:
+                    execution.clear_prefetched()
+
+    def _schedule_pass(self):  # pylint: disable=too-many-branches
+        """A single scheduling pass, triggered by an event."""
+        self._check_dead_services()
+        self._terminate_executions()
+
+        if len(self.queue) == 0:
+            log.debug("Scheduler loop has been triggered, but the queue is empty")
+            self.core_limit_recalc_trigger.set()
+            return
+        log.debug("Scheduler loop has been triggered")
 
-                    job_can_start = False
-                    if not job.is_running:
-                        job_can_start = cluster_status_snapshot.allocate_essential(job)
+        while True:  # Inner loop will run until no new executions can be started or the queue is empty
+            self._refresh_execution_sizes()
 
-                    if job_can_start or job.is_running:
-                        jobs_to_launch.append(job)
+            jobs_waiting = self.queue.executions()
+            log.debug('Scheduler inner loop, {} jobs to attempt scheduling'.format(len(jobs_waiting)))
 
-                    # Try to put back the elastic services
-                    for job_aux in jobs_to_launch:
-                        cluster_status_snapshot.allocate_elastic(job_aux)
+            try:
+                platform_state = self.metrics.current_stats
+            except ZoeException:
+                log.error('Cannot retrieve platform state, cannot schedule')
+                for job in jobs_waiting:
+                    self._requeue(job)
+                break
 
-                    current_free_resources = cluster_status_snapshot.aggregated_free_memory()
-                    if current_free_resources >= free_resources:
-                        jobs_to_launch = jobs_to_launch_copy
-                        break
+            if self.simulated_platform is None:
+                self.simulated_platform = SimulatedPlatform(platform_state)
+            else:
+                self.simulated_platform.update(platform_state)
+            cluster_status_snapshot = self.simulated_platform
+
+            jobs_to_launch = []
+            free_resources = cluster_status_snapshot.aggregated_free_memory()
+            reservation_made = False
+
+            # Try to find a placement solution using a snapshot of the platform status
+            for job in self._pop_all():  # type: Execution
+                log.debug("-> {} ({})".format(job, job.size))
+                jobs_to_launch_copy = jobs_to_launch.copy()
+
+                # remove all elastic services from the previous simulation loop
+                for job_aux in jobs_to_launch:  # type: Execution
+                    cluster_status_snapshot.deallocate_elastic(job_aux)
+
+                job_can_start = False
+                if not job.is_running:
+                    job_can_start = cluster_status_snapshot.allocate_essential(job)
+
+                if job_can_start or job.is_running:
+                    jobs_to_launch.append(job)
+
+                # Try to put back the elastic services
+                for job_aux in jobs_to_launch:
+                    cluster_status_snapshot.allocate_elastic(job_aux)
+
+                current_free_resources = cluster_status_snapshot.aggregated_free_memory()
+                if self.policy == "BACKFILL":
+                    # The first execution that cannot start holds the resources it needs, the ones behind it can start only using what is left
+                    if not (job_can_start or job.is_running) and not reservation_made:
+                        reservation_made = cluster_status_snapshot.reserve_essential(job)
                     free_resources = current_free_resources
+                    continue
+                if current_free_resources >= free_resources:
+                    jobs_to_launch = jobs_to_launch_copy
+                    break
+                free_resources = current_free_resources
 
-                placements = cluster_status_snapshot.get_service_allocation()
-                log.info('Allocation after simulation: {}'.format(placements))
-
-                # We port the results of the simulation into the real cluster
-                for job in jobs_to_launch:  # type: Execution
-                    if not job.essential_services_running:
-                        ret = start_essential(job, placements)
-                        if ret == "fatal":
-                            jobs_to_attempt_scheduling.remove(job)
-                            self.queue.remove(job)
-                            continue  # trow away the execution
-                        elif ret == "requeue":
-                            self._requeue(job)
-                            continue
-                        elif ret == "ok":
-                            job.set_running()
+            placements = cluster_status_snapshot.get_service_allocation()
+            log.info('Allocation after simulation: {}'.format(placements))
 
-                        assert ret == "ok"
+            # We port the results of the simulation into the real cluster, executions are started in parallel
+            for job, ret in zip(jobs_to_launch, start_executions(jobs_to_launch, placements)):  # type: Execution, str
+                if ret == "fatal":
+                    self.queue.remove(job)
+                    continue  # trow away the execution
+                elif ret == "requeue":
+                    self._requeue(job)
+                    continue
 
-                    start_elastic(job, placements)
+                assert ret == "ok"
 
-                    if job.all_services_active:
-                        log.info('execution {}: all services are active'.format(job.id))
-                        jobs_to_attempt_scheduling.remove(job)
-                        self.queue.remove(job)
-                        self.queue_running.append(job)
+                if job.all_services_active:
+                    log.info('execution {}: all services are active'.format(job.id))
+                    self.queue.remove(job)
+                    self.queue_running[job.id] = job
 
-                self.core_limit_recalc_trigger.set()
+            self.core_limit_recalc_trigger.set()
 
-                for job in jobs_to_attempt_scheduling:
+            for job in jobs_waiting:
+                if job in self.queue:
                     self._requeue(job)
 
-                if len(self.queue) == 0:
-                    log.debug('empty queue, exiting inner loop')
-                    break
-                if len(jobs_to_launch) == 0:
-                    log.debug('No executions could be started, exiting inner loop')
-                    break
+            if len(self.queue) == 0:
+                log.debug('empty queue, exiting inner loop')
+                break
+            if len(jobs_to_launch) == 0:
+                log.debug('No executions could be started, exiting inner loop')
+                break
 
     def quit(self):
         """Stop the scheduler thread."""
         self.loop_quit = True
-        self.trigger()
+        events.unsubscribe(self._backend_event)
+        self.trigger_event.quit()
         self.core_limit_recalc_trigger.set()
         self.loop_th.join()
         self.core_limit_th.join()
 
     def stats(self):
         """Scheduler statistics."""
-        if self.policy == "SIZE":
-            queue = sorted(self.queue, key=lambda execution: execution.size)
-        else:
-            queue = self.queue
-
         return {
             'queue_length': len(self.queue),
             'running_length': len(self.queue_running),
-            'termination_queue_length': len(self.queue_termination),
-            'queue': [s.id for s in queue],
-            'running_queue': [s.id for s in self.queue_running],
-            'termination_queue': [s.id for s in self.queue_termination]
+            'termination_queue_length': len(self.queue_termination) + len(self.terminations_in_progress),
+            'queue': [s.id for s in self.queue],
+            'running_queue': list(self.queue_running.keys()),
+            'termination_queue': [s.id for s in self.queue_termination] + list(self.terminations_in_progress.keys())
         }
 
     @catch_exceptions_and_retry
     def _adjust_core_limits(self):
         self.core_limit_recalc_trigger.clear()
         while not self.loop_quit:
-            self.core_limit_recalc_trigger.wait()
+            if get_conf().core_redistribution == 'usage':  # usage changes also when no execution starts or ends
+                self.core_limit_recalc_trigger.wait(timeout=self.metrics.METRIC_INTERVAL)
+            else:
+                self.core_limit_recalc_trigger.wait()
             if self.loop_quit:
                 break
-            stats = self.metrics.current_stats
-            for node in stats.nodes:  # type: NodeStats
-                new_core_allocations = {}
-                node_services = self.state.services.select(backend_host=node.name, backend_status=Service.BACKEND_START_STATUS)
-                if len(node_services) == 0:
-                    continue
+            self.core_limit_recalc_trigger.clear()
+            updates = self._core_limit_updates(self.metrics.current_stats)
+            if len(updates) > 0:
+                log.debug('Updating core limits of {} services'.format(sum([len(u) for u in updates.values()])))
+                update_services_core_limits(updates)
+
+    def _core_limit_targets(self, node: NodeStats, node_services: List[Service], new_sample: bool) -> Dict[int, float]:
+        """Distribute the free cores of a node among the services running on it, in equal parts or in proportion to their recent usage."""
+        if node.cores_reserved < node.cores_total:
+            cores_free = node.cores_total - node.cores_reserved
+        else:
+            cores_free = 0
 
-                for service in node_services:
-                    new_core_allocations[service.id] = service.resource_reservation.cores.min
+        demand = self._core_demand(node, node_services, new_sample) if get_conf().core_redistribution == 'usage' else None
+        if demand is None:
+            return {service.id: service.resource_reservation.cores.min + cores_free / len(node_services) for service in node_services}
 
-                if node.cores_reserved < node.cores_total:
-                    cores_free = node.cores_total - node.cores_reserved
-                    cores_to_add = cores_free / len(node_services)
-                else:
-                    cores_to_add = 0
+        total_demand = sum(demand.values())
+        return {service.id: service.resource_reservation.cores.min + cores_free * demand[service.id] / total_demand for service in node_services}
 
-                for service in node_services:
-                    update_service_resource_limits(service, cores=new_core_allocations[service.id] + cores_to_add)
+    def _core_demand(self, node: NodeStats, node_services: List[Service], new_sample: bool) -> Union[Dict[int, float], None]:
+        """Update the moving average of the cores used by each service, only for new usage samples, return None if no usage metrics were ever available for this node.
 
-            self.core_limit_recalc_trigger.clear()
+        Samples can be missing for a while, e.g. when a reconciliation replaces the service stats between two metrics samples: the stored averages are used until the next sample.
+        """
+        samples = {service.id: node.service_stats.get(service.id, {}).get('cores_in_use') for service in node_services}
+        if all(samples[service_id] is None and service_id not in self.core_demand for service_id in samples):
+            return None
+        demand = {}
+        for service_id, sample in samples.items():
+            previous = self.core_demand.get(service_id)
+            if sample is None or (previous is not None and not new_sample):
+                current = previous if previous is not None else CORE_DEMAND_MIN
+            elif previous is None:
+                current = sample
+            else:
+                current = CORE_DEMAND_SMOOTHING * sample + (1 - CORE_DEMAND_SMOOTHING) * previous
+            self.core_demand[service_id] = current
+            demand[service_id] = max(current, CORE_DEMAND_MIN)
+        return demand
+
+    def _core_limit_updates(self, stats: ClusterStats) -> Dict[str, List[Tuple[Service, float]]]:
+        """Compute the core limits for the whole cluster, return only the ones that differ from the limits currently applied, grouped by node."""
+        nodes = {node.name: node for node in stats.nodes}
+        if len(nodes) == 0:
+            return {}
+        services_by_node = {}
+        for service in self.state.services.select(backend_host=list(nodes.keys()), backend_status=Service.BACKEND_START_STATUS):
+            services_by_node.setdefault(service.backend_host, []).append(service)
+
+        new_sample = stats.timestamp != self.core_demand_timestamp  # the same metrics are read again when limits are recomputed for other reasons
+        self.core_demand_timestamp = stats.timestamp
+        running_ids = set()
+        updates = {}
+        for node_name, node_services in services_by_node.items():
+            node = nodes[node_name]
+            targets = self._core_limit_targets(node, node_services, new_sample)
+            for service in node_services:
+                running_ids.add(service.id)
+                cores = targets[service.id]
+                if node.cores_total > 0:
+                    cores = min(cores, node.cores_total)
+                current = node.service_stats.get(service.id, {}).get('core_limit')
+                if current is not None and abs(current - cores) < self._core_limit_tolerance(current):
+                    continue
+                updates.setdefault(node_name, []).append((service, cores))
+
+        for service_id in set(self.core_demand.keys()) - running_ids:
+            del self.core_demand[service_id]
+        return updates
+
+    def _core_limit_tolerance(self, current_limit: float) -> float:
+        """Return the smallest core limit change worth applying. With usage-based redistribution small changes are ignored to prevent limits from flapping."""
+        if get_conf().core_redistribution == 'usage':
+            return max(CORE_LIMIT_TOLERANCE, current_limit * CORE_USAGE_HYSTERESIS)
+        return CORE_LIMIT_TOLERANCE
 
     def _check_dead_services(self):
         # Check for executions that are no longer viable since an essential service died
-        for execution in self.queue_running:
+        for execution in list(self.queue_running.values()):
             for service in execution.services:
                 if service.essential and service.backend_status == service.BACKEND_DIE_STATUS:
                     log.info("Essential service {} ({}) of execution {} died, terminating execution".format(service.id, service.name, execution.id))
@@ -338,12 +435,12 @@ class ZoeElasticScheduler:
                     break
         # Check for executions that need to be re-queued because one of the elastic components died
         # Do it in two loops to prevent rescheduling executions that need to be terminated
-        for execution in self.queue_running:
+        for execution in list(self.queue_running.values()):
             for service in execution.services:
                 if not service.essential and service.backend_status == service.BACKEND_DIE_STATUS:
                     log.info("Elastic service {} ({}) of execution {} died, rescheduling".format(service.id, service.name, execution.id))
                     terminate_service(service)
                     service.restarted()
-                    self.queue_running.remove(execution)
+                    del self.queue_running[execution.id]
                     self.queue.append(execution)
                     break
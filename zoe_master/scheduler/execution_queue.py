@@ -0,0 +1,120 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The queue of executions waiting to be scheduled."""
+
+import heapq
+import itertools
+import threading
+from typing import Iterator, List, Union
+
+from zoe_lib.state import Execution
+
+
+class ExecutionQueue:
+    """A priority queue of executions, indexed by execution ID.
+
+    With the SIZE and DYNSIZE policies executions are ordered by size, otherwise in arrival order. Executions with the same size keep their arrival order.
+    Insertions, removals and key updates cost O(log n), membership tests cost O(1). Removed entries are left in the heap and skipped lazily.
+    Iterating in scheduling order costs O(n) to copy the heap plus O(log n) for each execution read, a scheduler pass that stops early does not sort the whole queue.
+    The queue is modified both by the API thread and by the scheduler thread, all methods are protected by a lock.
+    """
+
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self, policy: str):
+        self.sort_by_size = policy in ('SIZE', 'DYNSIZE')
+        self._lock = threading.RLock()
+        self._heap = []
+        self._entries = {}
+        self._arrival = itertools.count()
+        self._tiebreak = itertools.count()
+        self._removed_count = 0
+
+    def _key(self, execution: Execution):
+        if self.sort_by_size:
+            return execution.size
+        return 0
+
+    def _push(self, key, arrival, execution: Execution):
+        entry = [key, arrival, next(self._tiebreak), execution]
+        self._entries[execution.id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _invalidate(self, entry):
+        entry[-1] = None
+        self._removed_count += 1
+        if self._removed_count > self.COMPACT_THRESHOLD and self._removed_count > len(self._entries):
+            self._heap = [e for e in self._heap if e[-1] is not None]
+            heapq.heapify(self._heap)
+            self._removed_count = 0
+
+    def append(self, execution: Execution) -> None:
+        """Add an execution to the queue. If it is already queued, its position is updated."""
+        with self._lock:
+            if execution.id in self._entries:
+                self.update(execution)
+            else:
+                self._push(self._key(execution), next(self._arrival), execution)
+
+    def remove(self, execution: Execution) -> None:
+        """Remove an execution from the queue, raises ValueError if it is not queued."""
+        with self._lock:
+            try:
+                entry = self._entries.pop(execution.id)
+            except KeyError as e:
+                raise ValueError('Execution {} is not in the queue'.format(execution.id)) from e
+            self._invalidate(entry)
+
+    def update(self, execution: Execution) -> None:
+        """Re-position an execution after its size has changed."""
+        with self._lock:
+            entry = self._entries[execution.id]
+            entry[-1] = execution
+            new_key = self._key(execution)
+            if new_key == entry[0]:
+                return
+            del self._entries[execution.id]
+            self._invalidate(entry)
+            self._push(new_key, entry[1], execution)
+
+    def peek(self) -> Union[Execution, None]:
+        """Return the execution at the head of the queue without removing it."""
+        with self._lock:
+            while len(self._heap) > 0 and self._heap[0][-1] is None:
+                heapq.heappop(self._heap)
+                self._removed_count -= 1
+            if len(self._heap) == 0:
+                return None
+            return self._heap[0][-1]
+
+    def executions(self) -> List[Execution]:
+        """Return the queued executions, in no particular order."""
+        with self._lock:
+            return [entry[-1] for entry in self._entries.values()]
+
+    def __iter__(self) -> Iterator[Execution]:
+        """Iterate over the executions queued at the time of the call, in scheduling order. The heap is copied and popped lazily."""
+        with self._lock:
+            heap = [tuple(entry) for entry in self._heap if entry[-1] is not None]
+        heapq.heapify(heap)
+        while len(heap) > 0:
+            yield heapq.heappop(heap)[-1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, execution: Execution):
+        return execution.id in self._entries
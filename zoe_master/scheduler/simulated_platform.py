@@ -2,12 +2,13 @@
 
 import logging
 import random
-from typing import List
+from typing import List, Union
 
 from zoe_lib.state import Execution, Service
 from zoe_lib.config import get_conf
 from zoe_master.stats import ClusterStats, NodeStats
-from zoe_master.backends.interface import list_available_images
+from zoe_master.backends.image_index import ImageIndex
+from zoe_master.backends.interface import get_image_index
 
 
 log = logging.getLogger(__name__)
@@ -15,7 +16,22 @@ log = logging.getLogger(__name__)
 
 class SimulatedNode:
     """A simulated node where containers can be run"""
-    def __init__(self, real_node: NodeStats):
+    def __init__(self, real_node: NodeStats, image_index: Union[ImageIndex, None]):
+        self.name = real_node.name
+        self.image_index = image_index
+        self.services = {}
+        self.simulated_reservations = {
+            "memory": 0,
+            "cores": 0
+        }
+        self.held_reservations = {
+            "memory": 0,
+            "cores": 0
+        }
+        self.update(real_node)
+
+    def update(self, real_node: NodeStats):
+        """Refresh the real node data and drop all simulated services, so that this object can be reused in the next scheduler pass."""
         self.real_reservations = {
             "memory": real_node.memory_reserved,
             "cores": real_node.cores_reserved
@@ -24,11 +40,16 @@ class SimulatedNode:
             "memory": real_node.memory_total - real_node.memory_reserved,
             "cores": real_node.cores_total - real_node.cores_reserved
         }
+        self.real_total_resources = {
+            "memory": real_node.memory_total,
+            "cores": real_node.cores_total
+        }
         self.real_active_containers = real_node.container_count
-        self.services = []
-        self.name = real_node.name
+        self.services.clear()
+        self.simulated_reservations['memory'] = 0
+        self.simulated_reservations['cores'] = 0
+        self.release_held()
         self.labels = real_node.labels
-        self.images = list_available_images(self.name)
         log.debug('Node {}: m {:.2f}GB | c {} | l {} | ncont {}'.format(self.name, self.node_free_memory() / (1024 ** 3), self.node_free_cores(), list(self.labels), self.container_count))
 
     def service_fits(self, service: Service) -> bool:
@@ -56,29 +77,55 @@ class SimulatedNode:
         else:
             return 'unknown reason'
 
+    def service_could_fit(self, service: Service) -> bool:
+        """Checks whether a service would fit in this node once the running services have terminated, taking into account resources already held."""
+        if 'disabled' in self.labels:
+            return False
+        ret = set(service.labels).issubset(self.labels)
+        ret = ret and service.resource_reservation.memory.min < self.real_total_resources['memory'] - self.held_reservations['memory']
+        ret = ret and service.resource_reservation.cores.min <= self.real_total_resources['cores'] - self.held_reservations['cores']
+        ret = ret and self._image_is_available(service.image_name)
+        return ret
+
+    def hold(self, service: Service):
+        """Hold the resources of a service on this node, they will not be available to other services."""
+        self.held_reservations['memory'] += service.resource_reservation.memory.min
+        self.held_reservations['cores'] += service.resource_reservation.cores.min
+
+    def unhold(self, service: Service):
+        """Release the resources held for a service."""
+        self.held_reservations['memory'] -= service.resource_reservation.memory.min
+        self.held_reservations['cores'] -= service.resource_reservation.cores.min
+
+    def release_held(self):
+        """Make held resources available again."""
+        self.held_reservations['memory'] = 0
+        self.held_reservations['cores'] = 0
+
     def _image_is_available(self, image_name) -> bool:
-        if get_conf().backend != 'DockerEngine':
+        if self.image_index is None:  # the back-end does not track images, assume they can be pulled on demand
             return True
-        for image in self.images:
-            if image_name in image['names']:
-                return True
-        return False
+        return self.image_index.is_available(self.name, image_name)
 
     def service_add(self, service):
         """Add a service in this node."""
         if self.service_fits(service):
-            self.services.append(service)
+            self.services[service.id] = service
+            self.simulated_reservations['memory'] += service.resource_reservation.memory.min
+            self.simulated_reservations['cores'] += service.resource_reservation.cores.min
             return True
         else:
             return False
 
     def service_remove(self, service):
-        """Add a service in this node."""
+        """Remove a service from this node."""
         try:
-            self.services.remove(service)
-        except ValueError:
+            removed = self.services.pop(service.id)
+        except KeyError:
             return False
         else:
+            self.simulated_reservations['memory'] -= removed.resource_reservation.memory.min
+            self.simulated_reservations['cores'] -= removed.resource_reservation.cores.min
             return True
 
     @property
@@ -88,23 +135,17 @@ class SimulatedNode:
 
     def node_free_memory(self):
         """Return the amount of free memory for this node"""
-        simulated_reservation = 0
-        for service in self.services:  # type: Service
-            simulated_reservation += service.resource_reservation.memory.min
-        free = self.real_free_resources['memory'] - simulated_reservation
+        free = self.real_free_resources['memory'] - self.simulated_reservations['memory']
         if free < 0:
             log.warning('More memory reserved than there is free on node {}: {}'.format(self.name, free))
-        return free
+        return free - self.held_reservations['memory']
 
     def node_free_cores(self):
         """Return the amount of free cores available in this node."""
-        simulated_reservation = 0
-        for service in self.services:  # type: Service
-            simulated_reservation += service.resource_reservation.cores.min
-        free = self.real_free_resources['cores'] - simulated_reservation
+        free = self.real_free_resources['cores'] - self.simulated_reservations['cores']
         if free < 0:
             log.warning('More cores reserved than there are free on node {}: {}'.format(self.name, free))
-        return free
+        return free - self.held_reservations['cores']
 
     def __repr__(self):
         out = 'SN {} | m {:.2f}GB | c {}'.format(self.name, self.node_free_memory() / (1024 ** 3), self.node_free_cores())
@@ -115,9 +156,43 @@ class SimulatedPlatform:
     """A simulated cluster, composed by simulated nodes"""
     def __init__(self, platform_status: ClusterStats):
         self.nodes = {}
+        self.image_index = get_image_index()
+        self._placements = {}
+        self._free_memory = 0
+        self.update(platform_status)
+
+    def update(self, platform_status: ClusterStats):
+        """Refresh the simulated cluster with new platform statistics, reusing the existing node objects and dropping all simulated placements."""
+        online_nodes = set()
         for node in platform_status.nodes:
-            if node.status == 'online':
-                self.nodes[node.name] = SimulatedNode(node)
+            if node.status != 'online':
+                continue
+            online_nodes.add(node.name)
+            if node.name in self.nodes:
+                self.nodes[node.name].update(node)
+            else:
+                self.nodes[node.name] = SimulatedNode(node, self.image_index)
+        for node_name in list(self.nodes.keys()):
+            if node_name not in online_nodes:
+                del self.nodes[node_name]
+        self._placements.clear()
+        self._free_memory = sum([node.real_free_resources['memory'] for node in self.nodes.values()])
+
+    def _service_add(self, node: SimulatedNode, service: Service) -> bool:
+        if not node.service_add(service):
+            return False
+        self._placements[service.id] = node
+        self._free_memory -= service.resource_reservation.memory.min
+        return True
+
+    def _service_remove(self, service: Service) -> bool:
+        try:
+            node = self._placements.pop(service.id)
+        except KeyError:
+            return False
+        node.service_remove(service)
+        self._free_memory += service.resource_reservation.memory.min
+        return True
 
     def _select_node_policy(self, node_list: List[SimulatedNode]) -> SimulatedNode:
         if get_conf().placement_policy == "random":
@@ -153,15 +228,13 @@ class SimulatedPlatform:
                 return False
             log.debug('Node selection for service {} with {} policy'.format(service.id, get_conf().placement_policy))
             selected_node = self._select_node_policy(candidate_nodes)
-            selected_node.service_add(service)
+            self._service_add(selected_node, service)
         return True
 
     def deallocate_essential(self, execution: Execution):
         """Remove all essential services from the simulated cluster"""
         for service in execution.essential_services:
-            for node_id_, node in self.nodes.items():
-                if node.service_remove(service):
-                    break
+            self._service_remove(service)
 
     def allocate_elastic(self, execution: Execution) -> bool:
         """Try to find an allocation for elastic services"""
@@ -181,7 +254,7 @@ class SimulatedPlatform:
                 continue
             log.debug('Node selection for service {} with {} policy'.format(service.id, get_conf().placement_policy))
             selected_node = self._select_node_policy(candidate_nodes)
-            selected_node.service_add(service)
+            self._service_add(selected_node, service)
             service.set_runnable()
             at_least_one_allocated = True
         return at_least_one_allocated
@@ -189,25 +262,38 @@ class SimulatedPlatform:
     def deallocate_elastic(self, execution: Execution):
         """Remove all elastic services from the simulated cluster"""
         for service in execution.elastic_services:
-            for node_id_, node in self.nodes.items():
-                if node.service_remove(service):
-                    service.set_inactive()
-                    break
+            if self._service_remove(service):
+                service.set_inactive()
+
+    def reserve_essential(self, execution: Execution) -> bool:
+        """
+        Hold resources for the essential services of an execution that cannot start now, used by the backfilling policy.
+
+        Each service is assigned to the node that has the most free memory among those where it could run once the running services have terminated. Held resources cannot be used by
+        services allocated afterwards, so that they do not delay the start of the execution holding them.
+        :return: False if the execution could not run even on an empty platform, in this case nothing is held
+        """
+        held_on = []
+        for service in execution.essential_services:
+            candidate_nodes = [node for node in self.nodes.values() if node.service_could_fit(service)]
+            if len(candidate_nodes) == 0:
+                log.info('Cannot reserve resources for essential service {} of execution {}, it does not fit on any node'.format(service.id, execution.id))
+                for node, held_service in held_on:
+                    node.unhold(held_service)
+                return False
+            selected_node = max(candidate_nodes, key=lambda n: n.node_free_memory())
+            selected_node.hold(service)
+            held_on.append((selected_node, service))
+        log.debug('Resources held for execution {} on nodes {}'.format(execution.id, [n.name for n, s_ in held_on]))
+        return True
 
     def aggregated_free_memory(self):
         """Return the amount of free memory across all nodes"""
-        total = 0
-        for node_id_, node in self.nodes.items():
-            total += node.node_free_memory()
-        return total
+        return self._free_memory
 
     def get_service_allocation(self):
         """Return a map of service IDs to nodes where they have been allocated."""
-        placements = {}
-        for node_id, node in self.nodes.items():
-            for service in node.services:
-                placements[service.id] = node_id
-        return placements
+        return {service_id: node.name for service_id, node in self._placements.items()}
 
     def __repr__(self):
         out = ''
@@ -0,0 +1,160 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the core limit computation of the elastic scheduler."""
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.state.service import ResourceReservation
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+from zoe_master.scheduler.elastic_scheduler import ZoeElasticScheduler
+from zoe_master.stats import ClusterStats, NodeStats
+
+
+class MockService:
+    """A minimal stand-in for a Zoe service."""
+    def __init__(self, service_id, backend_host, cores):
+        self.id = service_id
+        self.backend_host = backend_host
+        self.labels = []
+        self.resource_reservation = ResourceReservation({'memory': {'min': 1024, 'max': 1024}, 'cores': {'min': cores, 'max': cores}})
+
+
+class MockServiceTable:
+    """Returns a fixed list of services, recording the queries."""
+    def __init__(self, services):
+        self.services = services
+        self.queries = []
+
+    def select(self, **kwargs):
+        """Fake select."""
+        self.queries.append(kwargs)
+        return [s for s in self.services if s.backend_host in kwargs['backend_host']]
+
+
+class MockState:
+    """A minimal stand-in for the SQL manager."""
+    def __init__(self, services):
+        self.services = MockServiceTable(services)
+
+
+def _node(name, cores_total, cores_reserved, core_limits, cores_in_use=None):
+    node = NodeStats(name)
+    node.status = 'online'
+    node.cores_total = cores_total
+    node.cores_reserved = cores_reserved
+    node.service_stats = {service_id: {'core_limit': limit} for service_id, limit in core_limits.items()}
+    if cores_in_use is not None:
+        for service_id, usage in cores_in_use.items():
+            node.service_stats[service_id]['cores_in_use'] = usage
+    return node
+
+
+def _scheduler(services):
+    scheduler = ZoeElasticScheduler.__new__(ZoeElasticScheduler)
+    scheduler.state = MockState(services)
+    scheduler.core_demand = {}
+    scheduler.core_demand_timestamp = None
+    return scheduler
+
+
+class TestCoreLimits:
+    """Core limit computation tests."""
+
+    @pytest.fixture(autouse=True)
+    def mock_config(self, zoe_configuration):  # pylint: disable=redefined-outer-name
+        """Fixture for mock config method."""
+        self.conf = zoe_configuration  # pylint: disable=attribute-defined-outside-init
+        load_configuration(zoe_configuration)
+
+    def test_only_changes_are_returned(self):
+        """Services that already have the right limit are not updated, the DB is queried once for the whole cluster."""
+        services = [MockService(1, 'n1', 1), MockService(2, 'n1', 1), MockService(3, 'n2', 2)]
+        stats = ClusterStats()
+        stats.nodes = [_node('n1', 8, 2, {1: 4, 2: 1}), _node('n2', 4, 2, {3: 4})]
+        scheduler = _scheduler(services)
+
+        updates = scheduler._core_limit_updates(stats)  # pylint: disable=protected-access
+        assert len(scheduler.state.services.queries) == 1
+        assert set(updates.keys()) == {'n1'}
+        assert [(s.id, cores) for s, cores in updates['n1']] == [(2, 4)]
+
+    def test_limit_capped_to_node_size(self):
+        """Core limits never exceed the cores of the node."""
+        services = [MockService(1, 'n1', 6)]
+        stats = ClusterStats()
+        stats.nodes = [_node('n1', 4, 0, {})]
+
+        updates = _scheduler(services)._core_limit_updates(stats)  # pylint: disable=protected-access
+        assert [(s.id, cores) for s, cores in updates['n1']] == [(1, 4)]
+
+    def test_usage_redistribution(self):
+        """Free cores go to the services that use them, small changes are ignored."""
+        self.conf.core_redistribution = 'usage'
+        services = [MockService(1, 'n1', 1), MockService(2, 'n1', 1)]
+        scheduler = _scheduler(services)
+        stats = ClusterStats()
+        stats.timestamp = 1
+        stats.nodes = [_node('n1', 10, 2, {1: 5, 2: 5}, {1: 0, 2: 4})]
+
+        updates = scheduler._core_limit_updates(stats)  # pylint: disable=protected-access
+        limits = {s.id: cores for s, cores in updates['n1']}
+        assert limits[1] < 1.1
+        assert limits[2] > 8.9
+
+        stats.timestamp = 2
+        stats.nodes = [_node('n1', 10, 2, {1: limits[1], 2: limits[2]}, {1: 0.1, 2: 4})]
+        assert len(scheduler._core_limit_updates(stats)) == 0  # pylint: disable=protected-access
+
+    def test_usage_sample_counted_once(self):
+        """The moving average of the demand advances only when the metrics have a new sample."""
+        self.conf.core_redistribution = 'usage'
+        scheduler = _scheduler([MockService(1, 'n1', 1), MockService(2, 'n1', 1)])
+        stats = ClusterStats()
+        stats.timestamp = 1
+        stats.nodes = [_node('n1', 10, 2, {1: 5, 2: 5}, {1: 2, 2: 2})]
+        scheduler._core_limit_updates(stats)  # pylint: disable=protected-access
+
+        stats.nodes = [_node('n1', 10, 2, {1: 5, 2: 5}, {1: 0, 2: 4})]
+        scheduler._core_limit_updates(stats)  # pylint: disable=protected-access
+        assert scheduler.core_demand == {1: 2, 2: 2}
+
+        stats.timestamp = 2
+        scheduler._core_limit_updates(stats)  # pylint: disable=protected-access
+        assert scheduler.core_demand[1] < 2 < scheduler.core_demand[2]
+
+    def test_usage_without_metrics(self):
+        """Without usage metrics the free cores are split in equal parts."""
+        self.conf.core_redistribution = 'usage'
+        services = [MockService(1, 'n1', 1), MockService(2, 'n1', 1)]
+        stats = ClusterStats()
+        stats.nodes = [_node('n1', 10, 2, {1: 1, 2: 1})]
+
+        updates = _scheduler(services)._core_limit_updates(stats)  # pylint: disable=protected-access
+        assert [cores for s_, cores in updates['n1']] == [5, 5]
+
+    def test_usage_after_reconciliation(self):
+        """Usage-based limits are kept when a reconciliation drops the usage samples before the next metrics sample."""
+        self.conf.core_redistribution = 'usage'
+        scheduler = _scheduler([MockService(1, 'n1', 1), MockService(2, 'n1', 1)])
+        stats = ClusterStats()
+        stats.timestamp = 1
+        stats.nodes = [_node('n1', 10, 2, {1: 5, 2: 5}, {1: 0, 2: 4})]
+        limits = {s.id: cores for s, cores in scheduler._core_limit_updates(stats)['n1']}  # pylint: disable=protected-access
+
+        stats.nodes = [_node('n1', 10, 2, {1: limits[1], 2: limits[2]})]
+        assert len(scheduler._core_limit_updates(stats)) == 0  # pylint: disable=protected-access
+        assert scheduler.core_demand == {1: 0, 2: 4}
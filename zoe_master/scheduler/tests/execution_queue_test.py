@@ -0,0 +1,83 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the scheduler queue."""
+
+import pytest
+
+from zoe_master.scheduler.execution_queue import ExecutionQueue
+
+
+class MockExecution:
+    """A minimal stand-in for a Zoe execution."""
+    def __init__(self, execution_id, size):
+        self.id = execution_id
+        self.size = size
+
+
+class TestExecutionQueue:
+    """Scheduler queue tests."""
+
+    def test_fifo_order(self):
+        """The FIFO policy ignores sizes."""
+        queue = ExecutionQueue('FIFO')
+        for execution_id, size in [(1, 30), (2, 10), (3, 20)]:
+            queue.append(MockExecution(execution_id, size))
+        assert [e.id for e in queue] == [1, 2, 3]
+        assert queue.peek().id == 1
+
+    def test_size_order_and_removal(self):
+        """The SIZE policy orders by size and supports removal by ID."""
+        queue = ExecutionQueue('SIZE')
+        executions = [MockExecution(execution_id, size) for execution_id, size in [(1, 30), (2, 10), (3, 20), (4, 10)]]
+        for execution in executions:
+            queue.append(execution)
+        assert [e.id for e in queue] == [2, 4, 3, 1]
+
+        queue.remove(executions[1])
+        assert executions[1] not in queue
+        assert len(queue) == 3
+        assert [e.id for e in queue] == [4, 3, 1]
+        assert queue.peek().id == 4
+        with pytest.raises(ValueError):
+            queue.remove(executions[1])
+
+    def test_key_update(self):
+        """DYNSIZE ages executions, changing their position."""
+        queue = ExecutionQueue('DYNSIZE')
+        executions = [MockExecution(execution_id, size) for execution_id, size in [(1, 30), (2, 10), (3, 20)]]
+        for execution in executions:
+            queue.append(execution)
+        executions[0].size = 5
+        queue.update(executions[0])
+        assert [e.id for e in queue] == [1, 2, 3]
+        assert queue.peek().id == 1
+        executions[0].size = 30
+        queue.update(executions[0])
+        assert [e.id for e in queue] == [2, 3, 1]
+        assert len(queue) == 3
+
+    def test_lazy_iteration(self):
+        """Iteration reads the executions queued when it started, in order, while the queue keeps changing."""
+        queue = ExecutionQueue('SIZE')
+        executions = [MockExecution(execution_id, size) for execution_id, size in [(1, 30), (2, 10), (3, 20)]]
+        for execution in executions:
+            queue.append(execution)
+        iterator = iter(queue)
+        assert next(iterator).id == 2
+        queue.remove(executions[0])
+        queue.append(MockExecution(4, 5))
+        assert [e.id for e in iterator] == [3, 1]
+        assert sorted(e.id for e in queue.executions()) == [2, 3, 4]
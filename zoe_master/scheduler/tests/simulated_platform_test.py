@@ -0,0 +1,146 @@
+# Copyright (c) 2017, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the simulated platform used by the elastic scheduler."""
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.state.service import ResourceReservation
+from zoe_lib.tests.config_mock import zoe_configuration  # pylint: disable=unused-import
+from zoe_master.backends.image_index import ImageIndex
+from zoe_master.scheduler import simulated_platform
+from zoe_master.stats import ClusterStats, NodeStats
+
+GB = 1024 ** 3
+
+
+class MockService:
+    """A minimal stand-in for a Zoe service."""
+    ACTIVE_STATUS = 'active'
+    BACKEND_DIE_STATUS = 'dead'
+
+    def __init__(self, service_id, memory, cores):
+        self.id = service_id
+        self.labels = []
+        self.image_name = 'zoe/test:1'
+        self.status = 'created'
+        self.backend_status = 'undefined'
+        self.resource_reservation = ResourceReservation({'memory': {'min': memory, 'max': memory}, 'cores': {'min': cores, 'max': cores}})
+
+    def set_runnable(self):
+        """Fake state change."""
+        self.status = 'runnable'
+
+    def set_inactive(self):
+        """Fake state change."""
+        self.status = 'inactive'
+
+
+class MockExecution:
+    """A minimal stand-in for a Zoe execution."""
+    id = 1  # pylint: disable=invalid-name
+
+    def __init__(self, essential, elastic):
+        self.essential_services = essential
+        self.elastic_services = elastic
+
+
+def _cluster(*nodes):
+    stats = ClusterStats()
+    for name, memory, cores in nodes:
+        node = NodeStats(name)
+        node.status = 'online'
+        node.memory_total = memory
+        node.cores_total = cores
+        node.labels = set()
+        stats.nodes.append(node)
+    return stats
+
+
+class TestSimulatedPlatform:
+    """Placement simulation tests."""
+
+    @pytest.fixture(autouse=True)
+    def mock_config(self, zoe_configuration, monkeypatch):  # pylint: disable=redefined-outer-name
+        """Fixture for mock config method."""
+        zoe_configuration.placement_policy = 'average'
+        load_configuration(zoe_configuration)
+        monkeypatch.setattr(simulated_platform, 'get_image_index', lambda: None)
+
+    def test_free_resource_accounting(self):
+        """Free resources follow services being added and removed."""
+        platform = simulated_platform.SimulatedPlatform(_cluster(('n1', 8 * GB, 4), ('n2', 8 * GB, 4)))
+        assert platform.aggregated_free_memory() == 16 * GB
+
+        execution = MockExecution([MockService(1, 2 * GB, 1), MockService(2, 2 * GB, 1)], [MockService(3, 1 * GB, 1)])
+        assert platform.allocate_essential(execution)
+        assert platform.allocate_elastic(execution)
+        assert platform.aggregated_free_memory() == 11 * GB
+        assert sum(node.node_free_cores() for node in platform.nodes.values()) == 5
+        assert set(platform.get_service_allocation().keys()) == {1, 2, 3}
+
+        platform.deallocate_elastic(execution)
+        platform.deallocate_essential(execution)
+        assert platform.aggregated_free_memory() == 16 * GB
+        assert platform.get_service_allocation() == {}
+
+    def test_image_availability(self, monkeypatch):
+        """Services are placed only on nodes that have their image."""
+        index = ImageIndex()
+        index.update_node('n2', ['zoe/test:1', 'zoe/other:2'])
+        monkeypatch.setattr(simulated_platform, 'get_image_index', lambda: index)
+        platform = simulated_platform.SimulatedPlatform(_cluster(('n1', 8 * GB, 4), ('n2', 8 * GB, 4)))
+        assert platform.allocate_essential(MockExecution([MockService(1, 2 * GB, 1), MockService(2, 2 * GB, 1)], []))
+        assert set(platform.get_service_allocation().values()) == {'n2'}
+
+        index.remove_node('n2')
+        platform.update(_cluster(('n1', 8 * GB, 4), ('n2', 8 * GB, 4)))
+        assert not platform.allocate_essential(MockExecution([MockService(3, 2 * GB, 1)], []))
+
+    def test_essential_rollback(self):
+        """When an essential service does not fit, the partial allocation is removed."""
+        platform = simulated_platform.SimulatedPlatform(_cluster(('n1', 8 * GB, 4)))
+        execution = MockExecution([MockService(1, 2 * GB, 1), MockService(2, 16 * GB, 1)], [])
+        assert not platform.allocate_essential(execution)
+        assert platform.aggregated_free_memory() == 8 * GB
+        assert platform.get_service_allocation() == {}
+
+    def test_update_reuses_nodes(self):
+        """Updating the platform keeps node objects and drops the simulated placements."""
+        platform = simulated_platform.SimulatedPlatform(_cluster(('n1', 8 * GB, 4), ('n2', 8 * GB, 4)))
+        node_n1 = platform.nodes['n1']
+        platform.allocate_essential(MockExecution([MockService(1, 2 * GB, 1)], []))
+
+        platform.update(_cluster(('n1', 4 * GB, 4)))
+        assert platform.nodes['n1'] is node_n1
+        assert 'n2' not in platform.nodes
+        assert platform.aggregated_free_memory() == 4 * GB
+        assert platform.get_service_allocation() == {}
+
+    def test_backfill_reservation(self):
+        """Resources held for a blocked execution cannot be used by the ones behind it."""
+        platform = simulated_platform.SimulatedPlatform(_cluster(('n1', 8 * GB, 4), ('n2', 8 * GB, 4)))
+        assert platform.allocate_essential(MockExecution([MockService(1, 6 * GB, 1)], []))
+
+        head = MockExecution([MockService(2, 7 * GB, 1), MockService(3, 7 * GB, 1)], [])
+        assert not platform.allocate_essential(head)
+        assert platform.reserve_essential(head)
+
+        assert not platform.allocate_essential(MockExecution([MockService(4, 2 * GB, 1)], []))
+        assert platform.allocate_essential(MockExecution([MockService(5, 512 * 1024 ** 2, 1)], []))
+
+        assert not platform.reserve_essential(MockExecution([MockService(6, 16 * GB, 1)], []))
+        assert sum(node.held_reservations['memory'] for node in platform.nodes.values()) == 14 * GB
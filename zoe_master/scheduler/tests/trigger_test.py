@@ -0,0 +1,61 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the coalescing scheduler trigger."""
+
+import threading
+
+from zoe_master.backends import events
+from zoe_master.scheduler.trigger import CoalescingTrigger
+
+
+class TestCoalescingTrigger:
+    """Trigger tests."""
+
+    def test_burst_is_merged(self):
+        """Many requests before and during the debounce window cause a single wake up."""
+        trigger = CoalescingTrigger(0.05)
+        for count_ in range(10):
+            trigger.fire()
+        timer = threading.Timer(0.01, trigger.fire)
+        timer.start()
+        assert trigger.wait(timeout=1)
+        timer.join()
+        assert not trigger.wait(timeout=0.05)
+
+    def test_request_after_wake_up(self):
+        """A request arriving after the wake up is not lost."""
+        trigger = CoalescingTrigger(0)
+        trigger.fire()
+        assert trigger.wait(timeout=1)
+        trigger.fire()
+        assert trigger.wait(timeout=0)
+
+    def test_backend_events(self):
+        """Back-end events reach the subscribed triggers."""
+        trigger = CoalescingTrigger(0)
+
+        def listener(event, node_name):  # pylint: disable=unused-argument
+            """Fire on any event."""
+            trigger.fire()
+
+        events.subscribe(listener)
+        try:
+            events.notify(events.SERVICE_DIED, 'node1')
+        finally:
+            events.unsubscribe(listener)
+        assert trigger.wait(timeout=0)
+        events.notify(events.SERVICE_DIED, 'node1')
+        assert not trigger.wait(timeout=0)
@@ -0,0 +1,51 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A trigger that merges bursts of scheduling requests into a single scheduler pass."""
+
+import threading
+from typing import Union
+
+
+class CoalescingTrigger:
+    """Wake up a thread when something happened, merging all the requests that arrive within a short debounce window."""
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._event = threading.Event()
+        self._quit = threading.Event()
+
+    def fire(self) -> None:
+        """Request a pass, does nothing if one is already pending."""
+        self._event.set()
+
+    def quit(self) -> None:
+        """Wake up the waiting thread for good."""
+        self._quit.set()
+        self._event.set()
+
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait until the trigger is fired, then wait for the debounce window so that requests arriving in a burst are served by a single pass.
+
+        Requests arriving after this method returns will cause the next call to return immediately.
+        :param timeout: maximum time to wait for a request, None to wait forever
+        :return: False if the timeout expired without requests
+        """
+        if not self._event.wait(timeout):
+            return False
+        if self.debounce > 0:
+            self._quit.wait(self.debounce)
+        self._event.clear()
+        return True